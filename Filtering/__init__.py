@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Filtering: constant-time median and box filters behind a common filter interface"""
+
+from .box import box_filter
+from .median import median_filter
+from .filters import (
+    register_filter,
+    available_filters,
+    get_filter,
+    apply_filter,
+)
+
+__all__ = [
+    "box_filter",
+    "median_filter",
+    "register_filter",
+    "available_filters",
+    "get_filter",
+    "apply_filter",
+]
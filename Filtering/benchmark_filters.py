@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the median and box filters against the notebook's OpenCV calls.
+
+For every kernel size, times ``cv.medianBlur`` and ``cv.blur`` (what
+``fundamental-filtering.ipynb`` uses) against the histogram median and the
+integral-image box filter, and checks that the outputs agree. The median is
+also run on a uint16 copy of the image, where ``cv.medianBlur`` only accepts
+kernels of 3 and 5. The test image is converted to gray (use ``--color`` to
+keep BGR) and resized to the requested resolution.
+
+Usage:
+    python benchmark_filters.py [--width 640] [--height 480] [--sizes 3 5 11 21 51 101] [--color]
+"""
+import argparse
+import time
+
+import numpy as np
+import cv2 as cv
+
+import configuration.config as config
+from box import box_filter
+from median import median_filter
+
+KERNEL_SIZES = [3, 5, 11, 21, 31, 51, 75, 101]
+
+
+def best_time(func, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--sizes", type=int, nargs="+", default=KERNEL_SIZES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--color", action="store_true", help="Filter the BGR image")
+    args = parser.parse_args()
+
+    image = cv.imread(config.TEST_IMAGE, cv.IMREAD_COLOR)
+    if not args.color:
+        image = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    image = cv.resize(image, (args.width, args.height), interpolation=cv.INTER_CUBIC)
+    image16 = image.astype(np.uint16) * 257
+
+    print(f"Image: {args.width}x{args.height}, {'BGR' if args.color else 'gray'}")
+    print(
+        f"{'ksize':>5} {'cv.medianBlur':>14} {'histogram':>10} {'uint16':>10}"
+        f" {'cv.blur':>10} {'integral':>10}   (ms)"
+    )
+    for ksize in args.sizes:
+        opencv_median, expected = best_time(lambda: cv.medianBlur(image, ksize), args.repeat)
+        histogram_median, result = best_time(
+            lambda: median_filter(image, ksize, method="histogram"), args.repeat
+        )
+        if not np.array_equal(result, expected):
+            raise AssertionError(f"Histogram median differs from cv.medianBlur at ksize {ksize}")
+
+        uint16_median, result16 = best_time(
+            lambda: median_filter(image16, ksize, method="histogram"), args.repeat
+        )
+        if not np.array_equal(result16, expected.astype(np.uint16) * 257):
+            raise AssertionError(f"uint16 median differs from the uint8 one at ksize {ksize}")
+
+        opencv_box, expected = best_time(lambda: cv.blur(image, (ksize, ksize)), args.repeat)
+        integral_box, result = best_time(lambda: box_filter(image, ksize), args.repeat)
+        # cv.blur 的定点舍入在恰好 .5 时可能与 rint 相差 1
+        if np.abs(result.astype(np.int16) - expected).max() > 1:
+            raise AssertionError(f"Integral box filter differs from cv.blur at ksize {ksize}")
+
+        print(
+            f"{ksize:>5} {opencv_median * 1e3:>14.1f} {histogram_median * 1e3:>10.1f}"
+            f" {uint16_median * 1e3:>10.1f} {opencv_box * 1e3:>10.1f} {integral_box * 1e3:>10.1f}"
+        )
+    print("Outputs checked against OpenCV.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Common interface for the spatial filters.
+
+Every filter is a function ``func(image, ksize, **params)`` that returns an
+image of the same shape and dtype, registered by name with
+``register_filter``. Callers (notebooks, the batch CLI, benchmarks) pick a
+filter by name and never need to know whether it is implemented with
+OpenCV or with the constant-time filters of this package.
+
+Example:
+    for name in available_filters():
+        filtered = apply_filter(img_bgr, name, 11)
+"""
+import cv2 as cv
+
+from .box import box_filter
+from .median import median_filter
+
+__all__ = ["register_filter", "available_filters", "get_filter", "apply_filter"]
+
+_FILTERS = {}
+
+
+def register_filter(name):
+    """
+    Register a filter under ``name``.
+
+    The decorated function receives the image and the kernel size followed
+    by keyword parameters, and returns an image of the same shape and dtype.
+    """
+
+    def decorator(func):
+        if name in _FILTERS:
+            raise ValueError(f"Filter '{name}' is already registered")
+        _FILTERS[name] = func
+        return func
+
+    return decorator
+
+
+def available_filters():
+    """Return the names of the registered filters."""
+    return sorted(_FILTERS)
+
+
+def get_filter(name):
+    """Return the filter function registered under ``name``."""
+    try:
+        return _FILTERS[name]
+    except KeyError:
+        raise KeyError(
+            f"Unknown filter '{name}', available: {', '.join(available_filters())}"
+        ) from None
+
+
+def apply_filter(image, name, ksize, **params):
+    """Apply the filter registered under ``name`` with kernel size ``ksize``."""
+    return get_filter(name)(image, ksize, **params)
+
+
+register_filter("box")(box_filter)
+register_filter("median")(median_filter)
+
+
+@register_filter("gaussian")
+def gaussian_filter(image, ksize, sigma=0.0):
+    return cv.GaussianBlur(image, (ksize, ksize), sigma)
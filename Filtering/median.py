@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Median filter with a per-pixel cost independent of the kernel size.
+
+The histogram method follows Perreault and Hébert, "Median Filtering in
+Constant Time" (2007): one histogram is kept per image column, covering the
+``ksize`` rows around the current output row. Moving down one row adds one
+pixel to and removes one pixel from every column histogram, and the kernel
+histogram of each output pixel is the sum of ``ksize`` neighbouring column
+histograms, obtained for the whole row from a running sum along the columns.
+The median is then read from the cumulative kernel histogram. None of these
+steps depends on the radius, so a 101x101 median costs about as much as a
+3x3 one.
+
+The row loop is vectorized over all columns. Column histograms hold counts
+of at most ``ksize`` and kernel histograms at most ``ksize**2``, so they are
+uint16 for kernels up to 255; the running sums may wrap around, but their
+differences are still exact.
+
+uint16 images use the two-level histogram of the paper: a coarse histogram
+of the high byte selects the bucket holding the median, then a fine
+histogram of the low byte, restricted to that bucket, gives the exact value.
+Neighbouring pixels can select different buckets, so the fine column
+histograms are kept in Fenwick trees along the row and each pixel sums
+``O(log W)`` nodes of its own bucket instead of ``ksize`` columns.
+
+``cv.medianBlur`` already uses a constant-time algorithm for uint8 images
+but only supports kernels of 3 and 5 for uint16, so ``method="auto"`` picks
+OpenCV where it applies and the histogram method otherwise.
+
+Example:
+    filtered = median_filter(img_bgr, 51)
+    filtered16 = median_filter(depth_uint16, 31)
+"""
+import numpy as np
+import cv2 as cv
+
+__all__ = ["median_filter"]
+
+# uint16 精细直方图每个条带的内存上限
+_FINE_HISTOGRAM_BYTES = 64 * 1024**2
+
+
+def _opencv_supports(dtype, ksize):
+    return ksize in (3, 5) or dtype == np.uint8
+
+
+def _count_dtype(ksize):
+    # 核内像素数 ksize^2 须能以该类型表示
+    return np.uint16 if ksize * ksize <= np.iinfo(np.uint16).max else np.uint32
+
+
+def _window_histograms(running, ksize, out):
+    """Sum ``ksize`` consecutive column histograms from their running sum."""
+    out[0] = running[ksize - 1]
+    np.subtract(running[ksize:], running[:-ksize], out=out[1:])
+    return out
+
+
+def _median_uint8(image, ksize):
+    radius = ksize // 2
+    padded = cv.copyMakeBorder(image, radius, radius, radius, radius, cv.BORDER_REPLICATE)
+    height, width = image.shape
+    dtype = _count_dtype(ksize)
+    rank = ksize * ksize // 2
+
+    columns = np.arange(padded.shape[1])
+    column_hist = np.zeros((padded.shape[1], 256), dtype=dtype)
+    for row in padded[: ksize - 1]:
+        column_hist[columns, row] += 1
+
+    running = np.empty_like(column_hist)
+    kernel = np.empty((width, 256), dtype=dtype)
+    out = np.empty_like(image)
+    for y in range(height):
+        column_hist[columns, padded[y + ksize - 1]] += 1
+        np.cumsum(column_hist, axis=0, dtype=dtype, out=running)
+        _window_histograms(running, ksize, kernel)
+        np.cumsum(kernel, axis=1, dtype=dtype, out=kernel)
+        # 中值 = 累计计数不超过 rank 的灰度级个数
+        out[y] = np.count_nonzero(kernel <= rank, axis=1)
+        column_hist[columns, padded[y]] -= 1
+    return out
+
+
+def _fenwick_paths(size):
+    """
+    Node indices visited by Fenwick tree queries and updates over ``size`` columns.
+
+    ``query[i]`` lists the nodes summing columns ``[0, i)`` and ``update[x]``
+    the nodes covering column ``x``. Both are padded to the same length,
+    queries with node 0 (always empty) and updates with node ``size + 1``
+    (never queried).
+    """
+    depth = max(int(size).bit_length(), 1)
+    query = np.zeros((size + 1, depth), dtype=np.intp)
+    update = np.full((size, depth), size + 1, dtype=np.intp)
+    for i in range(size + 1):
+        node, j = i, 0
+        while node > 0:
+            query[i, j] = node
+            node &= node - 1
+            j += 1
+    for x in range(size):
+        node, j = x + 1, 0
+        while node <= size:
+            update[x, j] = node
+            node += node & -node
+            j += 1
+    return query, update
+
+
+def _median_uint16_strip(padded, ksize, out):
+    """Two-level histogram median of one vertical strip of the padded image."""
+    height, width = out.shape
+    dtype = _count_dtype(ksize)
+    rank = ksize * ksize // 2
+    high = (padded >> 8).astype(np.uint8)
+    low = (padded & 0xFF).astype(np.uint8)
+
+    columns = np.arange(padded.shape[1])
+    output_columns = np.arange(width)
+    coarse_hist = np.zeros((padded.shape[1], 256), dtype=dtype)
+    # fine_tree[h]: 高字节为 h 的像素的低字节列直方图, 以树状数组沿列存储,
+    # 任意像素所在粗桶的窗口直方图都只需 O(log W) 个节点
+    query, update = _fenwick_paths(padded.shape[1])
+    fine_tree = np.zeros((256, padded.shape[1] + 2, 256), dtype=dtype)
+
+    def update_fine(row, delta):
+        np.add.at(fine_tree, (high[row, :, None], update, low[row, :, None]), delta)
+
+    for y in range(ksize - 1):
+        coarse_hist[columns, high[y]] += 1
+        update_fine(y, 1)
+
+    running = np.empty_like(coarse_hist)
+    kernel = np.empty((width, 256), dtype=dtype)
+    for y in range(height):
+        entering = y + ksize - 1
+        coarse_hist[columns, high[entering]] += 1
+        update_fine(entering, 1)
+
+        np.cumsum(coarse_hist, axis=0, dtype=dtype, out=running)
+        _window_histograms(running, ksize, kernel)
+        np.cumsum(kernel, axis=1, dtype=dtype, out=kernel)
+        bucket = np.count_nonzero(kernel <= rank, axis=1)
+        below = np.where(
+            bucket > 0, kernel[output_columns, np.maximum(bucket - 1, 0)], 0
+        ).astype(np.int64)
+        fine_rank = rank - below
+
+        # 窗口 [x, x + ksize) 的精细直方图 = 前缀和之差, 计数按 2^16 取模仍精确
+        nodes = bucket[:, None]
+        window = fine_tree[nodes, query[output_columns + ksize]].sum(axis=1, dtype=dtype)
+        window -= fine_tree[nodes, query[output_columns]].sum(axis=1, dtype=dtype)
+        np.cumsum(window, axis=1, dtype=dtype, out=window)
+        fine = np.count_nonzero(window <= fine_rank[:, None], axis=1)
+        out[y] = (bucket.astype(np.uint16) << 8) | fine.astype(np.uint16)
+
+        coarse_hist[columns, high[y]] -= 1
+        update_fine(y, -1)
+    return out
+
+
+def _median_uint16(image, ksize):
+    radius = ksize // 2
+    padded = cv.copyMakeBorder(image, radius, radius, radius, radius, cv.BORDER_REPLICATE)
+    height, width = image.shape
+    # 精细直方图为 256 x 列数 x 256, 按列分条带处理以限制内存
+    column_bytes = 256 * 256 * np.dtype(_count_dtype(ksize)).itemsize
+    strip = max(_FINE_HISTOGRAM_BYTES // column_bytes - 2 * radius, 64)
+
+    out = np.empty_like(image)
+    for x0 in range(0, width, strip):
+        x1 = min(x0 + strip, width)
+        _median_uint16_strip(padded[:, x0:x1 + 2 * radius], ksize, out[:, x0:x1])
+    return out
+
+
+def median_filter(image, ksize, method="auto"):
+    """
+    Median filter with a ``ksize x ksize`` kernel, applied per channel.
+
+    Borders are replicated, as in ``cv.medianBlur``, and the results are
+    identical to it wherever OpenCV supports the input.
+
+    :param image: uint8 or uint16 image, gray (H, W) or multi-channel (H, W, C).
+    :param ksize: Odd kernel size.
+    :param method: "histogram" for the constant-time histogram filter,
+        "opencv" for ``cv.medianBlur``, or "auto" to use OpenCV where it
+        supports the dtype and kernel size and the histogram filter otherwise.
+    :return: Filtered image of the same shape and dtype.
+    """
+    if ksize < 1 or ksize % 2 == 0:
+        raise ValueError(f"ksize must be a positive odd number, got {ksize}")
+    if image.dtype not in (np.uint8, np.uint16):
+        raise TypeError(f"Expected a uint8 or uint16 image, got {image.dtype}")
+    if method == "auto":
+        method = "opencv" if _opencv_supports(image.dtype, ksize) else "histogram"
+    if method not in ("histogram", "opencv"):
+        raise ValueError(f"Unknown median method '{method}'")
+
+    if ksize == 1:
+        return image.copy()
+    if method == "opencv":
+        return cv.medianBlur(image, ksize)
+
+    channel_filter = _median_uint8 if image.dtype == np.uint8 else _median_uint16
+    if image.ndim == 2:
+        return channel_filter(image, ksize)
+    channels = [channel_filter(np.ascontiguousarray(image[..., c]), ksize) for c in range(image.shape[2])]
+    return np.stack(channels, axis=-1)
@@ -1,67 +1,163 @@
 # -*- encoding: utf-8 -*-
+import os
+import sys
+import time
+
 import numpy as np
-import matplotlib.pyplot as plt
 import streamlit as st
 
+# Streamlit 应用目录 (core.fragments 所在), 页面运行时加入 sys.path
+_APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit")
+
+
+# 色相扇区 0-5 中各通道取 Chroma / X 的权重, 对应 hsb_to_rgb 中的 if 链
+_SECTOR_CHROMA = np.array(
+    [
+        [1, 0, 0, 0, 0, 1],  # red
+        [0, 1, 1, 0, 0, 0],  # green
+        [0, 0, 0, 1, 1, 0],  # blue
+    ],
+    dtype=np.float64,
+)
+_SECTOR_X = np.array(
+    [
+        [0, 1, 0, 0, 1, 0],  # red
+        [1, 0, 0, 1, 0, 0],  # green
+        [0, 0, 1, 0, 0, 1],  # blue
+    ],
+    dtype=np.float64,
+)
+
+
+def _as_unit_float(image):
+    """Return ``image`` as a float array scaled to [0, 1].
+
+    uint8 input is divided by 255 into float32; floating input is assumed to
+    already be in [0, 1] and is used as-is (no copy).
+    """
+    image = np.asarray(image)
+    if image.ndim < 1 or image.shape[-1] != 3:
+        raise ValueError(f"Expected an array of shape (..., 3), got {image.shape}")
+    if image.dtype == np.uint8:
+        return image.astype(np.float32) * np.float32(1.0 / 255.0)
+    if np.issubdtype(image.dtype, np.floating):
+        return image
+    raise TypeError(f"Unsupported dtype {image.dtype}, expected uint8 or float")
+
+
+def _check_out(out, shape, dtype_kind):
+    if out.shape != shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {shape}")
+    if out.dtype.kind not in dtype_kind:
+        raise TypeError(f"Unsupported output dtype {out.dtype}")
+    return out
+
+
+def rgb_to_hsb_array(image, out=None):
+    """
+    Convert an RGB image to HSB without a per-pixel Python loop.
+
+    :param image: Array of shape (..., 3) in RGB order, uint8 in [0, 255] or float in [0, 1].
+    :param out: Optional float buffer of the same shape to write the result into.
+    :return: Array of shape (..., 3) holding Hue in [0, 360), Saturation and Brightness in [0, 1].
+    """
+    rgb = _as_unit_float(image)
+    if out is None:
+        out = np.empty(rgb.shape, dtype=rgb.dtype)
+    else:
+        _check_out(out, rgb.shape, "f")
+
+    red, green, blue = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    # 逐通道 maximum/minimum 比 rgb.max(axis=-1) 在长度为 3 的末轴上快得多
+    max_value = np.maximum(np.maximum(red, green), blue)
+    min_value = np.minimum(np.minimum(red, green), blue)
+    chroma = max_value - min_value
+    has_chroma = chroma > 0
+    # 避免除零: Chroma 为 0 的像素 Hue 最后统一置 0
+    safe_chroma = np.where(has_chroma, chroma, 1)
+
+    # 与标量版本相同的优先级: R -> G -> B
+    # (G - B) / Chroma 落在 [-1, 1], 对 6 取模只需给负数加 6 (比 np.mod 快得多)
+    hue_red = (green - blue) / safe_chroma
+    hue_red += 6 * (hue_red < 0)
+    hue = np.where(
+        max_value == red,
+        hue_red,
+        np.where(
+            max_value == green,
+            (blue - red) / safe_chroma + 2,
+            (red - green) / safe_chroma + 4,
+        ),
+    )
+    hue *= 60
+    hue[~has_chroma] = 0
+    hue[hue >= 360] -= 360
+
+    saturation = np.zeros_like(max_value)
+    np.divide(chroma, max_value, out=saturation, where=max_value > 0)
+
+    out[..., 0] = hue
+    out[..., 1] = saturation
+    out[..., 2] = max_value
+    return out
+
+
+def hsb_to_rgb_array(image, out=None):
+    """
+    Convert an HSB image back to RGB without a per-pixel Python loop.
+
+    :param image: Array of shape (..., 3) holding Hue in degrees, Saturation and Brightness in [0, 1].
+    :param out: Optional buffer of the same shape; uint8 receives rounded [0, 255] values,
+        float receives unrounded values in [0, 1]. Defaults to a new uint8 array.
+    :return: Array of shape (..., 3) in RGB order.
+    """
+    hsb = np.asarray(image)
+    if hsb.ndim < 1 or hsb.shape[-1] != 3:
+        raise ValueError(f"Expected an array of shape (..., 3), got {hsb.shape}")
+    if not np.issubdtype(hsb.dtype, np.floating):
+        hsb = hsb.astype(np.float32)
+    if out is None:
+        out = np.empty(hsb.shape, dtype=np.uint8)
+    else:
+        _check_out(out, hsb.shape, "uf")
 
-def rgb_to_hsb(red, green, blue):
-    red_prime = red / 255.0
-    green_prime = green / 255.0
-    blue_prime = blue / 255.0
-
-    max_value = max(red_prime, green_prime, blue_prime)
-    min_value = min(red_prime, green_prime, blue_prime)
-    Chroma = max_value - min_value
-
-    Brightness = max_value
+    hue = hsb[..., 0]
+    if hue.size and (hue.min() < 0 or hue.max() >= 360):
+        hue = np.mod(hue, 360)
+    saturation = np.clip(hsb[..., 1], 0, 1)
+    brightness = np.clip(hsb[..., 2], 0, 1)
 
-    if max_value == 0:
-        Saturation = 0
-    else:
-        Saturation = Chroma / max_value
+    chroma = brightness * saturation
+    hue_prime = hue / 60
+    sector = np.minimum(hue_prime.astype(np.intp), 5)
+    # hue_prime % 2 == hue_prime - 2 * (sector // 2), 且该减法是精确的
+    x = chroma * (1 - np.abs(hue_prime - (sector & ~1) - 1))
+    m = brightness - chroma
+
+    for channel in range(3):
+        value = _SECTOR_CHROMA[channel].astype(chroma.dtype)[sector] * chroma
+        value += _SECTOR_X[channel].astype(chroma.dtype)[sector] * x
+        value += m
+        if out.dtype == np.uint8:
+            value *= 255
+            np.rint(value, out=value)
+            np.clip(value, 0, 255, out=value)
+        out[..., channel] = value
+    return out
 
-    if Chroma == 0:
-        Hue = 0
-    else:
-        if max_value == red_prime:
-            Hue = 60 * ((green_prime - blue_prime) / Chroma % 6)
-        elif max_value == green_prime:
-            Hue = 60 * ((blue_prime - red_prime) / Chroma + 2)
-        elif max_value == blue_prime:
-            Hue = 60 * ((red_prime - green_prime) / Chroma + 4)
 
-    Hue = Hue % 360
+def rgb_to_hsb(red, green, blue):
+    rgb = np.array([[[red, green, blue]]], dtype=np.float64) / 255.0
+    hue, saturation, brightness = rgb_to_hsb_array(rgb)[0, 0]
 
-    return Hue, Saturation, Brightness
+    return float(hue), float(saturation), float(brightness)
 
 
 def hsb_to_rgb(hue, saturation, brightness):
+    hsb = np.array([[[hue, saturation, brightness]]], dtype=np.float64)
+    rgb = hsb_to_rgb_array(hsb, out=np.empty_like(hsb))[0, 0]
 
-    hue = hue % 360
-    saturation = max(0, min(saturation, 1))
-    brightness = max(0, min(brightness, 1))
-
-    Chroma = brightness * saturation
-    hue_prime = hue / 60
-    X = Chroma * (1 - abs(hue_prime % 2 - 1))
-    m = brightness - Chroma
-
-    if 0 <= hue_prime < 1:
-        r, g, b = Chroma, X, 0
-    elif 1 <= hue_prime < 2:
-        r, g, b = X, Chroma, 0
-    elif 2 <= hue_prime < 3:
-        r, g, b = 0, Chroma, X
-    elif 3 <= hue_prime < 4:
-        r, g, b = 0, X, Chroma
-    elif 4 <= hue_prime < 5:
-        r, g, b = X, 0, Chroma
-    elif 5 <= hue_prime < 6:
-        r, g, b = Chroma, 0, X
-
-    r = (r + m) * 255
-    g = (g + m) * 255
-    b = (b + m) * 255
+    r, g, b = rgb * 255
 
     return int(round(r)), int(round(g)), int(round(b))
 
@@ -71,21 +167,111 @@ def plot_rgb_histogram(red, green, blue):
     colors = [red, green, blue]
     color_labels = ["Red", "Green", "Blue"]
 
-    # 绘制直方图
-    plt.figure(figsize=(8, 8))
-    plt.bar(color_labels, colors, color=["red", "green", "blue"])
-    plt.ylim(0, 255)
-    plt.xlabel("Color Channels")
-    plt.ylabel("Intensity")
-    plt.title("RGB Color Histogram")
-
-    plt.grid(axis="y", linestyle="--", alpha=0.7)
+    # 绘制直方图: Vega-Lite 矢量图, 由浏览器绘制, 不经过 matplotlib 栅格化
+    spec = {
+        "title": "RGB Color Histogram",
+        "height": 480,
+        "mark": "bar",
+        "encoding": {
+            "x": {
+                "field": "channel",
+                "type": "nominal",
+                "title": "Color Channels",
+                "sort": None,
+            },
+            "y": {
+                "field": "intensity",
+                "type": "quantitative",
+                "title": "Intensity",
+                "scale": {"domain": [0, 255]},
+                "axis": {"grid": True, "gridDash": [4, 4]},
+            },
+            "color": {
+                "field": "channel",
+                "type": "nominal",
+                "scale": {"domain": color_labels, "range": ["red", "green", "blue"]},
+                "legend": None,
+            },
+        },
+    }
+    values = [
+        {"channel": label, "intensity": int(value)}
+        for label, value in zip(color_labels, colors)
+    ]
 
     # 显示直方图
-    st.pyplot(plt)
+    st.vega_lite_chart({"values": values}, spec, width="stretch")
+
+
+def _swatch(color_rgb):
+    return np.zeros((100, 100, 3), dtype=np.uint8) + np.array(color_rgb, dtype=np.uint8)
+
+
+# 两个面板是独立的片段 (st.fragment): 移动一个滑块只重新运行它所在的面板
+
+
+@st.fragment
+def rgb_panel():
+    from core.fragments import fragment_memo
+
+    start = time.perf_counter()
+    col1_1, col1_2 = st.columns([1, 4])
+    with col1_1:
+        red = st.slider("Red (0-255)", 0, 255, 255)
+        green = st.slider("Green (0-255)", 0, 255, 0)
+        blue = st.slider("Blue (0-255)", 0, 255, 0)
+        color_rgb = (red, green, blue)
+
+        hue, saturation, brightness = fragment_memo("color_mode.rgb").get(color_rgb, lambda: rgb_to_hsb(*color_rgb))
+
+        st.write(
+            f"""
+            Hue = {hue:.2f}°\
+            \n\
+                Saturation = {(saturation*100):.2f}\
+            \n\
+                Brightness = {(brightness*100):.2f}
+            """
+        )
+        st.image(_swatch(color_rgb), width="stretch")
+
+    with col1_2:
+        plot_rgb_histogram(red, green, blue)
+    st.caption(f"⏱ RGB panel: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+@st.fragment
+def hsb_panel():
+    from core.fragments import fragment_memo
+
+    start = time.perf_counter()
+    col2_1, col2_2 = st.columns([1, 4])
+    with col2_1:
+        hue = st.slider("Hue (0-360)", 0, 360, 0)
+        saturation = st.slider("Saturation (0-1)", 0.0, 1.0, 1.0)
+        brightness = st.slider("Brightness (0-1)", 0.0, 1.0, 1.0)
+        color_hsb = (hue, saturation, brightness)
+
+        color_rgb = fragment_memo("color_mode.hsb").get(color_hsb, lambda: hsb_to_rgb(*color_hsb))
+        st.write(
+            f"""
+            Red = {color_rgb[0]}\
+            \n\
+                Green = {color_rgb[1]}\
+            \n\
+                Blue = {color_rgb[2]}
+            """
+        )
+        st.image(_swatch(color_rgb), width="stretch")
+    with col2_2:
+        plot_rgb_histogram(color_rgb[0], color_rgb[1], color_rgb[2])
+    st.caption(f"⏱ HSB panel: {(time.perf_counter() - start) * 1e3:.1f} ms")
 
 
 def main():
+    start = time.perf_counter()
+    if _APP_DIR not in sys.path:
+        sys.path.append(_APP_DIR)
 
     st.set_page_config(
         page_title="Color Mode",
@@ -103,56 +289,9 @@ def main():
     # 分列
     col1, col2 = st.columns([4, 4])
     with col1:
-        col1_1, col1_2 = st.columns([1, 4])
-        with col1_1:
-            red = st.slider("Red (0-255)", 0, 255, 255)
-            green = st.slider("Green (0-255)", 0, 255, 0)
-            blue = st.slider("Blue (0-255)", 0, 255, 0)
-            color_rgb = (red, green, blue)
-
-            hue, saturation, brightness = rgb_to_hsb(red, green, blue)
-
-            st.write(
-                f"""
-                Hue = {hue:.2f}°\
-                \n\
-                    Saturation = {(saturation*100):.2f}\
-                \n\
-                    Brightness = {(brightness*100):.2f}
-                """
-            )
-            st.image(
-                np.zeros((100, 100, 3), dtype=np.uint8) + np.array(color_rgb),
-                use_column_width=True,
-            )
-
-        with col1_2:
-            plot_rgb_histogram(red, green, blue)
-
+        rgb_panel()
     with col2:
-        col2_1, col2_2 = st.columns([1, 4])
-        with col2_1:
-
-            hue = st.slider("Hue (0-360)", 0, 360, 0)
-            saturation = st.slider("Saturation (0-1)", 0.0, 1.0, 1.0)
-            brightness = st.slider("Brightness (0-1)", 0.0, 1.0, 1.0)
-
-            color_rgb = hsb_to_rgb(hue, saturation, brightness)
-            st.write(
-                f"""
-                Red = {color_rgb[0]}\
-                \n\
-                    Green = {color_rgb[1]}\
-                \n\
-                    Blue = {color_rgb[2]}
-                """
-            )
-            st.image(
-                np.zeros((100, 100, 3), dtype=np.uint8) + np.array(color_rgb),
-                use_column_width=True,
-            )
-        with col2_2:
-            plot_rgb_histogram(color_rgb[0], color_rgb[1], color_rgb[2])
+        hsb_panel()
     st.latex(
         r"""
             H = \begin{cases}
@@ -162,6 +301,7 @@ def main():
             \end{cases}
         """
     )
+    st.caption(f"⏱ Full rerun timing: total {(time.perf_counter() - start) * 1e3:.1f} ms")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Fundamental image processing: intensity transforms, image statistics, geometric transforms, resampling, encoding, 3D surfaces and color modes"""
+
+from .pointwise import (
+    register_curve,
+    available_curves,
+    lut_from_function,
+    get_lut,
+    curve_luts,
+    apply_lut,
+    apply_curve,
+)
+from .image_stats import ImageStatistics, image_statistics, equalize
+from .transforms import Transform, STEPS
+from .sampling import resize, fit_size, MipCache, mip_cache, resize_many
+from .encoding import FORMATS, Encoded, EncodeCache, encode_cache, encode
+from .surface import SurfaceData, surface_data, surface_figure
+
+__all__ = [
+    "register_curve",
+    "available_curves",
+    "lut_from_function",
+    "get_lut",
+    "curve_luts",
+    "apply_lut",
+    "apply_curve",
+    "ImageStatistics",
+    "image_statistics",
+    "equalize",
+    "Transform",
+    "STEPS",
+    "resize",
+    "fit_size",
+    "MipCache",
+    "mip_cache",
+    "resize_many",
+    "FORMATS",
+    "Encoded",
+    "EncodeCache",
+    "encode_cache",
+    "encode",
+    "SurfaceData",
+    "surface_data",
+    "surface_figure",
+]
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the vectorized RGB <-> HSB conversion against the per-pixel loop.
+
+The per-pixel baseline is a verbatim copy of the scalar ``rgb_to_hsb`` and
+``hsb_to_rgb`` that ``ColorMode`` used before vectorization, called once per
+pixel. Looping it over a full 4K frame takes minutes, so by default it is timed on a
+random sample of pixels and extrapolated to the whole frame. Pass
+``--full-loop`` to time the loop over every pixel instead.
+
+Usage:
+    python benchmark_colormode.py [--height 2160] [--width 3840] [--sample 20000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ColorMode import rgb_to_hsb_array, hsb_to_rgb_array
+
+
+def time_vectorized(image, repeat):
+    hsb = np.empty(image.shape, dtype=np.float32)
+    rgb = np.empty_like(image)
+
+    forward, backward = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rgb_to_hsb_array(image, out=hsb)
+        forward.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        hsb_to_rgb_array(hsb, out=rgb)
+        backward.append(time.perf_counter() - start)
+
+    if not np.array_equal(rgb, image):
+        raise AssertionError("RGB -> HSB -> RGB round trip is not lossless")
+    return min(forward), min(backward)
+
+
+# # 向量化之前的逐像素实现 (原样保留, 作为基线)
+
+
+def rgb_to_hsb(red, green, blue):
+    red_prime = red / 255.0
+    green_prime = green / 255.0
+    blue_prime = blue / 255.0
+
+    max_value = max(red_prime, green_prime, blue_prime)
+    min_value = min(red_prime, green_prime, blue_prime)
+    Chroma = max_value - min_value
+
+    Brightness = max_value
+
+    if max_value == 0:
+        Saturation = 0
+    else:
+        Saturation = Chroma / max_value
+
+    if Chroma == 0:
+        Hue = 0
+    else:
+        if max_value == red_prime:
+            Hue = 60 * ((green_prime - blue_prime) / Chroma % 6)
+        elif max_value == green_prime:
+            Hue = 60 * ((blue_prime - red_prime) / Chroma + 2)
+        elif max_value == blue_prime:
+            Hue = 60 * ((red_prime - green_prime) / Chroma + 4)
+
+    Hue = Hue % 360
+
+    return Hue, Saturation, Brightness
+
+
+def hsb_to_rgb(hue, saturation, brightness):
+
+    hue = hue % 360
+    saturation = max(0, min(saturation, 1))
+    brightness = max(0, min(brightness, 1))
+
+    Chroma = brightness * saturation
+    hue_prime = hue / 60
+    X = Chroma * (1 - abs(hue_prime % 2 - 1))
+    m = brightness - Chroma
+
+    if 0 <= hue_prime < 1:
+        r, g, b = Chroma, X, 0
+    elif 1 <= hue_prime < 2:
+        r, g, b = X, Chroma, 0
+    elif 2 <= hue_prime < 3:
+        r, g, b = 0, Chroma, X
+    elif 3 <= hue_prime < 4:
+        r, g, b = 0, X, Chroma
+    elif 4 <= hue_prime < 5:
+        r, g, b = X, 0, Chroma
+    elif 5 <= hue_prime < 6:
+        r, g, b = Chroma, 0, X
+
+    r = (r + m) * 255
+    g = (g + m) * 255
+    b = (b + m) * 255
+
+    return int(round(r)), int(round(g)), int(round(b))
+
+
+def time_loop(pixels):
+    pixels = pixels.tolist()
+
+    start = time.perf_counter()
+    hsb = [rgb_to_hsb(r, g, b) for r, g, b in pixels]
+    forward = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for h, s, v in hsb:
+        hsb_to_rgb(h, s, v)
+    backward = time.perf_counter() - start
+    return forward, backward
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--sample", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--full-loop", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    image = rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    total = args.height * args.width
+
+    vec_forward, vec_backward = time_vectorized(image, args.repeat)
+
+    pixels = image.reshape(-1, 3)
+    if not args.full_loop:
+        pixels = pixels[rng.choice(total, size=min(args.sample, total), replace=False)]
+    loop_forward, loop_backward = time_loop(pixels)
+    scale = total / len(pixels)
+    loop_forward *= scale
+    loop_backward *= scale
+
+    label = "measured" if args.full_loop else f"extrapolated from {len(pixels)} px"
+    print(f"Frame: {args.width}x{args.height} ({total / 1e6:.1f} MP)")
+    print(f"{'':14}{'per-pixel loop':>18}{'vectorized':>14}{'speedup':>10}")
+    for name, loop, vec in (
+        ("rgb_to_hsb", loop_forward, vec_forward),
+        ("hsb_to_rgb", loop_backward, vec_backward),
+    ):
+        print(f"{name:14}{loop:>16.2f} s{vec * 1e3:>11.1f} ms{loop / vec:>9.0f}x")
+    print(f"(per-pixel loop {label})")
+
+
+if __name__ == "__main__":
+    main()
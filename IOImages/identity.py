@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Identity keys for caching values computed from immutable arrays.
+
+Statistics, encoded bytes and mip levels of an array can be cached by the
+array's identity only if its pixels can never change. Clearing the
+``writeable`` flag is not enough: a read-only view of a writeable base
+changes whenever the base does. ``is_immutable`` therefore also requires
+every array down the ``base`` chain to be read-only and the last one to own
+its memory, which holds for the shared images of the Streamlit app, their
+pyramid and mip levels, and read-only views of those.
+
+``IdentityKeys`` hands out a key per live immutable array. The key contains
+a serial number, so a new array that reuses the ``id`` of a collected one
+never matches stale entries. The garbage-collection callback only appends to
+a deque and takes no lock (it may run inside any locked section of the same
+thread); caches drop the entries of the keys returned by ``collected`` on
+their next call.
+
+Example:
+    keys = IdentityKeys()
+    key = keys.key(image)            # None when the image may change
+    for dead in keys.collected():
+        cache.pop(dead, None)
+"""
+import collections
+import functools
+import itertools
+import threading
+import weakref
+
+import numpy as np
+
+__all__ = ["is_immutable", "IdentityKeys"]
+
+
+def is_immutable(array):
+    """Return True if the pixels of ``array`` cannot change while it is alive."""
+    while isinstance(array, np.ndarray):
+        if array.flags.writeable:
+            return False
+        if array.base is None:
+            return array.flags.owndata
+        array = array.base
+    # 以 bytes 为底的数组 (np.frombuffer) 同样不可变
+    return isinstance(array, bytes)
+
+
+class IdentityKeys:
+    """Keys for immutable arrays, valid while the array is alive."""
+
+    def __init__(self):
+        self._entries = {}
+        self._serial = itertools.count()
+        self._collected = collections.deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, array):
+        """Return the key of ``array``, or None if it is not immutable."""
+        if not is_immutable(array):
+            return None
+        with self._lock:
+            entry = self._entries.get(id(array))
+            if entry is not None and entry[0]() is array:
+                return entry[1]
+            key = (id(array), next(self._serial))
+            reference = weakref.ref(array, functools.partial(self._collect, key))
+            self._entries[id(array)] = (reference, key)
+            return key
+
+    def _collect(self, key, _):
+        # 只追加到队列: 回收可能发生在同一线程持有任意锁的时候
+        self._collected.append(key)
+
+    def collected(self):
+        """Return (and forget) the keys of the arrays collected since the last call."""
+        keys = []
+        while self._collected:
+            keys.append(self._collected.popleft())
+        if keys:
+            with self._lock:
+                for key in keys:
+                    entry = self._entries.get(key[0])
+                    if entry is not None and entry[1] == key:
+                        del self._entries[key[0]]
+        return keys
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Image statistics derived from histograms computed in a single pass.
+
+``ImageStatistics.from_image`` walks the image once, in row strips small
+enough to stay in cache, and fills the per-channel and gray 256-bin
+histograms together. Everything else is derived from those 4 x 256 counts
+without touching the pixels again:
+
+- cumulative histograms and CDFs,
+- mean, standard deviation (equal to ``cv.meanStdDev``), percentiles,
+  median and entropy of any channel or of the gray image,
+- per-channel minimum and maximum,
+- the histogram-equalization lookup table (same as ``cv.equalizeHist``),
+- the statistics of a lookup-table transform of the image
+  (``apply_lut``), e.g. after a log or power-law curve.
+
+``image_statistics`` caches the result for immutable arrays (see
+``IOImages.identity``), such as the shared images and pyramid levels of the
+Streamlit app, so thresholding, equalization and the histogram plots reuse
+one computation. Derived
+objects such as ``ThresholdHistogram`` can be cached on the statistics
+with ``memo``.
+
+Example:
+    stats = image_statistics(img_bgr)
+    print(stats.mean(), stats.std("red"), stats.percentile(99), stats.entropy())
+    equalized = equalize(img_gray, stats)
+"""
+import threading
+
+import numpy as np
+import cv2 as cv
+
+from .identity import IdentityKeys
+from .pointwise import apply_lut
+
+__all__ = ["ImageStatistics", "image_statistics", "equalize"]
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+# 每个条带约 1 MiB, 使颜色转换和 4 个直方图在缓存中完成
+_STRIP_BYTES = 1 << 20
+
+_CHANNEL_NAMES = {
+    "bgr": ("blue", "green", "red"),
+    "rgb": ("red", "green", "blue"),
+    "bgra": ("blue", "green", "red", "alpha"),
+    "rgba": ("red", "green", "blue", "alpha"),
+}
+_TO_GRAY = {
+    "bgr": cv.COLOR_BGR2GRAY,
+    "rgb": cv.COLOR_RGB2GRAY,
+    "bgra": cv.COLOR_BGRA2GRAY,
+    "rgba": cv.COLOR_RGBA2GRAY,
+}
+
+
+class ImageStatistics:
+    """
+    Per-channel and gray 256-bin histograms of a uint8 image and their statistics.
+
+    Channels are referred to by name ("gray", "blue", "green", "red", "alpha")
+    or by index into ``channels``.
+
+    Attributes:
+        channels (np.ndarray): (C, 256) int64 histograms, one per image channel.
+        gray (np.ndarray): (256,) int64 histogram of the gray image.
+        channel_names (tuple): Names of the rows of ``channels``.
+        total (int): Number of pixels.
+    """
+
+    def __init__(self, channels, gray, channel_names):
+        self.channels = np.asarray(channels, dtype=np.int64)
+        self.gray = np.asarray(gray, dtype=np.int64)
+        self.channel_names = tuple(channel_names)
+        self.total = int(self.gray.sum())
+        self._cumulative = {}
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_image(cls, image, order="bgr"):
+        """
+        Compute the histograms of ``image`` in one pass over its pixels.
+
+        :param image: uint8 gray (H, W) or color (H, W, 3|4) image.
+        :param order: Channel order of color images: "bgr", "rgb", "bgra" or "rgba".
+        """
+        if image.dtype != np.uint8:
+            raise TypeError(f"Expected a uint8 image, got {image.dtype}")
+        if image.ndim == 2:
+            # bincount 用 int64 计数; calcHist 的 float32 计数在单个 bin 超过 2^24 时丢失
+            hist = np.bincount(image.ravel(), minlength=256)
+            return cls(hist[None], hist, ("gray",))
+        if order not in _TO_GRAY or len(_CHANNEL_NAMES[order]) != image.shape[2]:
+            raise ValueError(f"Channel order '{order}' does not match an image of shape {image.shape}")
+
+        count = image.shape[2]
+        channels = np.zeros((count, 256), dtype=np.int64)
+        gray = np.zeros(256, dtype=np.int64)
+        rows = max(1, _STRIP_BYTES // max(1, image[0].nbytes))
+        for top in range(0, image.shape[0], rows):
+            strip = image[top:top + rows]
+            for c in range(count):
+                channels[c] += cv.calcHist([strip], [c], None, [256], [0, 256]).ravel().astype(np.int64)
+            strip_gray = cv.cvtColor(strip, _TO_GRAY[order])
+            gray += cv.calcHist([strip_gray], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+        return cls(channels, gray, _CHANNEL_NAMES[order])
+
+    def histogram(self, channel="gray"):
+        """Return the 256-bin histogram of ``channel``."""
+        if isinstance(channel, (int, np.integer)):
+            return self.channels[channel]
+        if channel == "gray":
+            return self.gray
+        try:
+            return self.channels[self.channel_names.index(channel)]
+        except ValueError:
+            raise KeyError(
+                f"Unknown channel '{channel}', available: gray, {', '.join(self.channel_names)}"
+            ) from None
+
+    def cumulative(self, channel="gray"):
+        """Cumulative histogram: ``cumulative[i]`` = pixels with value ``<= i`` (memoized)."""
+        key = channel
+        with self._lock:
+            if key not in self._cumulative:
+                cumulative = np.cumsum(self.histogram(channel))
+                cumulative.setflags(write=False)
+                self._cumulative[key] = cumulative
+            return self._cumulative[key]
+
+    def cdf(self, channel="gray"):
+        return self.cumulative(channel) / max(self.total, 1)
+
+    # # 统计量
+
+    def mean(self, channel="gray"):
+        return float(self.histogram(channel) @ _LEVELS / max(self.total, 1))
+
+    def std(self, channel="gray"):
+        """Population standard deviation, as ``cv.meanStdDev``."""
+        hist = self.histogram(channel)
+        mean = self.mean(channel)
+        variance = hist @ (_LEVELS - mean) ** 2 / max(self.total, 1)
+        return float(np.sqrt(variance))
+
+    def percentile(self, q, channel="gray"):
+        """
+        Return the smallest value with at least ``q`` percent of the pixels at or below it.
+
+        :param q: Percentile in [0, 100], or an array of percentiles.
+        """
+        ranks = np.asarray(q, dtype=np.float64) / 100 * self.total
+        values = np.searchsorted(self.cumulative(channel), np.maximum(ranks, 1), side="left")
+        values = np.clip(values, 0, 255)
+        return int(values) if values.ndim == 0 else values
+
+    def median(self, channel="gray"):
+        return self.percentile(50, channel)
+
+    def entropy(self, channel="gray"):
+        """Shannon entropy in bits."""
+        hist = self.histogram(channel)
+        p = hist[hist > 0] / max(self.total, 1)
+        return float(-(p * np.log2(p)).sum())
+
+    def min(self, channel="gray"):
+        nonzero = np.flatnonzero(self.histogram(channel))
+        return int(nonzero[0]) if nonzero.size else 0
+
+    def max(self, channel="gray"):
+        nonzero = np.flatnonzero(self.histogram(channel))
+        return int(nonzero[-1]) if nonzero.size else 0
+
+    def summary(self, channel="gray"):
+        """Return ``{"mean", "std", "min", "max", "median", "entropy"}`` of ``channel``."""
+        return {
+            "mean": self.mean(channel),
+            "std": self.std(channel),
+            "min": self.min(channel),
+            "max": self.max(channel),
+            "median": self.median(channel),
+            "entropy": self.entropy(channel),
+        }
+
+    # # 由直方图推导的变换
+
+    def equalization_lut(self, channel="gray"):
+        """
+        Histogram-equalization lookup table, identical to ``cv.equalizeHist``.
+
+        The table is memoized and read-only.
+        """
+
+        def build():
+            hist = self.histogram(channel)
+            lut = np.zeros(256, dtype=np.uint8)
+            nonzero = np.flatnonzero(hist)
+            if nonzero.size == 0:
+                return lut
+            first = nonzero[0]
+            if hist[first] == self.total:
+                lut[:] = first
+                return lut
+            # 与 OpenCV 相同: float32 比例, 第一个非零级映射为 0, 舍入到最近
+            scale = np.float32(255.0 / (self.total - hist[first]))
+            sums = np.cumsum(hist[first + 1:]).astype(np.float32)
+            lut[first + 1:] = np.clip(np.rint(sums * scale), 0, 255)
+            return lut
+
+        lut = self.memo(("equalization_lut", channel), build)
+        lut.setflags(write=False)
+        return lut
+
+    def apply_lut(self, lut, channel="gray"):
+        """
+        Return the statistics of ``channel`` after mapping it through ``lut``.
+
+        The histogram of the output is gathered from the input histogram, so
+        no pixel is read: ``out[lut[i]] += hist[i]``.
+        """
+        hist = np.bincount(np.asarray(lut, dtype=np.intp), weights=self.histogram(channel), minlength=256)
+        hist = hist.astype(np.int64)
+        return ImageStatistics(hist[None], hist, ("gray",))
+
+    def memo(self, key, compute):
+        """Return the object cached under ``key``, calling ``compute()`` the first time."""
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+        value = compute()
+        with self._lock:
+            return self._memo.setdefault(key, value)
+
+
+# 数组键 -> {通道顺序: 统计量}; 数组被回收后在下次调用时移除
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+_KEYS = IdentityKeys()
+
+
+def image_statistics(image, order="bgr"):
+    """
+    Return the ``ImageStatistics`` of ``image``, cached for immutable arrays.
+
+    Arrays that cannot change (``IOImages.identity.is_immutable``) have their
+    statistics cached until they are garbage collected. Anything else,
+    including read-only views of writeable arrays, is measured on every call.
+    """
+    identity = _KEYS.key(image)
+    if identity is None:
+        return ImageStatistics.from_image(image, order)
+    with _CACHE_LOCK:
+        for dead in _KEYS.collected():
+            _CACHE.pop(dead, None)
+        statistics = _CACHE.get(identity, {}).get(order)
+    if statistics is None:
+        statistics = ImageStatistics.from_image(image, order)
+        with _CACHE_LOCK:
+            statistics = _CACHE.setdefault(identity, {}).setdefault(order, statistics)
+    return statistics
+
+
+def equalize(image, statistics=None, out=None):
+    """
+    Histogram equalization of a uint8 gray image, identical to ``cv.equalizeHist``.
+
+    :param image: uint8 gray image.
+    :param statistics: Its ``ImageStatistics`` if already available.
+    :param out: Optional uint8 output buffer.
+    """
+    if image.ndim != 2:
+        raise ValueError(f"Expected a gray image, got shape {image.shape}")
+    statistics = statistics or image_statistics(image)
+    return apply_lut(image, statistics.equalization_lut(), out=out)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Pointwise (intensity) transforms compiled into 256-entry lookup tables.
+
+A uint8 image has only 256 possible input values, so any intensity mapping
+``s = T(r)`` can be evaluated once per value and applied to the whole image
+with a single table lookup (``cv.LUT``) instead of evaluating ``np.log`` or
+``**gamma`` on every pixel in float64.
+
+Curves are registered by name with ``register_curve`` and work on intensities
+normalized to [0, 1]. Compiled tables are memoized by ``(name, parameters)``,
+so asking for the same curve twice (e.g. a Streamlit slider that did not move)
+costs nothing.
+
+Example:
+    log_image = apply_curve(img_gray, "log", c=1.0)
+    lut = get_lut("power", c=1.0, gamma=0.5)
+    gamma_image = apply_lut(img_gray, lut)
+    luts = curve_luts("power", gamma=np.linspace(0.2, 3.0, 15))  # (15, 256)
+"""
+import functools
+
+import numpy as np
+import cv2 as cv
+
+__all__ = [
+    "register_curve",
+    "available_curves",
+    "lut_from_function",
+    "get_lut",
+    "curve_luts",
+    "apply_lut",
+    "apply_curve",
+]
+
+# 输入灰度级 0-255 归一化到 [0, 1]
+_LEVELS = np.arange(256, dtype=np.float64) / 255.0
+
+_CURVES = {}
+
+
+def register_curve(name):
+    """
+    Register an intensity mapping under ``name``.
+
+    The decorated function receives the normalized levels (float64 array in
+    [0, 1]) followed by keyword parameters, and returns values in the same
+    normalized range. Results outside [0, 1] are saturated.
+    """
+
+    def decorator(func):
+        if name in _CURVES:
+            raise ValueError(f"Curve '{name}' is already registered")
+        _CURVES[name] = func
+        return func
+
+    return decorator
+
+
+def available_curves():
+    """Return the names of the registered curves."""
+    return sorted(_CURVES)
+
+
+@register_curve("identity")
+def identity_curve(r):
+    return r
+
+
+@register_curve("negative")
+def negative_curve(r):
+    return 1.0 - r
+
+
+@register_curve("log")
+def log_curve(r, c=1.0):
+    # 对数变换: s = c * log(1 + r)
+    return c * np.log1p(r)
+
+
+@register_curve("power")
+def power_curve(r, c=1.0, gamma=1.0):
+    # 幂次变换: s = c * r ^ gamma
+    return c * np.power(r, gamma)
+
+
+def lut_from_function(func, **params):
+    """
+    Compile ``func(levels, **params)`` into a uint8 -> uint8 lookup table.
+
+    Values are scaled back to [0, 255], saturated and truncated the same way
+    ``np.uint8(transformed * 255)`` did for in-range values.
+    """
+    values = np.asarray(func(_LEVELS, **params), dtype=np.float64) * 255.0
+    values = np.nan_to_num(values, nan=0.0, posinf=255.0, neginf=0.0)
+    return np.clip(values, 0, 255).astype(np.uint8)
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_lut(name, params):
+    lut = lut_from_function(_CURVES[name], **dict(params))
+    lut.setflags(write=False)
+    return lut
+
+
+def get_lut(name, **params):
+    """
+    Return the (read-only, memoized) lookup table for a registered curve.
+
+    :param name: Name of a curve registered with ``register_curve``.
+    :param params: Curve parameters, e.g. ``c=1.0, gamma=0.5``.
+    :return: A read-only uint8 array of 256 entries.
+    """
+    if name not in _CURVES:
+        raise KeyError(f"Unknown curve '{name}', available: {available_curves()}")
+    return _cached_lut(name, tuple(sorted(params.items())))
+
+
+def curve_luts(name, **params):
+    """
+    Compile a registered curve for a whole axis of parameter values at once.
+
+    Each parameter is a scalar or a 1-D sequence of ``P`` values (all
+    sequences of the same length). The curve is evaluated once on a
+    (P, 256) grid by broadcasting, instead of once per parameter value.
+
+    :return: A (P, 256) uint8 array; row ``i`` equals ``get_lut`` with the
+        ``i``-th value of every sequence.
+    """
+    if name not in _CURVES:
+        raise KeyError(f"Unknown curve '{name}', available: {available_curves()}")
+    arrays = {key: np.asarray(value, dtype=np.float64) for key, value in params.items()}
+    sizes = {array.size for array in arrays.values() if array.ndim}
+    if len(sizes) > 1:
+        raise ValueError(f"Parameter sequences differ in length: {sorted(sizes)}")
+    count = sizes.pop() if sizes else 1
+    # 参数为列向量, 灰度级为行向量: 一次调用得到 (P, 256) 的全部取值
+    columns = {key: array.reshape(-1, 1) if array.ndim else array for key, array in arrays.items()}
+    curve = _CURVES[name]
+    luts = lut_from_function(lambda r, **values: curve(r[None, :], **values), **columns)
+    return np.ascontiguousarray(np.broadcast_to(luts, (count, 256)))
+
+
+def apply_lut(image, lut, out=None):
+    """
+    Apply a 256-entry lookup table to every channel of a uint8 image.
+
+    :param image: uint8 image of any shape/channel count.
+    :param lut: uint8 array of 256 entries.
+    :param out: Optional uint8 buffer of the same shape as ``image``.
+    :return: The transformed image (``out`` if given).
+    """
+    if image.dtype != np.uint8:
+        raise TypeError(f"Lookup tables need uint8 input, got {image.dtype}")
+    if image.size and (image.ndim == 2 or (image.ndim == 3 and image.shape[2] <= 4)):
+        return cv.LUT(image, lut, dst=out)
+    # cv.LUT 只支持至多 4 通道的二维图像, 其余情况退回 np.take
+    return np.take(lut, image, out=out)
+
+
+def apply_curve(image, name, out=None, **params):
+    """Apply the registered curve ``name`` to ``image`` through its lookup table."""
+    return apply_lut(image, get_lut(name, **params), out=out)
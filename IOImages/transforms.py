@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Geometric transformations composed into a single resampling.
+
+A ``Transform`` is a chain of translate / rotate / scale / flip / shear /
+affine / perspective steps. Every step only multiplies a 3x3 matrix, so a
+chain of any length is applied with exactly one ``cv.warpAffine`` (or
+``cv.warpPerspective`` when a perspective step is present): the image is
+interpolated once instead of losing sharpness and time at every step.
+
+When the composed matrix only permutes pixels (flips, 90 degree rotations,
+transposition, identity) no interpolation is needed at all: ``apply`` uses
+``cv.flip`` / ``cv.rotate`` / ``cv.transpose``, or returns a zero-copy numpy
+view with ``view=True``.
+
+Coordinates are pixel centers (``(0, 0)`` is the center of the top-left
+pixel), angles are degrees counter-clockwise as in ``cv.getRotationMatrix2D``.
+Each step knows the canvas size left by the previous one, so "rotate about the
+center" and "flip" refer to the current, not the original, image.
+
+Example:
+    chain = Transform(img.shape).rotate(30, expand=True).scale(0.5).flip("horizontal")
+    out = chain.apply(img)          # one warpAffine
+    chain.method                    # "warpAffine"
+    Transform(img.shape).flip("vertical").rotate(90, expand=True).apply(img, view=True)
+"""
+import numpy as np
+import cv2 as cv
+
+__all__ = ["Transform", "STEPS"]
+
+# 步骤名 -> 方法名; 页面和批处理用 (名称, 参数) 描述变换链
+STEPS = ("translate", "rotate", "scale", "flip", "shear", "affine", "perspective")
+
+# 判定矩阵元素为整数时的容差
+_EPS = 1e-9
+
+# (转置, 行反向, 列反向) -> 无插值实现
+_PERMUTATIONS = {
+    (False, False, False): ("identity", lambda image: image),
+    (False, False, True): ("flip", lambda image: cv.flip(image, 1)),
+    (False, True, False): ("flip", lambda image: cv.flip(image, 0)),
+    (False, True, True): ("flip", lambda image: cv.flip(image, -1)),
+    (True, False, False): ("transpose", cv.transpose),
+    (True, True, False): ("rotate", lambda image: cv.rotate(image, cv.ROTATE_90_COUNTERCLOCKWISE)),
+    (True, False, True): ("rotate", lambda image: cv.rotate(image, cv.ROTATE_90_CLOCKWISE)),
+    (True, True, True): ("transpose", lambda image: cv.flip(cv.transpose(image), -1)),
+}
+
+
+def _size(shape):
+    """``(width, height)`` of an image shape ``(H, W[, C])``."""
+    return int(shape[1]), int(shape[0])
+
+
+def _cos_sin(angle):
+    # 90 度的整数倍取精确值, 使组合后的矩阵仍能走无插值路径
+    quarter, remainder = divmod(float(angle), 90.0)
+    if abs(remainder) < _EPS:
+        return ((1, 0), (0, 1), (-1, 0), (0, -1))[int(quarter) % 4]
+    radians = np.deg2rad(angle)
+    return np.cos(radians), np.sin(radians)
+
+
+class Transform:
+    """
+    An immutable chain of geometric steps, stored as one 3x3 matrix.
+
+    Every step method returns a new ``Transform``; the matrix maps input pixel
+    coordinates to output pixel coordinates (the ``M`` of ``cv.warpAffine``).
+
+    Attributes:
+        matrix (np.ndarray): (3, 3) float64 composed matrix, read-only.
+        input_size (tuple): ``(width, height)`` of the images the chain applies to.
+        size (tuple): ``(width, height)`` of the output canvas.
+        steps (tuple): ``(name, params)`` of every step, for display and ``from_steps``.
+    """
+
+    def __init__(self, shape):
+        """
+        :param shape: Shape ``(H, W[, C])`` of the images the chain applies to.
+        """
+        self.input_size = self.size = _size(shape)
+        self.matrix = np.eye(3)
+        self.matrix.setflags(write=False)
+        self.steps = ()
+
+    @classmethod
+    def _derive(cls, input_size, matrix, size, steps):
+        transform = cls.__new__(cls)
+        transform.input_size = input_size
+        transform.size = (int(size[0]), int(size[1]))
+        transform.matrix = np.array(matrix, dtype=np.float64)
+        transform.matrix.setflags(write=False)
+        transform.steps = tuple(steps)
+        return transform
+
+    @classmethod
+    def from_steps(cls, shape, steps):
+        """
+        Build a chain from ``(name, params)`` pairs, e.g. ``[("rotate", {"angle": 30})]``.
+
+        :param steps: Iterable of step names from ``STEPS`` and keyword arguments.
+        """
+        transform = cls(shape)
+        for name, params in steps:
+            if name not in STEPS:
+                raise ValueError(f"Unknown step '{name}', available: {', '.join(STEPS)}")
+            transform = getattr(transform, name)(**params)
+        return transform
+
+    def __repr__(self):
+        names = " -> ".join(name for name, _ in self.steps) or "identity"
+        return f"Transform({names}, {self.input_size} -> {self.size}, {self.method})"
+
+    def key(self):
+        """Hashable identity of the chain (matrix and sizes), for result caches."""
+        return (self.matrix.tobytes(), self.input_size, self.size)
+
+    def _then(self, matrix, size, name, params):
+        matrix = np.asarray(matrix, dtype=np.float64) @ self.matrix
+        return self._derive(self.input_size, matrix, size, self.steps + ((name, params),))
+
+    @property
+    def center(self):
+        """Center of the current canvas in pixel coordinates."""
+        return (self.size[0] - 1) / 2, (self.size[1] - 1) / 2
+
+    # # 步骤
+
+    def translate(self, tx=0.0, ty=0.0):
+        """Shift by ``(tx, ty)`` pixels; the canvas size is kept."""
+        matrix = [[1, 0, tx], [0, 1, ty], [0, 0, 1]]
+        return self._then(matrix, self.size, "translate", {"tx": tx, "ty": ty})
+
+    def rotate(self, angle, center=None, expand=False):
+        """
+        Rotate counter-clockwise by ``angle`` degrees.
+
+        :param center: Rotation center, default the center of the current canvas.
+        :param expand: Enlarge the canvas to hold the whole rotated image
+            (``rotate(90, expand=True)`` is an exact quarter turn).
+        """
+        cos, sin = _cos_sin(angle)
+        cx, cy = self.center if center is None else center
+        # 与 cv.getRotationMatrix2D 相同 (y 轴向下时逆时针为正)
+        matrix = np.array(
+            [[cos, sin, (1 - cos) * cx - sin * cy], [-sin, cos, sin * cx + (1 - cos) * cy], [0, 0, 1]],
+            dtype=np.float64,
+        )
+        size = self.size
+        if expand:
+            matrix, size = _fit_canvas(matrix, self.size)
+        params = {"angle": angle, "center": center, "expand": expand}
+        return self._then(matrix, size, "rotate", params)
+
+    def scale(self, fx, fy=None, resize=True):
+        """
+        Scale by ``fx`` horizontally and ``fy`` (default ``fx``) vertically.
+
+        :param resize: Resize the canvas with the image, on the same pixel grid
+            as ``cv.resize``; otherwise zoom about the canvas center.
+        """
+        fy = fx if fy is None else fy
+        if fx <= 0 or fy <= 0:
+            raise ValueError(f"Scale factors must be positive, got ({fx}, {fy}); use flip to mirror")
+        if resize:
+            # 像素面积对齐: x' = fx * (x + 0.5) - 0.5
+            matrix = [[fx, 0, 0.5 * (fx - 1)], [0, fy, 0.5 * (fy - 1)], [0, 0, 1]]
+            size = (max(1, round(self.size[0] * fx)), max(1, round(self.size[1] * fy)))
+        else:
+            cx, cy = self.center
+            matrix = [[fx, 0, (1 - fx) * cx], [0, fy, (1 - fy) * cy], [0, 0, 1]]
+            size = self.size
+        return self._then(matrix, size, "scale", {"fx": fx, "fy": fy, "resize": resize})
+
+    def flip(self, axis="horizontal"):
+        """Mirror the canvas: "horizontal" (left-right), "vertical" (up-down) or "both"."""
+        if axis not in ("horizontal", "vertical", "both"):
+            raise ValueError(f"Unknown flip axis '{axis}', expected horizontal, vertical or both")
+        width, height = self.size
+        sx = -1 if axis in ("horizontal", "both") else 1
+        sy = -1 if axis in ("vertical", "both") else 1
+        matrix = [[sx, 0, (width - 1) if sx < 0 else 0], [0, sy, (height - 1) if sy < 0 else 0], [0, 0, 1]]
+        return self._then(matrix, self.size, "flip", {"axis": axis})
+
+    def shear(self, sx=0.0, sy=0.0):
+        """Shear about the canvas center: ``x' = x + sx * y``, ``y' = y + sy * x``."""
+        cx, cy = self.center
+        matrix = [[1, sx, -sx * cy], [sy, 1, -sy * cx], [0, 0, 1]]
+        return self._then(matrix, self.size, "shear", {"sx": sx, "sy": sy})
+
+    def affine(self, matrix, size=None):
+        """
+        Apply an arbitrary affine (2x3) or projective (3x3) matrix.
+
+        :param size: Output ``(width, height)``, default the current canvas.
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.shape == (2, 3):
+            matrix = np.vstack([matrix, [0, 0, 1]])
+        if matrix.shape != (3, 3):
+            raise ValueError(f"Expected a 2x3 or 3x3 matrix, got shape {matrix.shape}")
+        size = self.size if size is None else size
+        return self._then(matrix, size, "affine", {"matrix": matrix.tolist(), "size": size})
+
+    def perspective(self, src, dst, size=None):
+        """
+        Map the 4 points ``src`` onto the 4 points ``dst`` (``cv.getPerspectiveTransform``).
+
+        :param src: (4, 2) points on the current canvas.
+        :param dst: (4, 2) points on the output canvas.
+        :param size: Output ``(width, height)``, default the current canvas.
+        """
+        matrix = cv.getPerspectiveTransform(np.float32(src), np.float32(dst)).astype(np.float64)
+        size = self.size if size is None else size
+        params = {"src": np.asarray(src).tolist(), "dst": np.asarray(dst).tolist(), "size": size}
+        return self._then(matrix, size, "perspective", params)
+
+    # # 组合
+
+    def then(self, other):
+        """Compose with ``other``, whose input must be this chain's output canvas."""
+        if other.input_size != self.size:
+            raise ValueError(f"Cannot chain: output {self.size} does not match input {other.input_size}")
+        return self._derive(self.input_size, other.matrix @ self.matrix, other.size, self.steps + other.steps)
+
+    def inverse(self):
+        """The transform mapping the output canvas back onto the input."""
+        return self._derive(self.size, np.linalg.inv(self.matrix), self.input_size, (("inverse", {}),))
+
+    def rescaled(self, shape):
+        """
+        The same chain for a resized copy of the input, e.g. a pyramid level.
+
+        Translations and the output canvas are scaled by the same factors, so
+        the result is (up to rounding) the full-resolution output resized.
+
+        :param shape: Shape ``(H, W[, C])`` of the resized input.
+        """
+        input_size = _size(shape)
+        fx, fy = input_size[0] / self.input_size[0], input_size[1] / self.input_size[1]
+        matrix = np.diag([fx, fy, 1.0]) @ self.matrix @ np.diag([1 / fx, 1 / fy, 1.0])
+        size = (max(1, round(self.size[0] * fx)), max(1, round(self.size[1] * fy)))
+        return self._derive(input_size, matrix, size, self.steps)
+
+    def map_points(self, points):
+        """Map (N, 2) input pixel coordinates to output coordinates."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        return cv.perspectiveTransform(points, self.matrix).reshape(-1, 2)
+
+    # # 执行
+
+    @property
+    def is_affine(self):
+        return np.allclose(self.matrix[2], [0, 0, 1], atol=_EPS)
+
+    def _permutation(self):
+        """``(transpose, flip_rows, flip_columns)`` when the chain only permutes pixels, else None."""
+        matrix = self.matrix
+        if not self.is_affine or not np.allclose(matrix, np.rint(matrix), atol=_EPS):
+            return None
+        (a, b, tx), (c, d, ty) = np.rint(matrix[:2]).astype(int)
+        if b == 0 and c == 0 and abs(a) == 1 and abs(d) == 1:
+            transpose, column_sign, row_sign = False, a, d
+        elif a == 0 and d == 0 and abs(b) == 1 and abs(c) == 1:
+            transpose, column_sign, row_sign = True, b, c
+        else:
+            return None
+        # 输入必须恰好铺满输出画布 (无平移, 无裁剪)
+        width, height = self.input_size
+        out_width, out_height = (height, width) if transpose else (width, height)
+        corners = self.map_points([[0, 0], [width - 1, height - 1]])
+        if self.size != (out_width, out_height) or not np.allclose(
+            np.sort(corners, axis=0), [[0, 0], [out_width - 1, out_height - 1]], atol=_EPS
+        ):
+            return None
+        return transpose, row_sign < 0, column_sign < 0
+
+    @property
+    def method(self):
+        """How ``apply`` resamples: identity, flip, rotate, transpose, warpAffine or warpPerspective."""
+        permutation = self._permutation()
+        if permutation is not None:
+            return _PERMUTATIONS[permutation][0]
+        return "warpAffine" if self.is_affine else "warpPerspective"
+
+    def apply(self, image, interpolation=cv.INTER_LINEAR, border_mode=cv.BORDER_REPLICATE, border_value=0, view=False):
+        """
+        Resample ``image`` through the whole chain at once.
+
+        :param image: Image of size ``input_size``.
+        :param interpolation: ``cv.INTER_*`` flag of the warp.
+        :param border_mode: ``cv.BORDER_*`` mode for pixels mapped from outside
+            the image. The default repeats the edge pixels, so ``scale``
+            matches ``cv.resize`` within one level, edges included; with
+            ``cv.BORDER_CONSTANT`` the outer rows and columns blend with
+            ``border_value``, which also fills the uncovered corners of
+            ``rotate(expand=True)``.
+        :param border_value: Fill value for ``cv.BORDER_CONSTANT``.
+        :param view: For pure pixel permutations, return a zero-copy numpy view
+            of ``image`` instead of a contiguous copy.
+        """
+        if _size(image.shape) != self.input_size:
+            raise ValueError(f"Expected an image of size {self.input_size}, got {_size(image.shape)}")
+        permutation = self._permutation()
+        if permutation is not None:
+            if view:
+                transpose, flip_rows, flip_columns = permutation
+                output = image.swapaxes(0, 1) if transpose else image
+                return output[:: -1 if flip_rows else 1, :: -1 if flip_columns else 1]
+            return _PERMUTATIONS[permutation][1](image)
+        if self.is_affine:
+            return cv.warpAffine(
+                image,
+                self.matrix[:2],
+                self.size,
+                flags=interpolation,
+                borderMode=border_mode,
+                borderValue=border_value,
+            )
+        return cv.warpPerspective(
+            image,
+            self.matrix,
+            self.size,
+            flags=interpolation,
+            borderMode=border_mode,
+            borderValue=border_value,
+        )
+
+    __call__ = apply
+
+
+def _fit_canvas(matrix, size):
+    """Shift ``matrix`` so the transformed canvas starts at the origin; return it with the new size."""
+    width, height = size
+    # 以像素边界 (而非像素中心) 计算外接矩形
+    edges = np.float64([[-0.5, -0.5], [width - 0.5, -0.5], [-0.5, height - 0.5], [width - 0.5, height - 0.5]])
+    mapped = edges @ matrix[:2, :2].T + matrix[:2, 2]
+    low, high = mapped.min(axis=0), mapped.max(axis=0)
+    new_size = np.maximum(1, np.rint(high - low - 1e-6).astype(int))
+    matrix = matrix.copy()
+    matrix[:2, 2] -= low + 0.5
+    return matrix, (int(new_size[0]), int(new_size[1]))
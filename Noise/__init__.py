@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Noise: seeded Gaussian, salt-and-pepper, Poisson and speckle noise models"""
+
+from .noise import (
+    image_rng,
+    spawn_seeds,
+    as_generator,
+    register_noise,
+    available_noises,
+    add_noise,
+    gaussian_noise,
+    salt_and_pepper_noise,
+    poisson_noise,
+    speckle_noise,
+)
+
+__all__ = [
+    "image_rng",
+    "spawn_seeds",
+    "as_generator",
+    "register_noise",
+    "available_noises",
+    "add_noise",
+    "gaussian_noise",
+    "salt_and_pepper_noise",
+    "poisson_noise",
+    "speckle_noise",
+]
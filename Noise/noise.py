@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Seeded noise models for augmentation and denoising benchmarks.
+
+All models draw from ``np.random.Generator`` and work in float32: the noisy
+values are computed in a float32 scratch buffer, rounded and saturated to
+the range of the image dtype, and written to the output. Unlike casting the
+raw noise to uint8 before ``cv.add`` (which wraps negative noise around to
+large positive values), darkening noise is kept and clipped at 0.
+
+Images are processed in chunks of rows, so the scratch memory stays bounded
+for very large images. Passing ``out=image`` applies the noise in place.
+Random numbers are drawn sequentially, so the output for a given generator
+does not depend on the chunk size.
+
+Models (registered by name with ``register_noise``):
+
+- gaussian:       x + N(mean, sigma)
+- salt_and_pepper: a fraction ``amount`` of the pixels set to the dtype
+  minimum or maximum (all channels of a pixel together)
+- poisson:        Poisson(x * scale) / scale, i.e. shot noise with ``scale``
+  photons per gray level
+- speckle:        x + x * N(0, sigma)
+
+Seeding: ``image_rng(seed, key)`` derives an independent generator from a
+run seed and a per-image key such as the file name, so the noise of an image
+is the same whichever process or order it is generated in. ``spawn_seeds``
+splits a seed into independent child ``SeedSequence`` objects for worker
+processes.
+
+Example:
+    rng = image_rng(seed=0, key="bz_color.jpg")
+    noisy = add_noise(image, "gaussian", rng, sigma=25)
+    add_noise(image, "salt_and_pepper", rng, amount=0.02, out=image)
+"""
+import hashlib
+
+import numpy as np
+
+__all__ = [
+    "image_rng",
+    "spawn_seeds",
+    "as_generator",
+    "register_noise",
+    "available_noises",
+    "add_noise",
+    "gaussian_noise",
+    "salt_and_pepper_noise",
+    "poisson_noise",
+    "speckle_noise",
+]
+
+# 每块 float32 缓冲区最多 4M 个元素 (16 MB)
+_CHUNK_ELEMENTS = 4 * 1024**2
+
+_NOISES = {}
+
+
+def _key_entropy(key):
+    if isinstance(key, (int, np.integer)):
+        return int(key)
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def image_rng(seed, key):
+    """
+    Return the generator for one image of a seeded run.
+
+    :param seed: Run seed (int).
+    :param key: Per-image key, e.g. the file name or an index. Strings are
+        hashed, so the same key always gives the same noise.
+    """
+    sequence = np.random.SeedSequence(seed, spawn_key=(_key_entropy(key),))
+    return np.random.default_rng(sequence)
+
+
+def spawn_seeds(seed, count):
+    """Split ``seed`` into ``count`` independent ``SeedSequence`` objects for workers."""
+    return np.random.SeedSequence(seed).spawn(count)
+
+
+def as_generator(rng):
+    """Accept a Generator, SeedSequence, int or None and return a Generator."""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng)
+
+
+def register_noise(name):
+    """
+    Register a noise model under ``name``.
+
+    The decorated function receives a chunk of the source image, a float32
+    buffer of the same shape to fill with the noisy values, the generator and
+    keyword parameters. Saturation and the conversion back to the image dtype
+    are done by ``add_noise``.
+    """
+
+    def decorator(func):
+        if name in _NOISES:
+            raise ValueError(f"Noise '{name}' is already registered")
+        _NOISES[name] = func
+        return func
+
+    return decorator
+
+
+def available_noises():
+    """Return the names of the registered noise models."""
+    return sorted(_NOISES)
+
+
+def _value_range(dtype):
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return info.min, info.max
+    # 浮点图像约定取值范围为 [0, 1]
+    return 0.0, 1.0
+
+
+def add_noise(image, name, rng=None, out=None, chunk_rows=None, **params):
+    """
+    Apply the noise model ``name`` to ``image``.
+
+    :param image: Gray or multi-channel image (integer or float dtype).
+    :param name: Registered noise model.
+    :param rng: Generator, SeedSequence, int seed or None.
+    :param out: Output array with the image's shape and dtype; may be
+        ``image`` itself for in-place application.
+    :param chunk_rows: Rows per chunk; by default chunks of about 16 MB of
+        float32 scratch.
+    :return: The noisy image (``out`` if given).
+    """
+    try:
+        model = _NOISES[name]
+    except KeyError:
+        raise KeyError(
+            f"Unknown noise '{name}', available: {', '.join(available_noises())}"
+        ) from None
+    rng = as_generator(rng)
+    if out is None:
+        out = np.empty_like(image)
+    elif out.shape != image.shape or out.dtype != image.dtype:
+        raise ValueError(
+            f"out must match the image, got {out.dtype} {out.shape} for {image.dtype} {image.shape}"
+        )
+
+    height = image.shape[0]
+    if chunk_rows is None:
+        row_elements = max(image[:1].size, 1)
+        chunk_rows = max(_CHUNK_ELEMENTS // row_elements, 1)
+    scratch = np.empty((min(chunk_rows, height),) + image.shape[1:], dtype=np.float32)
+    low, high = _value_range(image.dtype)
+    integer = np.issubdtype(image.dtype, np.integer)
+
+    for start in range(0, height, chunk_rows):
+        source = image[start:start + chunk_rows]
+        buffer = scratch[: len(source)]
+        model(source, buffer, rng, **params)
+        if integer:
+            np.rint(buffer, out=buffer)
+        np.clip(buffer, low, high, out=buffer)
+        np.copyto(out[start:start + chunk_rows], buffer, casting="unsafe")
+    return out
+
+
+@register_noise("gaussian")
+def _gaussian(source, buffer, rng, mean=0.0, sigma=25.0):
+    rng.standard_normal(dtype=np.float32, out=buffer)
+    buffer *= np.float32(sigma)
+    buffer += np.float32(mean)
+    buffer += source
+
+
+@register_noise("salt_and_pepper")
+def _salt_and_pepper(source, buffer, rng, amount=0.05, salt_vs_pepper=0.5):
+    low, high = _value_range(source.dtype)
+    draws = rng.random(source.shape[:2], dtype=np.float32)
+    buffer[...] = source
+    # draws < 胡椒比例 置为最小值, draws >= 1 - 盐比例 置为最大值
+    buffer[draws < amount * (1 - salt_vs_pepper)] = low
+    buffer[draws >= 1 - amount * salt_vs_pepper] = high
+
+
+@register_noise("poisson")
+def _poisson(source, buffer, rng, scale=1.0):
+    counts = rng.poisson(source * np.float64(scale))
+    np.divide(counts, scale, out=buffer, casting="unsafe")
+
+
+@register_noise("speckle")
+def _speckle(source, buffer, rng, sigma=0.1):
+    rng.standard_normal(dtype=np.float32, out=buffer)
+    buffer *= np.float32(sigma)
+    buffer += np.float32(1)
+    buffer *= source
+
+
+def gaussian_noise(image, rng=None, mean=0.0, sigma=25.0, out=None):
+    """Additive Gaussian noise ``N(mean, sigma)`` in gray levels."""
+    return add_noise(image, "gaussian", rng, out=out, mean=mean, sigma=sigma)
+
+
+def salt_and_pepper_noise(image, rng=None, amount=0.05, salt_vs_pepper=0.5, out=None):
+    """Impulse noise on a fraction ``amount`` of the pixels."""
+    return add_noise(
+        image, "salt_and_pepper", rng, out=out, amount=amount, salt_vs_pepper=salt_vs_pepper
+    )
+
+
+def poisson_noise(image, rng=None, scale=1.0, out=None):
+    """Shot noise with ``scale`` photons per gray level (higher is less noisy)."""
+    return add_noise(image, "poisson", rng, out=out, scale=scale)
+
+
+def speckle_noise(image, rng=None, sigma=0.1, out=None):
+    """Multiplicative noise ``x + x * N(0, sigma)``."""
+    return add_noise(image, "speckle", rng, out=out, sigma=sigma)
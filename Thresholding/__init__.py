@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Thresholding: histogram-driven global, multi-level and Otsu thresholds, and adaptive thresholds"""
+
+from .histogram import (
+    gray_histogram,
+    ThresholdHistogram,
+    thresholds_lut,
+    apply_thresholds,
+    binarize,
+)
+from .adaptive import AdaptiveThresholder
+
+__all__ = [
+    "gray_histogram",
+    "ThresholdHistogram",
+    "thresholds_lut",
+    "apply_thresholds",
+    "binarize",
+    "AdaptiveThresholder",
+]
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive thresholding on reusable summed-area tables.
+
+``cv.adaptiveThreshold`` recomputes the local means from scratch for every
+``blockSize``/``C`` pair. ``AdaptiveThresholder`` instead builds the summed-area
+tables (integral images) of the pixels and of their squares once per image.
+The sum, mean and standard deviation of any window then cost four table
+lookups per pixel, independent of the block size, so a sweep over many block
+sizes costs one table build plus one cheap pass per block size.
+
+Three local threshold rules are provided, all producing ``maxval`` where the
+pixel is greater than the local threshold ``T``:
+
+- mean:     T = m - C
+- Niblack:  T = m + k * s
+- Sauvola:  T = m * (1 + k * (s / R - 1))
+
+where ``m`` and ``s`` are the mean and standard deviation of the
+``block_size x block_size`` window. Windows are clipped at the image border
+(and averaged over the pixels they actually cover), whereas OpenCV replicates
+the border pixels, so results can differ from ``cv.adaptiveThreshold`` within
+``block_size // 2`` pixels of the border. ``mean(..., border="replicate")``
+uses OpenCV's border instead and matches ``cv.adaptiveThreshold`` everywhere;
+its table is built on the image padded by the largest radius asked for so far.
+
+Example:
+    thresholder = AdaptiveThresholder(img_gray)
+    for block_size in range(3, 42, 2):
+        binary = thresholder.mean(block_size, C=8)
+"""
+import numpy as np
+import cv2 as cv
+
+__all__ = ["AdaptiveThresholder"]
+
+
+class AdaptiveThresholder:
+    """
+    Local mean, Niblack and Sauvola thresholds from cached summed-area tables.
+
+    The tables are built lazily on first use and kept on the instance. The
+    local statistics of the most recent block size are memoized as well, so
+    trying several ``C``/``k`` values for one block size reuses them.
+
+    Attributes:
+        image (np.ndarray): The uint8 gray image being thresholded.
+    """
+
+    def __init__(self, image):
+        if image.dtype != np.uint8 or image.ndim != 2:
+            raise TypeError(
+                f"Expected a 2-D uint8 gray image, got {image.dtype} {image.shape}"
+            )
+        self.image = image
+        self._sum = None
+        self._sqsum = None
+        self._padded = None
+        self._padding = 0
+        self._stats = {}
+
+    @property
+    def tables(self):
+        """
+        The ``(sum, sqsum)`` summed-area tables, shape (H + 1, W + 1).
+
+        ``sum`` is int32 when the image is small enough for every entry to fit
+        (about 8 MP), otherwise float64; ``sqsum`` is float64. Both are exact.
+        """
+        if self._sum is None:
+            height, width = self.image.shape
+            exact_int32 = 255 * (height + 1) * (width + 1) < 2**31
+            self._sum, self._sqsum = cv.integral2(
+                self.image,
+                sdepth=cv.CV_32S if exact_int32 else cv.CV_64F,
+                sqdepth=cv.CV_64F,
+            )
+        return self._sum, self._sqsum
+
+    def _replicate_sums(self, block_size):
+        """Window sums over the border-replicated image; every window has ``block_size**2`` pixels."""
+        radius = block_size // 2
+        if self._padded is None or self._padding < radius:
+            # 表按目前最大的半径填充, 较小的块直接在其中偏移取值
+            padded = cv.copyMakeBorder(self.image, radius, radius, radius, radius, cv.BORDER_REPLICATE)
+            exact_int32 = 255 * (padded.shape[0] + 1) * (padded.shape[1] + 1) < 2**31
+            self._padded = cv.integral(padded, sdepth=cv.CV_32S if exact_int32 else cv.CV_64F)
+            self._padding = radius
+        table = self._padded
+        height, width = self.image.shape
+        top = self._padding - radius
+        bottom = top + block_size
+        sums = table[bottom:bottom + height, bottom:bottom + width] - table[top:top + height, bottom:bottom + width]
+        sums -= table[bottom:bottom + height, top:top + width]
+        sums += table[top:top + height, top:top + width]
+        return sums
+
+    @staticmethod
+    def _window_diff(table, radius, axis):
+        """
+        ``table[i + radius + 1] - table[i - radius]`` along ``axis`` with clipped indices.
+
+        Where the window fits inside the image the difference is two shifted
+        slices of the table; only the ``radius`` wide border bands fall back to
+        indexed gathers.
+        """
+        size = table.shape[axis] - 1
+        k = 2 * radius + 1
+        shape = list(table.shape)
+        shape[axis] = size
+        out = np.empty(shape, dtype=table.dtype)
+
+        def along(index):
+            return (slice(None),) * axis + (index,)
+
+        if size > 2 * radius:
+            np.subtract(
+                table[along(slice(k, None))],
+                table[along(slice(0, size + 1 - k))],
+                out=out[along(slice(radius, size - radius))],
+            )
+            border = np.r_[0:radius, size - radius:size]
+        else:
+            border = np.arange(size)
+        if border.size:
+            upper = np.clip(border + radius + 1, 0, size)
+            lower = np.clip(border - radius, 0, size)
+            out[along(border)] = np.take(table, upper, axis=axis) - np.take(
+                table, lower, axis=axis
+            )
+        return out
+
+    def window_sums(self, block_size, table=None):
+        """
+        Return the per-pixel window sums of ``table`` and the window pixel counts.
+
+        The four corner lookups are done separably, first along the rows and
+        then along the columns of the table, so each window sum costs two
+        subtractions regardless of the block size. Windows are clipped at the
+        image border.
+
+        :param block_size: Odd window size.
+        :param table: Summed-area table to use (default: the pixel sums).
+        :return: ``(sums, counts)``, both of the image's shape.
+        """
+        if block_size < 1 or block_size % 2 == 0:
+            raise ValueError(f"block_size must be a positive odd number, got {block_size}")
+        table = self.tables[0] if table is None else table
+        radius = block_size // 2
+
+        sums = self._window_diff(self._window_diff(table, radius, 0), radius, 1)
+
+        height, width = self.image.shape
+        row_counts = np.minimum(np.arange(height) + radius + 1, height) - np.maximum(
+            np.arange(height) - radius, 0
+        )
+        col_counts = np.minimum(np.arange(width) + radius + 1, width) - np.maximum(
+            np.arange(width) - radius, 0
+        )
+        counts = np.multiply.outer(row_counts.astype(np.int32), col_counts.astype(np.int32))
+        return sums, counts
+
+    def local_stats(self, block_size, with_std=True):
+        """
+        Return the local ``(mean, std)`` over ``block_size`` windows as float32.
+
+        The window sums are exact; only the derived moments are rounded to
+        float32, which is far below one gray level. ``std`` is None when
+        ``with_std`` is False. Only the most recent block size is memoized.
+        """
+        cached = self._stats.get(block_size)
+        if cached is not None and (cached[1] is not None or not with_std):
+            return cached
+
+        sums, counts = self.window_sums(block_size)
+        counts = counts.astype(np.float32)
+        mean = sums.astype(np.float32)
+        mean /= counts
+        std = None
+        if with_std:
+            sqsums, _ = self.window_sums(block_size, self.tables[1])
+            variance = sqsums.astype(np.float32)
+            variance /= counts
+            variance -= mean * mean
+            std = np.sqrt(np.maximum(variance, 0, out=variance), out=variance)
+
+        self._stats = {block_size: (mean, std)}
+        return mean, std
+
+    def _binarize(self, threshold, maxval):
+        return np.greater(self.image, threshold).view(np.uint8) * np.uint8(maxval)
+
+    def mean(self, block_size, C=0, maxval=255, border="clip"):
+        """
+        Adaptive mean threshold: ``T = local mean - C``.
+
+        Like OpenCV, the local mean is rounded to an integer level and ``C`` is
+        rounded up, so away from the border the result equals
+        ``cv.adaptiveThreshold(..., cv.ADAPTIVE_THRESH_MEAN_C, cv.THRESH_BINARY, ...)``.
+        The comparison is done on the integer window sums, without a float
+        mean image.
+
+        :param border: "clip" averages border windows over the pixels they
+            cover; "replicate" repeats the edge pixels like OpenCV, so the
+            result equals ``cv.adaptiveThreshold`` everywhere.
+        """
+        if border == "replicate":
+            if block_size < 3 or block_size % 2 == 0:
+                raise ValueError(f"block_size must be an odd number > 1, got {block_size}")
+            sums, counts = self._replicate_sums(block_size), block_size**2
+        elif border == "clip":
+            sums, counts = self.window_sums(block_size)
+        else:
+            raise ValueError(f"border must be 'clip' or 'replicate', got {border!r}")
+        # pixel > rint(sum / n) - c  <=>  rint(sum / n) <= q, q = pixel + c - 1
+        # <=>  2 * sum < (2q + 1) * n, 或相等且 q 为偶数 (四舍六入五成双)
+        offset = int(np.ceil(C)) - 1
+        bound = (2 * (255 + abs(offset)) + 1) * block_size**2
+        dtype = np.int32 if sums.dtype == np.int32 and bound < 2**31 else np.int64
+        q = self.image.astype(dtype)
+        q += offset
+        rhs = 2 * q + 1
+        rhs *= counts
+        lhs = sums.astype(dtype, copy=False) * 2
+        foreground = lhs < rhs
+        foreground |= (lhs == rhs) & ((q & 1) == 0)
+        return foreground.view(np.uint8) * np.uint8(maxval)
+
+    def niblack(self, block_size, k=-0.2, maxval=255):
+        """Niblack threshold: ``T = m + k * s``."""
+        mean, std = self.local_stats(block_size)
+        threshold = std * np.float32(k)
+        threshold += mean
+        return self._binarize(threshold, maxval)
+
+    def sauvola(self, block_size, k=0.2, R=128, maxval=255):
+        """Sauvola threshold: ``T = m * (1 + k * (s / R - 1))``."""
+        mean, std = self.local_stats(block_size)
+        # m * (1 + k * (s / R - 1)) = m * (1 - k) + m * s * k / R
+        threshold = std * np.float32(k / R)
+        threshold += np.float32(1 - k)
+        threshold *= mean
+        return self._binarize(threshold, maxval)
+
+    def clear(self):
+        """Drop the memoized local statistics (the tables are kept)."""
+        self._stats = {}
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark a block-size sweep of adaptive mean thresholding.
+
+Compares one ``cv.adaptiveThreshold`` call per block size (what
+``3_Adaptive-Thresholding.ipynb`` does) with ``AdaptiveThresholder``, which
+builds its summed-area tables once and answers every block size from them.
+Sauvola, which OpenCV does not provide, is compared with recomputing
+``cv.boxFilter``/``cv.sqrBoxFilter`` per block size. The test image is
+resized to the requested resolution.
+
+Usage:
+    python benchmark_adaptive.py [--width 4000] [--height 3000] [--sizes 20] [--C 8]
+"""
+import argparse
+import time
+
+import numpy as np
+import cv2 as cv
+
+import config
+from adaptive import AdaptiveThresholder
+
+
+def sauvola_with_box_filters(img_gray, block_size, k=0.2, R=128):
+    """Sauvola threshold recomputing the local moments with OpenCV box filters."""
+    size = (block_size, block_size)
+    mean = cv.boxFilter(img_gray, cv.CV_64F, size, borderType=cv.BORDER_REPLICATE)
+    sqmean = cv.sqrBoxFilter(img_gray, cv.CV_64F, size, borderType=cv.BORDER_REPLICATE)
+    std = np.sqrt(np.maximum(sqmean - mean**2, 0))
+    threshold = mean * (1 + k * (std / R - 1))
+    return np.where(img_gray > threshold, np.uint8(255), np.uint8(0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--sizes", type=int, default=20, help="Number of block sizes")
+    parser.add_argument("--C", type=float, default=8)
+    args = parser.parse_args()
+
+    img_gray = cv.imread(config.TEST_IMAGE, cv.IMREAD_GRAYSCALE)
+    img_gray = cv.resize(img_gray, (args.width, args.height), interpolation=cv.INTER_CUBIC)
+    block_sizes = [3 + 2 * i * 5 for i in range(args.sizes)]
+
+    start = time.perf_counter()
+    reference = [
+        cv.adaptiveThreshold(
+            img_gray, 255, cv.ADAPTIVE_THRESH_MEAN_C, cv.THRESH_BINARY, block_size, args.C
+        )
+        for block_size in block_sizes
+    ]
+    opencv_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    thresholder = AdaptiveThresholder(img_gray)
+    thresholder.tables
+    build_seconds = time.perf_counter() - start
+    results = [thresholder.mean(block_size, args.C) for block_size in block_sizes]
+    sat_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for block_size in block_sizes:
+        thresholder.sauvola(block_size)
+    sauvola_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for block_size in block_sizes:
+        sauvola_with_box_filters(img_gray, block_size)
+    box_seconds = time.perf_counter() - start
+
+    print(f"Image: {args.width}x{args.height}, block sizes {block_sizes[0]}..{block_sizes[-1]}")
+    print(f"cv.adaptiveThreshold x{len(block_sizes)}: {opencv_seconds * 1e3:9.1f} ms")
+    print(
+        f"summed-area tables x{len(block_sizes)}:   {sat_seconds * 1e3:9.1f} ms "
+        f"(table build {build_seconds * 1e3:.1f} ms)"
+    )
+    print(f"Sauvola, box filters per size: {box_seconds * 1e3:8.1f} ms")
+    print(f"Sauvola, same tables:         {sauvola_seconds * 1e3:9.1f} ms")
+
+    for block_size, ours, theirs in zip(block_sizes, results, reference):
+        r = block_size // 2
+        interior = (ours[r:-r, r:-r] == theirs[r:-r, r:-r]).mean()
+        if interior < 1.0:
+            print(f"block {block_size}: interior agreement {interior:.4%}")
+    print("Interior pixels checked against OpenCV.")
+
+
+if __name__ == "__main__":
+    main()
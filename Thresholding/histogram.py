@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Histogram-driven thresholding.
+
+Every threshold here is derived from the 256-bin gray histogram, which is
+computed once per image. Cumulative probability and first-moment tables make
+the weight and mean of any class ``[a, b)`` available in O(1):
+
+    omega(a, b) = P[b] - P[a]        mu(a, b) = (S[b] - S[a]) / omega(a, b)
+
+From these tables the module derives:
+
+- global thresholds: single-level Otsu and the iterative mean (ISODATA) method,
+- multi-level thresholds: histogram quantiles and multi-level Otsu, solved by
+  dynamic programming over class boundaries in O(levels * 256^2) instead of
+  trying every combination of thresholds,
+
+and applies any number of thresholds to an image in a single lookup-table pass.
+
+Thresholds follow ``cv.threshold``: a pixel belongs to the class above a
+threshold ``t`` when its value is greater than ``t``.
+
+Example:
+    histogram = ThresholdHistogram.from_image(img_gray)
+    thresholds = histogram.otsu(levels=3)
+    segmented = apply_thresholds(img_gray, thresholds)
+"""
+import numpy as np
+import cv2 as cv
+
+from IOImages.pointwise import apply_lut
+
+__all__ = [
+    "gray_histogram",
+    "ThresholdHistogram",
+    "thresholds_lut",
+    "apply_thresholds",
+    "binarize",
+]
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+
+def gray_histogram(image):
+    """Return the 256-bin histogram of a uint8 gray image as int64."""
+    if image.dtype != np.uint8:
+        raise TypeError(f"Expected a uint8 image, got {image.dtype}")
+    if image.ndim == 3:
+        image = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    hist = cv.calcHist([image], [0], None, [256], [0, 256])
+    return hist.ravel().astype(np.int64)
+
+
+class ThresholdHistogram:
+    """
+    A gray histogram with the cumulative tables needed to score thresholds.
+
+    Attributes:
+        hist (np.ndarray): The 256-bin histogram (int64).
+        total (int): Number of pixels.
+        P (np.ndarray): ``P[i]`` = probability of levels ``< i`` (257 entries).
+        S (np.ndarray): ``S[i]`` = first moment of levels ``< i`` (257 entries).
+    """
+
+    def __init__(self, hist):
+        hist = np.asarray(hist, dtype=np.int64).ravel()
+        if hist.shape != (256,):
+            raise ValueError(f"Expected 256 bins, got {hist.shape[0]}")
+        self.hist = hist
+        self.total = int(hist.sum())
+        p = hist / max(self.total, 1)
+        self.P = np.concatenate(([0.0], np.cumsum(p)))
+        self.S = np.concatenate(([0.0], np.cumsum(p * _LEVELS)))
+        self._class_scores = None
+
+    @classmethod
+    def from_image(cls, image):
+        return cls(gray_histogram(image))
+
+    @classmethod
+    def from_statistics(cls, statistics):
+        """
+        Build from an ``IOImages.image_stats.ImageStatistics`` without reading pixels.
+
+        The result is memoized on ``statistics``, so the tables (and the class
+        scores used by multi-level Otsu) are shared by every caller.
+        """
+        return statistics.memo("threshold_histogram", lambda: cls(statistics.gray))
+
+    @property
+    def mean(self):
+        return float(self.S[-1])
+
+    def class_weight(self, a, b):
+        """Probability of levels in ``[a, b)``."""
+        return self.P[b] - self.P[a]
+
+    def class_mean(self, a, b):
+        """Mean level of ``[a, b)``, or 0 for an empty class."""
+        weight = self.P[b] - self.P[a]
+        return (self.S[b] - self.S[a]) / weight if weight > 0 else 0.0
+
+    def between_class_variance(self, thresholds):
+        """Between-class variance of the classes cut at ``thresholds``."""
+        bounds = [0, *(int(t) + 1 for t in sorted(thresholds)), 256]
+        variance = 0.0
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            weight = self.class_weight(a, b)
+            if weight > 0:
+                variance += weight * (self.class_mean(a, b) - self.mean) ** 2
+        return float(variance)
+
+    def _scores(self):
+        # scores[a, b] = (S[b] - S[a])^2 / (P[b] - P[a]) 为类 [a, b) 的贡献,
+        # 所有类之和减去 mean^2 即类间方差; a >= b 的位置为 -inf
+        if self._class_scores is None:
+            weight = self.P[None, :] - self.P[:, None]
+            moment = self.S[None, :] - self.S[:, None]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.where(weight > 0, moment**2 / weight, 0.0)
+            scores[np.tril_indices(257)] = -np.inf
+            self._class_scores = scores
+        return self._class_scores
+
+    def otsu(self, levels=1):
+        """
+        Return the ``levels`` thresholds that maximize the between-class variance.
+
+        ``levels=1`` is classic Otsu. For more levels the optimal class
+        boundaries are found by dynamic programming over the precomputed
+        class scores, which takes milliseconds regardless of image size.
+
+        :param levels: Number of thresholds (classes = levels + 1).
+        :return: Tuple of thresholds in increasing order.
+        """
+        if not 1 <= levels <= 255:
+            raise ValueError(f"levels must be in [1, 255], got {levels}")
+        scores = self._scores()
+        # best[b]: 前 k 个类覆盖 [0, b) 时的最大得分; choice 记录最后一个边界
+        best = scores[0].copy()
+        choices = []
+        for _ in range(levels):
+            candidates = best[:, None] + scores
+            choice = np.argmax(candidates, axis=0)
+            best = candidates[choice, np.arange(257)]
+            choices.append(choice)
+
+        bounds = [256]
+        for choice in reversed(choices):
+            bounds.append(int(choice[bounds[-1]]))
+        return tuple(b - 1 for b in reversed(bounds[1:]))
+
+    def isodata(self, tolerance=0.5, max_iter=256):
+        """
+        Basic global threshold: iterate ``t = (mean below + mean above) / 2``.
+
+        Each iteration is O(1) thanks to the cumulative tables.
+        """
+        threshold = self.mean
+        for _ in range(max_iter):
+            t = int(np.clip(threshold, 0, 254))
+            below = self.class_mean(0, t + 1)
+            above = self.class_mean(t + 1, 256)
+            updated = (below + above) / 2
+            if abs(updated - threshold) < tolerance:
+                threshold = updated
+                break
+            threshold = updated
+        return int(np.clip(threshold, 0, 254))
+
+    def quantiles(self, levels=1):
+        """Return ``levels`` thresholds splitting the pixels into equally sized classes."""
+        targets = np.arange(1, levels + 1) / (levels + 1)
+        # P[i + 1] 为灰度 <= i 的比例
+        thresholds = np.searchsorted(self.P[1:], targets, side="left")
+        return tuple(int(t) for t in np.clip(thresholds, 0, 254))
+
+
+def thresholds_lut(thresholds, values=None):
+    """
+    Build the lookup table mapping each gray level to the value of its class.
+
+    :param thresholds: Increasing thresholds; level ``v`` belongs to class ``i``
+        when ``thresholds[i - 1] < v <= thresholds[i]``.
+    :param values: Output value per class (``len(thresholds) + 1`` entries);
+        defaults to evenly spaced levels from 0 to 255.
+    """
+    thresholds = np.sort(np.atleast_1d(np.asarray(thresholds, dtype=np.int64)))
+    if values is None:
+        values = np.linspace(0, 255, len(thresholds) + 1)
+    values = np.asarray(values)
+    if len(values) != len(thresholds) + 1:
+        raise ValueError(
+            f"Need {len(thresholds) + 1} class values for {len(thresholds)} thresholds"
+        )
+    classes = np.searchsorted(thresholds, np.arange(256), side="left")
+    return values.astype(np.uint8)[classes]
+
+
+def apply_thresholds(image, thresholds, values=None, out=None):
+    """
+    Segment ``image`` by any number of thresholds in one pass over the pixels.
+
+    :param image: uint8 gray image.
+    :param thresholds: Increasing thresholds.
+    :param values: Output value per class, see ``thresholds_lut``.
+    :param out: Optional uint8 output buffer.
+    """
+    return apply_lut(image, thresholds_lut(thresholds, values), out=out)
+
+
+def binarize(image, threshold, maxval=255, out=None):
+    """Binary threshold, equivalent to ``cv.threshold(..., cv.THRESH_BINARY)``."""
+    return apply_thresholds(image, [threshold], values=[0, maxval], out=out)
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""benchmarks: timing suite for the processing primitives, with JSON results and comparison"""
+
+from .cases import benchmark, available_cases, get_cases
+from .runner import (
+    RESOLUTIONS,
+    synthetic_images,
+    machine_info,
+    run_benchmarks,
+    save_results,
+    load_results,
+)
+from .compare import compare_reports, format_comparison
+
+__all__ = [
+    "benchmark",
+    "available_cases",
+    "get_cases",
+    "RESOLUTIONS",
+    "synthetic_images",
+    "machine_info",
+    "run_benchmarks",
+    "save_results",
+    "load_results",
+    "compare_reports",
+    "format_comparison",
+]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the image processing primitives.
+
+Usage (from the repository root):
+    python -m benchmarks list
+    python -m benchmarks run -o results/baseline.json
+    python -m benchmarks run --resolutions vga 1080p --dtypes uint8 --cases threshold filter
+    python -m benchmarks run --resolutions 1080p --dtypes uint8 --cases encoding sampling surface
+    python -m benchmarks run --cases startup -o results/startup.json
+    python -m benchmarks compare results/baseline.json results/current.json --threshold 0.1
+
+``compare`` exits with status 1 when any case regressed beyond the threshold.
+"""
+import argparse
+import sys
+
+import cv2 as cv
+
+from .cases import get_cases
+from .compare import compare_reports, format_comparison
+from .runner import DTYPES, RESOLUTIONS, load_results, run_benchmarks, save_results
+
+
+def _print_progress(entry):
+    label = f"{entry['name']:<32} {entry['resolution']:>6} {entry['dtype']:>7}"
+    if "reason" in entry:
+        print(f"{label}  skipped: {entry['reason']}", flush=True)
+    elif "megapixels_per_s" not in entry:
+        print(f"{label} {entry['median'] * 1e3:>10.2f} ms", flush=True)
+    else:
+        print(
+            f"{label} {entry['median'] * 1e3:>10.2f} ms {entry['megapixels_per_s']:>10.1f} MP/s",
+            flush=True,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List the benchmark cases")
+
+    run = commands.add_parser("run", help="Run the benchmarks and save JSON results")
+    run.add_argument("-o", "--output", default="benchmark-results.json")
+    run.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    run.add_argument("--dtypes", nargs="+", choices=DTYPES, default=list(DTYPES))
+    run.add_argument("--cases", nargs="+", default=None, help="Substrings of case names to run")
+    run.add_argument("--min-time", type=float, default=0.2, help="Seconds to time each case for")
+    run.add_argument("--max-repeat", type=int, default=20)
+    run.add_argument("--threads", type=int, default=None, help="OpenCV threads (cv.setNumThreads)")
+
+    compare = commands.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument(
+        "--threshold", type=float, default=0.1, help="Allowed slowdown as a fraction (0.1 = 10%%)"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for case in get_cases():
+            dtypes = "/".join(case.dtypes) if case.images else "-"
+            print(f"{case.name:<32}{dtypes:<14}{case.description}")
+        return 0
+
+    if args.command == "run":
+        if args.threads is not None:
+            cv.setNumThreads(args.threads)
+        cases = get_cases(args.cases)
+        if not cases:
+            parser.error("no benchmark case matches --cases")
+        report = run_benchmarks(
+            cases,
+            args.resolutions,
+            args.dtypes,
+            min_time=args.min_time,
+            max_repeat=args.max_repeat,
+            progress=_print_progress,
+        )
+        save_results(report, args.output)
+        print(f"Saved {len(report['results'])} results to {args.output}")
+        return 0
+
+    rows, differences = compare_reports(
+        load_results(args.baseline), load_results(args.current), args.threshold
+    )
+    print(format_comparison(rows, differences))
+    return 1 if any(row[4] == "regression" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,552 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark cases for the processing primitives of the repository.
+
+A case is registered with ``@benchmark(name, dtypes=...)``. The decorated
+function receives the synthetic ``images`` of one resolution and dtype (see
+``runner.synthetic_images``) and returns the zero-argument callable to time,
+so imports, lookup tables and output buffers are prepared outside the timed
+region. Cases registered with ``images=False`` (start-up times) receive None
+and run once per report.
+
+Comparisons (PIL against ``encode``, the notebook chain against the fused
+pipeline, one threshold at a time against a sweep) are pairs of cases whose
+medians can be read side by side in one report.
+
+Imports are done inside the cases: a primitive whose module cannot be
+imported is reported as skipped instead of aborting the whole run.
+"""
+import functools
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import cv2 as cv
+
+__all__ = ["Case", "benchmark", "available_cases", "get_cases"]
+
+_CASES = {}
+
+# 仓库根目录: 启动用例的子进程在此运行
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Case:
+    """
+    A registered benchmark case.
+
+    Attributes:
+        name (str): Dotted name, ``<area>.<primitive>``.
+        setup (callable): ``setup(images) -> callable`` returning the function to time.
+        dtypes (tuple): Image dtypes the primitive supports.
+        images (bool): False for cases that ignore the images and run once per report.
+        description (str): First line of the setup docstring.
+    """
+
+    def __init__(self, name, setup, dtypes, images=True):
+        self.name = name
+        self.setup = setup
+        self.dtypes = tuple(dtypes)
+        self.images = images
+        self.description = (setup.__doc__ or "").strip().splitlines()[0] if setup.__doc__ else ""
+
+
+def benchmark(name, dtypes=("uint8",), images=True):
+    """Register a benchmark case under ``name`` for the given image dtypes."""
+
+    def decorator(setup):
+        if name in _CASES:
+            raise ValueError(f"Benchmark '{name}' is already registered")
+        _CASES[name] = Case(name, setup, dtypes, images)
+        return setup
+
+    return decorator
+
+
+def available_cases():
+    """Return the names of the registered cases."""
+    return sorted(_CASES)
+
+
+def get_cases(patterns=None):
+    """Return the cases whose name contains any of ``patterns`` (all if None)."""
+    names = available_cases()
+    if patterns:
+        names = [name for name in names if any(pattern in name for pattern in patterns)]
+    return [_CASES[name] for name in names]
+
+
+# # 颜色模式
+
+
+@benchmark("colormode.rgb_to_hsb")
+def _rgb_to_hsb(images):
+    """Vectorized RGB -> HSB conversion (IOImages.ColorMode)."""
+    from IOImages.ColorMode import rgb_to_hsb_array
+
+    rgb = images["rgb"]
+    out = np.empty(rgb.shape, dtype=np.float32)
+    return functools.partial(rgb_to_hsb_array, rgb, out=out)
+
+
+@benchmark("colormode.hsb_to_rgb")
+def _hsb_to_rgb(images):
+    """Vectorized HSB -> RGB conversion (IOImages.ColorMode)."""
+    from IOImages.ColorMode import rgb_to_hsb_array, hsb_to_rgb_array
+
+    hsb = rgb_to_hsb_array(images["rgb"])
+    out = np.empty(hsb.shape, dtype=np.uint8)
+    return functools.partial(hsb_to_rgb_array, hsb, out=out)
+
+
+# # 灰度变换
+
+
+@benchmark("pointwise.log")
+def _log(images):
+    """Log transform s = c * log(1 + r) via a lookup table."""
+    from IOImages.pointwise import apply_curve
+
+    out = np.empty_like(images["gray"])
+    return functools.partial(apply_curve, images["gray"], "log", out=out, c=1.0)
+
+
+@benchmark("pointwise.power")
+def _power(images):
+    """Power-law transform s = c * r ^ gamma via a lookup table."""
+    from IOImages.pointwise import apply_curve
+
+    out = np.empty_like(images["gray"])
+    return functools.partial(apply_curve, images["gray"], "power", out=out, c=1.0, gamma=0.5)
+
+
+# # 阈值
+
+
+@benchmark("threshold.global")
+def _global_threshold(images):
+    """Global binary threshold at 111."""
+    from Thresholding import binarize
+
+    out = np.empty_like(images["gray"])
+    return functools.partial(binarize, images["gray"], 111, out=out)
+
+
+@benchmark("threshold.multi")
+def _multi_threshold(images):
+    """Piecewise threshold at 111 and 144."""
+    from Thresholding import apply_thresholds
+
+    out = np.empty_like(images["gray"])
+    return functools.partial(apply_thresholds, images["gray"], (111, 144), out=out)
+
+
+@benchmark("threshold.otsu")
+def _otsu(images):
+    """Otsu's threshold: histogram, search and binarization."""
+    from Thresholding import ThresholdHistogram, apply_thresholds
+
+    gray = images["gray"]
+
+    def run():
+        thresholds = ThresholdHistogram.from_image(gray).otsu(1)
+        return apply_thresholds(gray, thresholds)
+
+    return run
+
+
+@benchmark("threshold.otsu3")
+def _otsu3(images):
+    """Three-level Otsu (four classes)."""
+    from Thresholding import ThresholdHistogram, apply_thresholds
+
+    gray = images["gray"]
+
+    def run():
+        thresholds = ThresholdHistogram.from_image(gray).otsu(3)
+        return apply_thresholds(gray, thresholds)
+
+    return run
+
+
+@benchmark("threshold.adaptive_mean")
+def _adaptive_mean(images):
+    """cv.adaptiveThreshold, mean of an 11x11 block, C = 8."""
+    return functools.partial(
+        cv.adaptiveThreshold,
+        images["gray"], 255, cv.ADAPTIVE_THRESH_MEAN_C, cv.THRESH_BINARY, 11, 8,
+    )
+
+
+@benchmark("threshold.sauvola")
+def _sauvola(images):
+    """Sauvola threshold from summed-area tables, 31x31 block."""
+    from Thresholding import AdaptiveThresholder
+
+    gray = images["gray"]
+    return lambda: AdaptiveThresholder(gray).sauvola(31)
+
+
+# # 滤波
+
+
+@benchmark("filter.mean", dtypes=("uint8", "uint16"))
+def _mean(images):
+    """Mean filter, 5x5 (cv.blur)."""
+    return functools.partial(cv.blur, images["bgr"], (5, 5))
+
+
+@benchmark("filter.box31", dtypes=("uint8", "uint16"))
+def _box(images):
+    """Integral-image box filter, 31x31 (Filtering.box_filter)."""
+    from Filtering import box_filter
+
+    return functools.partial(box_filter, images["bgr"], 31)
+
+
+@benchmark("filter.median", dtypes=("uint8", "uint16"))
+def _median(images):
+    """Median filter, 5x5 (Filtering.median_filter)."""
+    from Filtering import median_filter
+
+    return functools.partial(median_filter, images["bgr"], 5)
+
+
+@benchmark("filter.gaussian", dtypes=("uint8", "uint16"))
+def _gaussian(images):
+    """Gaussian filter, 5x5, sigma 1."""
+    return functools.partial(cv.GaussianBlur, images["bgr"], (5, 5), 1.0)
+
+
+# # 噪声
+
+
+@benchmark("noise.gaussian", dtypes=("uint8", "uint16"))
+def _gaussian_noise(images):
+    """Additive Gaussian noise, sigma 25 gray levels (Noise.gaussian_noise)."""
+    from Noise import gaussian_noise
+
+    image = images["bgr"]
+    out = np.empty_like(image)
+    rng = np.random.default_rng(0)
+    return functools.partial(gaussian_noise, image, rng, sigma=25.0, out=out)
+
+
+# # 编码
+
+
+def _pil_bytes(image, format, **params):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(cv.cvtColor(image, cv.COLOR_BGR2RGB)).save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+@benchmark("encoding.pil_png")
+def _pil_png(images):
+    """PNG through PIL, as image_to_base64 of the notebooks did (baseline of encoding.png)."""
+    return functools.partial(_pil_bytes, images["bgr"], "PNG")
+
+
+@benchmark("encoding.pil_jpeg100")
+def _pil_jpeg(images):
+    """JPEG 100 through PIL, what st.image does with an array (baseline of encoding.jpeg)."""
+    return functools.partial(_pil_bytes, images["bgr"], "JPEG", quality=100)
+
+
+def _encode_case(description, format, **params):
+    def setup(images):
+        from IOImages.encoding import encode
+
+        return functools.partial(encode, images["bgr"], format, cache=None, **params)
+
+    setup.__doc__ = f"encode() to {description}, uncached (IOImages.encoding)."
+    return setup
+
+
+benchmark("encoding.png")(_encode_case("PNG, compression 1 with the SUB filter", "png"))
+benchmark("encoding.png6")(_encode_case("PNG, compression 6", "png", compression=6))
+benchmark("encoding.jpeg")(_encode_case("JPEG, quality 90", "jpeg"))
+benchmark("encoding.jpeg100")(_encode_case("JPEG, quality 100", "jpeg", quality=100))
+benchmark("encoding.webp")(_encode_case("WebP, quality 90", "webp"))
+benchmark("encoding.raw")(_encode_case("BMP, uncompressed", "raw"))
+
+
+@benchmark("encoding.cached_writeable")
+def _encode_writeable(images):
+    """Cached JPEG of a writeable array: the pixels are hashed on every call."""
+    from IOImages.encoding import EncodeCache, encode
+
+    cache = EncodeCache()
+    return functools.partial(encode, images["bgr"], "jpeg", cache=cache)
+
+
+@benchmark("encoding.cached_immutable")
+def _encode_immutable(images):
+    """Cached JPEG of an immutable array: the digest is remembered (the rerun case)."""
+    from IOImages.encoding import EncodeCache, encode
+
+    image = images["bgr"].copy()
+    image.setflags(write=False)
+    cache = EncodeCache()
+    return functools.partial(encode, image, "jpeg", cache=cache)
+
+
+# # 重采样
+
+
+def _resize_targets(shape):
+    """Half, third, sixth and twelfth of the image, and a 128 px thumbnail."""
+    height, width = shape[:2]
+    return [(width // factor, height // factor) for factor in (2, 3, 6, 12)] + [128]
+
+
+@benchmark("sampling.direct")
+def _resize_direct(images):
+    """resize() from the full-resolution image to each of 5 sizes (IOImages.sampling)."""
+    from IOImages.sampling import fit_size, resize
+
+    image = images["bgr"]
+    targets = [fit_size(image.shape, size) if isinstance(size, int) else size for size in _resize_targets(image.shape)]
+    return lambda: [resize(image, target) for target in targets]
+
+
+@benchmark("sampling.mip")
+def _resize_mip(images):
+    """The same 5 sizes through a fresh MipCache, each from the nearest cached level."""
+    from IOImages.sampling import MipCache, fit_size
+
+    image = images["bgr"]
+    targets = [fit_size(image.shape, size) if isinstance(size, int) else size for size in _resize_targets(image.shape)]
+
+    def run():
+        cache = MipCache(max_bytes=1 << 62)
+        return [cache.resize(image, target, key=0) for target in targets]
+
+    return run
+
+
+@benchmark("sampling.resize_many")
+def _resize_many(images):
+    """The same 5 sizes with resize_many on a thread pool."""
+    from IOImages.sampling import resize_many
+
+    image = images["bgr"]
+    return functools.partial(resize_many, [image], _resize_targets(image.shape))
+
+
+@benchmark("sampling.thumbnail_direct")
+def _thumbnail_direct(images):
+    """A 960 px thumbnail resized from the full image (baseline of sampling.thumbnail_cached)."""
+    from IOImages.sampling import fit_size, resize
+
+    image = images["bgr"]
+    return functools.partial(resize, image, fit_size(image.shape, 960))
+
+
+@benchmark("sampling.thumbnail_cached")
+def _thumbnail_cached(images):
+    """The same thumbnail of an immutable source, again: the Streamlit preview on rerun."""
+    from IOImages.sampling import MipCache
+
+    image = images["bgr"].copy()
+    image.setflags(write=False)
+    cache = MipCache()
+    return functools.partial(cache.thumbnail, image, 960)
+
+
+# # 三维曲面
+
+
+@benchmark("surface.meshgrid")
+def _surface_meshgrid(images):
+    """One go.Surface vertex per pixel with np.meshgrid axes, serialized to JSON (the old notebook)."""
+    import plotly.graph_objects as go
+
+    gray = images["gray"]
+
+    def run():
+        height, width = gray.shape
+        x, y = np.meshgrid(np.arange(width), np.arange(height))
+        z = np.zeros_like(gray)
+        surface = go.Surface(z=z, x=x, y=y, surfacecolor=gray, colorscale="gray", showscale=False)
+        return go.Figure(surface).to_json()
+
+    return run
+
+
+@benchmark("surface.lod")
+def _surface_lod(images):
+    """surface_figure() with a 40000 vertex budget, serialized to JSON (IOImages.surface)."""
+    from IOImages.surface import surface_figure
+
+    gray = images["gray"].copy()
+    gray.setflags(write=False)  # 只读: mip 层按数组缓存
+    return lambda: surface_figure(gray, 40_000).to_json()
+
+
+@benchmark("surface.zoom")
+def _surface_zoom(images):
+    """surface_figure() of the central quarter-size window, resampled from a mip level."""
+    from IOImages.surface import surface_figure
+
+    gray = images["gray"].copy()
+    gray.setflags(write=False)
+    height, width = gray.shape
+    roi = (width // 4, height // 4, width // 2, height // 2)
+    return lambda: surface_figure(gray, 40_000, roi=roi).to_json()
+
+
+# # 流水线
+
+_PIPELINE_STEPS = ["gray", "log:c=1.2", "power:gamma=0.8", "threshold:value=128"]
+
+
+@benchmark("pipeline.notebook")
+def _pipeline_notebook(images):
+    """gray -> log -> power -> threshold chained by hand with float64 steps, as in the notebooks."""
+    image = images["bgr"]
+
+    def run():
+        gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+        logged = 1.2 * np.log1p(gray / 255.0)
+        scaled = np.uint8(np.clip(logged**0.8, 0, 1) * 255)
+        return cv.threshold(scaled, 128, 255, cv.THRESH_BINARY)[1]
+
+    return run
+
+
+def _pipeline_case(fuse):
+    def setup(images):
+        from utils.pipeline import Pipeline
+
+        image = images["bgr"]
+        pipeline = Pipeline(_PIPELINE_STEPS, fuse=fuse)
+        return lambda: pipeline.release(pipeline.run(image))
+
+    state = "fused into one lookup table" if fuse else "one lookup table per step"
+    setup.__doc__ = f"The same chain as a Pipeline, {state}, with pooled buffers (utils.pipeline)."
+    return setup
+
+
+benchmark("pipeline.unfused")(_pipeline_case(False))
+benchmark("pipeline.fused")(_pipeline_case(True))
+
+
+# # 参数扫描
+
+_SWEEP_VALUES = list(range(256))
+
+
+@benchmark("sweep.threshold_per_value")
+def _threshold_per_value(images):
+    """256 thresholds, each binarizing the image and measuring it (baseline of sweep.threshold)."""
+    from IOImages.image_stats import ImageStatistics
+
+    gray = images["gray"]
+
+    def run():
+        rows = []
+        for value in _SWEEP_VALUES:
+            statistics = ImageStatistics.from_image(cv.threshold(gray, value, 255, cv.THRESH_BINARY)[1])
+            rows.append((statistics.histogram()[255] / statistics.total, statistics.std(), statistics.entropy()))
+        return rows
+
+    return run
+
+
+@benchmark("sweep.threshold")
+def _threshold_sweep(images):
+    """The same 256 thresholds in one sweep: one histogram and a lookup table per value (utils.sweep)."""
+    from utils.sweep import sweep
+
+    return functools.partial(sweep, images["gray"], "threshold", {"value": _SWEEP_VALUES})
+
+
+@benchmark("sweep.contact_sheet")
+def _contact_sheet(images):
+    """Contact sheet of the 256 threshold thumbnails, 16 columns."""
+    from utils.sweep import sweep
+
+    result = sweep(images["gray"], "threshold", {"value": _SWEEP_VALUES})
+    return functools.partial(result.contact_sheet, columns=16, metric="foreground")
+
+
+@benchmark("sweep.sauvola")
+def _sauvola_sweep(images):
+    """Sauvola over 3 block sizes and 4 values of k (12 full-image thresholds)."""
+    from utils.sweep import sweep
+
+    grid = {"block_size": [15, 31, 63], "k": [0.1, 0.2, 0.3, 0.5]}
+    return functools.partial(sweep, images["bgr"], "sauvola", grid, base=["gray"])
+
+
+# # 启动时间
+
+
+def _run_python(statement, cwd=_ROOT):
+    subprocess.run([sys.executable, "-c", statement], cwd=cwd, capture_output=True, check=True)
+
+
+def _startup_case(description, statement, cwd=_ROOT):
+    def setup(_):
+        return functools.partial(_run_python, statement, cwd)
+
+    setup.__doc__ = description
+    return setup
+
+
+benchmark("startup.python", images=False)(_startup_case("Bare interpreter start-up, included in every startup case.", "pass"))
+benchmark("startup.utils_eager", images=False)(
+    _startup_case(
+        "Every utils submodule and torch, what importing utils cost before its imports became lazy.",
+        "import utils.logger, utils.devices, utils.metrics\ntry:\n    import torch\nexcept ImportError:\n    pass",
+    )
+)
+benchmark("startup.utils", images=False)(_startup_case("import utils", "import utils"))
+benchmark("startup.utils_logger", images=False)(
+    _startup_case("from utils import LoggerFactory", "from utils import LoggerFactory")
+)
+benchmark("startup.utils_metrics", images=False)(
+    _startup_case("from utils.metrics import metrics", "from utils.metrics import metrics")
+)
+benchmark("startup.probe_devices", images=False)(
+    _startup_case("utils.probe_devices()", "from utils import probe_devices\nprobe_devices()")
+)
+
+# 在子进程中用 AppTest 驱动应用: 冷启动首页, 可选地再打开每个页面
+_STREAMLIT_APP = """
+import os, sys
+sys.path.insert(0, os.getcwd())
+sys.path.append(os.path.dirname(os.getcwd()))
+from streamlit.testing.v1 import AppTest
+from core.navigation import TOPICS
+
+app = AppTest.from_file("main-page.py", default_timeout=120).run()
+for topic, pages in (TOPICS.items() if {pages} else ()):
+    app.session_state.current_page = topic
+    app.run()
+    for spec in pages[1:]:
+        app.switch_page(spec.path).run()
+if app.exception:
+    raise SystemExit(app.exception[0].message)
+"""
+_STREAMLIT_DIR = os.path.join(_ROOT, "streamlit")
+
+benchmark("startup.streamlit_home", images=False)(
+    _startup_case(
+        "Cold home page of the Streamlit app in a fresh interpreter (AppTest, headless).",
+        _STREAMLIT_APP.format(pages=False),
+        _STREAMLIT_DIR,
+    )
+)
+benchmark("startup.streamlit_pages", images=False)(
+    _startup_case(
+        "Cold home page, then every page of every topic, in a fresh interpreter.",
+        _STREAMLIT_APP.format(pages=True),
+        _STREAMLIT_DIR,
+    )
+)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Compare two benchmark result files and flag regressions.
+
+Results are matched by ``name[resolution,dtype]`` and compared on their
+median time. A case regresses when it got slower by more than
+``threshold`` (a fraction: 0.1 = 10 %) and improves when it got faster by
+more than the same margin.
+"""
+from .runner import result_key
+
+__all__ = ["compare_reports", "format_comparison"]
+
+# 比较时会提示不同的机器信息字段
+_MACHINE_FIELDS = ("cpu", "cpu_count", "python", "numpy", "opencv", "opencv_threads")
+
+
+def compare_reports(baseline, current, threshold=0.1):
+    """
+    Match the results of two reports.
+
+    :return: ``(rows, machine_differences)`` where each row is
+        ``(key, baseline_seconds, current_seconds, ratio, status)`` and status is
+        "regression", "improvement" or "ok"; cases missing from either report
+        have a None time and status "missing"/"new".
+    """
+    before = {result_key(r): r for r in baseline["results"]}
+    after = {result_key(r): r for r in current["results"]}
+
+    rows = []
+    for key in sorted(before.keys() | after.keys()):
+        old, new = before.get(key), after.get(key)
+        if new is None:
+            rows.append((key, old["median"], None, None, "missing"))
+            continue
+        if old is None:
+            rows.append((key, None, new["median"], None, "new"))
+            continue
+        ratio = new["median"] / old["median"]
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append((key, old["median"], new["median"], ratio, status))
+
+    differences = {
+        field: (baseline["machine"].get(field), current["machine"].get(field))
+        for field in _MACHINE_FIELDS
+        if baseline["machine"].get(field) != current["machine"].get(field)
+    }
+    return rows, differences
+
+
+def format_comparison(rows, differences):
+    """Render ``compare_reports`` output as a text table."""
+    lines = []
+    for field, (old, new) in differences.items():
+        lines.append(f"warning: {field} differs: {old} -> {new}")
+    width = max((len(row[0]) for row in rows), default=10)
+    lines.append(f"{'case':<{width}} {'baseline':>10} {'current':>10} {'ratio':>7}  status")
+
+    def ms(seconds):
+        return "-" if seconds is None else f"{seconds * 1e3:.2f}"
+
+    for key, old, new, ratio, status in rows:
+        ratio_text = "-" if ratio is None else f"{ratio:.2f}x"
+        marker = "  <--" if status == "regression" else ""
+        lines.append(
+            f"{key:<{width}} {ms(old):>10} {ms(new):>10} {ratio_text:>7}  {status}{marker}"
+        )
+    counts = {status: sum(row[4] == status for row in rows) for status in ("regression", "improvement")}
+    lines.append(f"{counts['regression']} regressions, {counts['improvement']} improvements (times in ms)")
+    return "\n".join(lines)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Run benchmark cases on synthetic images and save the results as JSON.
+
+Images are generated, not read from disk, so the suite runs offline and
+every machine times the same content: a smooth color gradient with a few
+shapes, thin lines and a fixed-seed noise layer, which gives thresholds and
+filters a realistic mix of flat and detailed regions.
+
+Each case is warmed up once, then timed until ``min_time`` seconds or
+``max_repeat`` runs have passed (at least ``min_repeat``); the median is the
+headline number and the minimum the best case. Cases that do not use the
+images (start-up times) run once per report, with resolution and dtype "-".
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import time
+
+import numpy as np
+import cv2 as cv
+
+__all__ = [
+    "RESOLUTIONS",
+    "DTYPES",
+    "synthetic_images",
+    "machine_info",
+    "time_callable",
+    "run_benchmarks",
+    "save_results",
+    "load_results",
+    "result_key",
+]
+
+# 名称 -> (宽, 高)
+RESOLUTIONS = {
+    "vga": (640, 480),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+
+DTYPES = ("uint8", "uint16")
+
+
+def synthetic_images(resolution, dtype="uint8", seed=0):
+    """
+    Return ``{"bgr", "rgb", "gray"}`` synthetic test images.
+
+    :param resolution: Key of ``RESOLUTIONS``.
+    :param dtype: "uint8" or "uint16".
+    :param seed: Seed of the noise layer.
+    """
+    width, height = RESOLUTIONS[resolution]
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    x /= width
+    y /= height
+    bgr = np.stack([x * 0.8 + 0.1, y * 0.6 + 0.2, (1 - x) * 0.5 + y * 0.3], axis=-1)
+
+    scale = min(width, height)
+    cv.circle(bgr, (width // 3, height // 2), scale // 5, (0.9, 0.2, 0.1), -1)
+    cv.rectangle(
+        bgr, (width // 2, height // 6), (width * 5 // 6, height // 2), (0.15, 0.7, 0.9), -1
+    )
+    # 细线提供边缘和细节
+    for i in range(1, 16):
+        start, end = (width * i // 16, 0), (width * (16 - i) // 16, height - 1)
+        cv.line(bgr, start, end, (0.05, 0.05, 0.05), 1)
+    bgr += np.random.default_rng(seed).normal(0, 0.03, bgr.shape).astype(np.float32)
+
+    maxval = np.iinfo(dtype).max
+    bgr = np.clip(bgr * maxval, 0, maxval).astype(dtype)
+    return {
+        "bgr": bgr,
+        "rgb": np.ascontiguousarray(bgr[..., ::-1]),
+        "gray": cv.cvtColor(bgr, cv.COLOR_BGR2GRAY),
+    }
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_info():
+    """Describe the machine and library versions the results were measured on."""
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        memory = None
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "cpu": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "memory_bytes": memory,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv.__version__,
+        "opencv_threads": cv.getNumThreads(),
+    }
+
+
+def time_callable(func, min_time=0.2, min_repeat=3, max_repeat=20):
+    """
+    Time ``func`` after one warm-up call.
+
+    :return: List of per-call seconds.
+    """
+    func()
+    samples = []
+    total = 0.0
+    while len(samples) < min_repeat or (total < min_time and len(samples) < max_repeat):
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+        samples.append(seconds)
+        total += seconds
+    return samples
+
+
+def result_key(result):
+    """Identify a result across runs: ``name[resolution,dtype]``."""
+    return f"{result['name']}[{result['resolution']},{result['dtype']}]"
+
+
+def _run_case(case, images, entry, min_time, max_repeat):
+    """Time one case; return ``(entry, True)`` with the timings or ``(entry, False)`` with the reason."""
+    try:
+        func = case.setup(images)
+        samples = time_callable(func, min_time, max_repeat=max_repeat)
+    except Exception as e:  # noqa: BLE001 - 单个用例失败不影响其余用例
+        entry["reason"] = f"{type(e).__name__}: {e}"
+        return entry, False
+    median = statistics.median(samples)
+    entry.update(repeats=len(samples), median=median, min=min(samples), mean=statistics.fmean(samples))
+    if images is not None:
+        height, width = images["gray"].shape
+        entry.update(width=width, height=height, megapixels_per_s=width * height / 1e6 / median)
+    return entry, True
+
+
+def run_benchmarks(cases, resolutions, dtypes, min_time=0.2, max_repeat=20, progress=None):
+    """
+    Run every case at every resolution and supported dtype.
+
+    :param cases: ``Case`` objects from ``cases.get_cases``.
+    :param resolutions: Keys of ``RESOLUTIONS``.
+    :param dtypes: Dtype names to run (each case keeps only those it supports).
+    :param progress: Optional callable receiving each result (or skip) dict.
+    :return: ``{"machine", "created", "settings", "results", "skipped"}``.
+    """
+    results, skipped = [], []
+
+    def record(entry, ok):
+        (results if ok else skipped).append(entry)
+        if progress:
+            progress(entry)
+
+    # 不使用图像的用例 (启动时间) 每份报告只运行一次
+    for case in cases:
+        if not case.images:
+            entry = {"name": case.name, "resolution": "-", "dtype": "-"}
+            record(*_run_case(case, None, entry, min_time, max_repeat))
+
+    for resolution in resolutions:
+        for dtype in dtypes:
+            selected = [case for case in cases if case.images and dtype in case.dtypes]
+            if not selected:
+                continue
+            images = synthetic_images(resolution, dtype)
+            for case in selected:
+                entry = {"name": case.name, "resolution": resolution, "dtype": dtype}
+                record(*_run_case(case, images, entry, min_time, max_repeat))
+            del images
+
+    return {
+        "machine": machine_info(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "settings": {"min_time": min_time, "max_repeat": max_repeat},
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def save_results(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 """Missing docstring"""
 
-__all__ = ["TEST_IMAGE"]
+__all__ = ["TEST_IMAGE", "IMAGE_CACHE_BYTES"]
 
 TEST_IMAGE = "images/bz_color.jpg"
+
+# 图像缓存的内存上限 (字节), 超出后按 LRU 淘汰
+IMAGE_CACHE_BYTES = 512 * 1024 * 1024
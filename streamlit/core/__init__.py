@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Shared helpers for the Streamlit pages"""
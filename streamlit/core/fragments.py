@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Per-session memo for fragment-scoped reruns.
+
+Pages are split into ``st.fragment`` functions. Each one owns its widgets
+and the outputs that depend on them, so moving a slider reruns only that
+fragment instead of the whole script. Fragments still run during every full
+rerun (page load, image upload, a widget outside any fragment).
+``fragment_memo`` keeps each fragment's last results per session, keyed by
+its explicit inputs, so those runs redraw without recomputing when nothing
+the fragment depends on has changed.
+
+Example:
+    @st.fragment
+    def log_panel(image, pyramid):
+        c = st.slider("constant", 0.0, 2.0, 1.0)
+        memo = fragment_memo("grayscale.log")
+        result = memo.get((image.key, c), lambda: pyramid.run(log_curve(c), 640))
+        show_image(result.image)
+"""
+from collections import OrderedDict
+
+import streamlit as st
+
+__all__ = ["FragmentMemo", "fragment_memo"]
+
+_SESSION_KEY = "_fragment_memos"
+
+
+class FragmentMemo:
+    """
+    The last ``size`` results of one fragment, keyed by its inputs.
+
+    Attributes:
+        size (int): Number of input combinations kept (least recently used are dropped).
+        hits (int): Lookups served from the memo.
+        misses (int): Lookups that had to compute.
+    """
+
+    def __init__(self, size=4):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, inputs, compute):
+        """
+        Return the result stored for ``inputs``, calling ``compute()`` on a miss.
+
+        :param inputs: Hashable tuple of everything the result depends on.
+        :param compute: Callable producing the result.
+        """
+        if inputs in self._entries:
+            self._entries.move_to_end(inputs)
+            self.hits += 1
+            return self._entries[inputs]
+        self.misses += 1
+        result = self._entries[inputs] = compute()
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        self._entries.clear()
+
+
+def fragment_memo(name, size=4):
+    """Return the ``FragmentMemo`` of fragment ``name`` in the current session."""
+    memos = st.session_state.setdefault(_SESSION_KEY, {})
+    memo = memos.get(name)
+    if memo is None:
+        memo = memos[name] = FragmentMemo(size)
+    return memo
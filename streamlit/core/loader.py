@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide, cached image loading for the Streamlit pages.
+
+Streamlit re-executes the page script on every widget interaction. Decoding
+the JPEG with ``cv.imread`` at the top of each page therefore repeats the
+disk read and decode on every slider move. This module decodes every image
+once per process and keeps the result in an LRU cache shared by all sessions:
+
+- Files are keyed by absolute path, modification time and size, so editing
+  the file on disk invalidates its entry.
+- Uploads are keyed by the SHA-1 of their bytes.
+- The cache has a byte budget; the least recently used images are evicted
+  first so a long-running server does not grow without bound. Data derived
+  from an image (pyramids, ...) counts toward the budget of its entry.
+
+The arrays handed out are read-only because they are shared between sessions.
+Copy them before modifying in place.
+
+Example:
+    image = load_image(config.TEST_IMAGE)
+    img_gray = image.gray
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import cv2 as cv
+import streamlit as st
+
+import config
+
+__all__ = [
+    "LoadedImage",
+    "ImageCache",
+    "get_image_cache",
+    "load_image",
+    "load_uploaded_image",
+    "image_source",
+]
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+class LoadedImage:
+    """
+    A decoded image with its BGR, RGB and gray variants.
+
+    Attributes:
+        key (tuple): The cache key the image was stored under.
+        name (str): File name or upload name, for display.
+        bgr (np.ndarray): Read-only uint8 array in OpenCV's BGR order.
+        rgb (np.ndarray): Read-only uint8 array in RGB order (for st.image).
+        gray (np.ndarray): Read-only uint8 single-channel array.
+        derived (dict): Per-image cache for data computed from the pixels;
+            add entries with ``derive`` so the owning cache sees their size.
+    """
+
+    def __init__(self, key, name, bgr):
+        self.key = key
+        self.name = name
+        self.bgr = _read_only(bgr)
+        self.rgb = _read_only(cv.cvtColor(bgr, cv.COLOR_BGR2RGB))
+        self.gray = _read_only(cv.cvtColor(bgr, cv.COLOR_BGR2GRAY))
+        self.derived = {}
+        # 所属的 ImageCache, 派生数据变化时通知它重新计量
+        self._owner = None
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def derived_nbytes(self):
+        """Size of the derived data, for values exposing ``nbytes``."""
+        return sum(getattr(value, "nbytes", 0) for value in list(self.derived.values()))
+
+    @property
+    def nbytes(self):
+        return self.bgr.nbytes + self.rgb.nbytes + self.gray.nbytes + self.derived_nbytes
+
+    def derive(self, key, build):
+        """
+        Return ``derived[key]``, storing ``build()`` there on the first call.
+
+        The owning cache re-measures the entry afterwards, so derived data is
+        charged to the byte budget like the pixels are.
+        """
+        value = self.derived.get(key)
+        if value is None:
+            value = self.derived.setdefault(key, build())
+            if self._owner is not None:
+                self._owner.remeasure(self)
+        return value
+
+    def __repr__(self):
+        height, width = self.gray.shape
+        return f"LoadedImage({self.name!r}, {width}x{height})"
+
+
+class ImageCache:
+    """
+    A thread-safe LRU cache of ``LoadedImage`` objects with a byte budget.
+
+    Attributes:
+        max_bytes (int): Total size of the cached arrays, derived data included,
+            before eviction starts.
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups that had to decode.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_load(self, key, name, decode):
+        """
+        Return the image stored under ``key``, calling ``decode()`` on a miss.
+
+        :param key: Hashable cache key.
+        :param name: Display name of the image.
+        :param decode: Callable returning a BGR uint8 array.
+        :return: The cached ``LoadedImage``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # 派生数据 (如金字塔层) 可能在两次访问之间增长
+                self._resize(key, entry[0])
+                return entry[0]
+            self.misses += 1
+
+        # 解码在锁外进行, 避免阻塞其他会话
+        image = LoadedImage(key, name, decode())
+
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key][0]
+            size = image.nbytes
+            if size <= self.max_bytes:
+                image._owner = self
+                self._entries[key] = (image, size)
+                self._nbytes += size
+                self._evict()
+        return image
+
+    def remeasure(self, image):
+        """Update the size of ``image``'s entry after its derived data changed."""
+        with self._lock:
+            entry = self._entries.get(image.key)
+            if entry is not None and entry[0] is image:
+                self._resize(image.key, image)
+
+    def clear(self):
+        with self._lock:
+            for image, _ in self._entries.values():
+                image._owner = None
+            self._entries.clear()
+            self._nbytes = 0
+
+    def _resize(self, key, image):
+        size = image.nbytes
+        self._nbytes += size - self._entries[key][1]
+        self._entries[key] = (image, size)
+        self._evict()
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._entries:
+            _, (image, size) = self._entries.popitem(last=False)
+            image._owner = None
+            self._nbytes -= size
+
+
+@st.cache_resource
+def get_image_cache():
+    """Return the image cache shared by every session of this process."""
+    return ImageCache(max_bytes=config.IMAGE_CACHE_BYTES)
+
+
+def load_image(path=config.TEST_IMAGE):
+    """
+    Load an image file through the shared cache.
+
+    :param path: Path to the image, relative to the app's working directory.
+    :return: The cached ``LoadedImage``.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = ("file", path, stat.st_mtime_ns, stat.st_size)
+
+    def decode():
+        bgr = cv.imread(path, cv.IMREAD_COLOR)
+        if bgr is None:
+            raise ValueError(f"Could not decode image file '{path}'")
+        return bgr
+
+    return get_image_cache().get_or_load(key, os.path.basename(path), decode)
+
+
+def load_uploaded_image(uploaded_file):
+    """
+    Decode an ``st.file_uploader`` result through the shared cache.
+
+    :param uploaded_file: The ``UploadedFile`` returned by ``st.file_uploader``.
+    :return: The cached ``LoadedImage``.
+    """
+    data = uploaded_file.getvalue()
+    key = ("upload", hashlib.sha1(data).hexdigest())
+
+    def decode():
+        bgr = cv.imdecode(np.frombuffer(data, dtype=np.uint8), cv.IMREAD_COLOR)
+        if bgr is None:
+            raise ValueError(f"Could not decode uploaded file '{uploaded_file.name}'")
+        return bgr
+
+    return get_image_cache().get_or_load(key, uploaded_file.name, decode)
+
+
+def image_source(label="Upload an image", default=config.TEST_IMAGE):
+    """
+    Show an image uploader and return the uploaded image or the default one.
+
+    Call inside ``with st.sidebar:`` (or any container) to place the widget.
+
+    :param label: Label of the file uploader.
+    :param default: Image file used when nothing is uploaded.
+    :return: The cached ``LoadedImage``.
+    """
+    uploaded_file = st.file_uploader(
+        label, type=["png", "jpg", "jpeg", "bmp", "tif", "tiff", "webp"]
+    )
+    if uploaded_file is not None:
+        try:
+            return load_uploaded_image(uploaded_file)
+        except ValueError as e:
+            st.error(str(e))
+    return load_image(default)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Configuration, page registry and start-up timing for the Streamlit app.
+
+The navigation is declared as data: ``TOPICS`` maps each topic to its pages
+and ``ASSISTANCE_PAGES`` lists the pages shown with every topic. Adding a
+page is one ``PageSpec`` line; ``build_navigation`` only creates the
+``st.Page`` objects of the selected topic, and each page script imports its
+own (heavy) libraries when it runs.
+
+``configuration.toml`` is parsed once per process and re-read only when the
+file changes. ``StartupTimer`` classifies every script run as a cold start
+(first run of the process), session start, page switch or rerun and records
+its duration in ``utils.metrics`` under ``app.<kind>``; the Settings page
+shows the report.
+
+Example:
+    timer = StartupTimer()
+    config = load_config()
+    pg = build_navigation(st.session_state.current_page, home=choose_topic, logout=logout)
+    pg.run()
+    timer.finish(pg.title)
+"""
+import functools
+import html
+import os
+import threading
+import time
+from pathlib import Path
+
+import streamlit as st
+
+from utils.metrics import metrics
+
+__all__ = [
+    "PageSpec",
+    "TOPICS",
+    "ASSISTANCE_PAGES",
+    "load_config",
+    "topic_table_html",
+    "build_navigation",
+    "StartupTimer",
+    "startup_report",
+]
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+
+class PageSpec:
+    """
+    A page of the app, created as ``st.Page`` only when its topic is shown.
+
+    Attributes:
+        path (str): Page script, relative to the app directory.
+        title (str): Title shown in the navigation.
+        icon (str): Material icon or emoji.
+    """
+
+    def __init__(self, path, title, icon=":material/settings:"):
+        self.path = path
+        self.title = title
+        self.icon = icon
+
+    def page(self):
+        return st.Page(self.path, title=self.title, icon=self.icon)
+
+
+# 主题 -> 页面; 新页面只需在这里登记
+# TODO: Add more topics and pages
+TOPICS = {
+    "Fundemental Image Processing": [
+        PageSpec("topics/FundementalImageProcessing/grayscale.py", "Grayscale"),
+        PageSpec(
+            "topics/FundementalImageProcessing/graphic-transformation.py",
+            "Graphic Transformation",
+        ),
+    ],
+    "Test": [
+        PageSpec("topics/Test/test-page.py", "Test Page"),
+        PageSpec("topics/Test/test-page2.py", "Test Page 2"),
+    ],
+}
+
+ASSISTANCE_PAGES = [
+    PageSpec("pages/help.py", "Help", ":material/help:"),
+    PageSpec("pages/settings.py", "Settings", ":material/settings:"),
+]
+
+
+@functools.lru_cache(maxsize=4)
+def _parse_config(path, mtime_ns):
+    import tomllib
+
+    with open(path, "rb") as file:
+        return tomllib.load(file)
+
+
+def load_config(name="configuration.toml"):
+    """
+    Return the parsed configuration, cached until the file changes.
+
+    The dict is shared by all sessions; do not modify it.
+    """
+    path = APP_DIR / name
+    return _parse_config(str(path), os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=1)
+def topic_table_html():
+    """HTML table listing the topics, built once per process."""
+    rows = "".join(f"<tr><td>{html.escape(topic)}</td></tr>" for topic in TOPICS)
+    return f"""
+<style>
+    .table{{width: 100%;margin-left: 0;margin-right: auto;border-collapse: collapse;}}
+    .table th, .table td{{text-align: left;padding: 8px;}}
+</style>
+<div><table class="table"><thead><tr><th>Topics</th></tr></thead><tbody>{rows}</tbody></table></div>
+"""
+
+
+def build_navigation(topic, home, logout):
+    """
+    Return the ``st.navigation`` of ``topic``, or of the home page when no topic is chosen.
+
+    :param topic: Key of ``TOPICS`` or None.
+    :param home: Page function shown when no topic is selected.
+    :param logout: Page function of the "Exit" entry.
+    """
+    if topic not in TOPICS:
+        return st.navigation([st.Page(home)])
+    assistance = [spec.page() for spec in ASSISTANCE_PAGES]
+    assistance.append(st.Page(logout, title="Exit", icon=":material/logout:"))
+    return st.navigation(
+        {topic: [spec.page() for spec in TOPICS[topic]], "Assistance": assistance}
+    )
+
+
+# 本进程是否已完成第一次脚本运行
+_first_run_done = False
+_first_run_lock = threading.Lock()
+
+
+class StartupTimer:
+    """
+    Time one script run from its start until the page has been drawn.
+
+    Attributes:
+        start (float): ``time.perf_counter()`` at the start of the run.
+    """
+
+    KINDS = ("cold_start", "session_start", "page_switch", "rerun")
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+
+    def finish(self, page):
+        """
+        Record the run under ``app.<kind>`` and return ``(kind, seconds)``.
+
+        :param page: Identifier of the page that was drawn, e.g. its title.
+        """
+        global _first_run_done
+        seconds = time.perf_counter() - self.start
+        with _first_run_lock:
+            cold, _first_run_done = not _first_run_done, True
+        last_page = st.session_state.get("_last_page")
+        if cold:
+            kind = "cold_start"
+        elif last_page is None:
+            kind = "session_start"
+        elif last_page != page:
+            kind = "page_switch"
+        else:
+            kind = "rerun"
+        st.session_state["_last_page"] = page
+        metrics.record(f"app.{kind}", seconds)
+        return kind, seconds
+
+
+def startup_report():
+    """Rows ``{"run", "count", "p50 ms", "p90 ms", "max ms"}`` of the recorded run kinds."""
+    stages = metrics.snapshot("app.")
+    rows = []
+    for kind in StartupTimer.KINDS:
+        stats = stages.get(f"app.{kind}")
+        if stats is None:
+            continue
+        rows.append(
+            {
+                "run": kind.replace("_", " "),
+                "count": stats["count"],
+                "p50 ms": round(stats["p50"] * 1e3, 1),
+                "p90 ms": round(stats["p90"] * 1e3, 1),
+                "max ms": round(stats["max"] * 1e3, 1),
+            }
+        )
+    return rows
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-resolution image pyramid for interactive processing.
+
+The browser only shows a few hundred pixels of each image, so recomputing a
+transform on a multi-megapixel original at every slider move is wasted work.
+``ImagePyramid`` keeps cached ``cv.pyrDown`` levels of an image, runs
+interactive transforms on the smallest level that still covers the display
+width, and only touches level 0 (full resolution) for an explicit
+apply/export action.
+
+Pyramids are stored with the cached image from ``core.loader``, so they are
+built once per image and process, and their levels count toward the byte
+budget of the image cache.
+
+Example:
+    pyramid = get_pyramid(image, "gray")
+    result = pyramid.run(lambda img: apply_curve(img, "log", c=1.0), display_width=640)
+    st.image(result.image)
+    st.caption(result.describe())
+"""
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+import cv2 as cv
+
+__all__ = ["PyramidResult", "ImagePyramid", "get_pyramid"]
+
+
+class PyramidResult(NamedTuple):
+    """The output of a transform run on one pyramid level."""
+
+    image: np.ndarray
+    level: int
+    seconds: float
+
+    def describe(self):
+        height, width = self.image.shape[:2]
+        return f"level {self.level} ({width}x{height}) in {self.seconds * 1e3:.1f} ms"
+
+
+class ImagePyramid:
+    """
+    Lazily built Gaussian pyramid of an image.
+
+    Level 0 is the original image; each further level is ``cv.pyrDown`` of the
+    previous one (half the width and height). Levels are built on demand and
+    cached, and are read-only because they are shared between sessions.
+
+    Attributes:
+        min_size (int): Levels are not reduced below this many pixels on the short side.
+    """
+
+    def __init__(self, image, min_size=32):
+        self.min_size = min_size
+        self._levels = [image]
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self):
+        return self._levels[0].shape
+
+    @property
+    def nbytes(self):
+        """Size of the reduced levels; level 0 belongs to the source image."""
+        return sum(level.nbytes for level in self._levels[1:])
+
+    def _can_reduce(self, image):
+        return min(image.shape[:2]) // 2 >= self.min_size
+
+    def level(self, index):
+        """Return pyramid level ``index``, building missing levels as needed."""
+        with self._lock:
+            while len(self._levels) <= index:
+                previous = self._levels[-1]
+                if not self._can_reduce(previous):
+                    break
+                reduced = cv.pyrDown(previous)
+                reduced.setflags(write=False)
+                self._levels.append(reduced)
+            return self._levels[min(index, len(self._levels) - 1)]
+
+    def level_for(self, display_width):
+        """
+        Return the index of the smallest level at least ``display_width`` wide.
+
+        Never goes below ``min_size``; level 0 is returned when the original is
+        already narrower than the display.
+        """
+        width = self.shape[1]
+        index = 0
+        while width // 2 >= display_width and min(self.shape[:2]) >> (index + 1) >= self.min_size:
+            width //= 2
+            index += 1
+        return index
+
+    def run(self, func, display_width):
+        """
+        Run ``func`` on the level matching ``display_width`` and time it.
+
+        :param func: Callable taking an image array and returning an image array.
+        :param display_width: Width in pixels the result will be shown at.
+        :return: A ``PyramidResult`` with the output, level index and seconds.
+        """
+        index = self.level_for(display_width)
+        source = self.level(index)
+        start = time.perf_counter()
+        output = func(source)
+        return PyramidResult(output, index, time.perf_counter() - start)
+
+    def run_full(self, func):
+        """Run ``func`` on the full-resolution image (for apply/export)."""
+        start = time.perf_counter()
+        output = func(self._levels[0])
+        return PyramidResult(output, 0, time.perf_counter() - start)
+
+
+def get_pyramid(image, variant="gray"):
+    """
+    Return the cached pyramid for one variant of a ``core.loader.LoadedImage``.
+
+    :param image: The ``LoadedImage`` the pyramid belongs to.
+    :param variant: "bgr", "rgb" or "gray".
+    """
+    return image.derive(("pyramid", variant), lambda: ImagePyramid(getattr(image, variant)))
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering helpers for the Streamlit pages.
+
+Drawing images with ``plt.imshow`` and handing the global ``plt`` module to
+``st.pyplot`` rasterizes a full matplotlib figure through Agg on every rerun,
+and the figures are never closed. The helpers here avoid that:
+
+- ``show_image`` encodes a downscaled uint8 preview with ``cv.imencode`` and
+  sends the bytes to ``st.image``; the bytes are cached by content, so an
+  unchanged preview is not encoded again on the next rerun or by another
+  session (``st.image`` would run it through PIL every time).
+- ``line_chart`` and ``bar_chart`` build small Vega-Lite specs from
+  precomputed arrays, which the browser draws as vector graphics.
+- ``histogram_chart`` draws the 256-bin histograms of an
+  ``ImageStatistics``, so plots never rescan the pixels.
+- ``matplotlib_figure`` is the only way left to use matplotlib: it yields an
+  explicit ``Figure`` that is not registered with pyplot and is closed after
+  rendering.
+- ``RenderTimer`` measures sections of a rerun and shows the breakdown,
+  recording each section in ``utils.metrics`` so the caption can compare
+  this rerun with the median over all reruns.
+
+Example:
+    timer = RenderTimer("grayscale")
+    with timer.section("render"):
+        show_image(img_gray, caption="Gray Image", max_width=480)
+    timer.show()
+"""
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import streamlit as st
+
+from IOImages.encoding import encode
+from IOImages.sampling import mip_cache
+from utils.metrics import metrics
+
+__all__ = [
+    "preview",
+    "show_image",
+    "line_chart",
+    "bar_chart",
+    "histogram_chart",
+    "matplotlib_figure",
+    "RenderTimer",
+]
+
+# 默认预览宽度 (像素), 约等于宽布局下主区域的宽度
+DEFAULT_MAX_WIDTH = 1200
+
+
+def preview(image, max_width=DEFAULT_MAX_WIDTH):
+    """
+    Downscale ``image`` to at most ``max_width`` pixels wide as uint8.
+
+    The reduction is anti-aliased so the preview does not alias. Read-only
+    (shared) images go through the process-wide mip cache, so reruns start
+    from a cached level close to the preview size. Images that are already
+    small enough are returned unchanged (no copy).
+    """
+    if image.dtype != np.uint8:
+        image = np.clip(image, 0, 255).astype(np.uint8)
+    height, width = image.shape[:2]
+    if width <= max_width:
+        return image
+    scale = max_width / width
+    size = (max_width, max(1, round(height * scale)))
+    return mip_cache.resize(image, size)
+
+
+def show_image(image, caption=None, max_width=DEFAULT_MAX_WIDTH, channels="RGB", format="jpeg", quality=None):
+    """
+    Display an image array with ``st.image`` as a downscaled preview.
+
+    The encode time and size are recorded in ``utils.metrics`` under
+    ``"encode.<format>"``.
+
+    :param image: uint8 gray, RGB or BGR array.
+    :param caption: Optional caption shown under the image.
+    :param max_width: Width in pixels the preview is reduced to.
+    :param channels: "RGB" or "BGR", ignored for gray images.
+    :param format: "jpeg" (photos) or "png" (lossless, for binary images and text).
+    :param quality: JPEG quality, default 90.
+    """
+    if format not in ("jpeg", "png"):
+        # st.image 只原样转发 JPEG 和 PNG, 其他格式会被 PIL 重新编码
+        raise ValueError(f"show_image supports 'jpeg' and 'png', got '{format}'")
+    encoded = encode(preview(image, max_width), format, quality=quality, channels=channels)
+    metrics.record(f"encode.{format}", encoded.seconds, nbytes=encoded.nbytes)
+    return st.image(
+        encoded.data,
+        caption=caption,
+        output_format=format.upper(),
+        width="stretch",
+    )
+
+
+def _records(columns):
+    names = list(columns)
+    arrays = [np.asarray(columns[name]).tolist() for name in names]
+    return [dict(zip(names, row)) for row in zip(*arrays)]
+
+
+def line_chart(x, series, title=None, x_label="x", y_label="y", domain=None, height=360):
+    """
+    Draw one or more curves sampled at ``x`` as a Vega-Lite line chart.
+
+    :param x: 1-D array of sample positions.
+    :param series: Mapping of legend label -> 1-D array of values at ``x``.
+    :param title: Optional chart title.
+    :param domain: Optional ``(min, max)`` applied to both axes.
+    """
+    x = np.asarray(x)
+    values = []
+    for label, y in series.items():
+        values.extend(_records({"x": x, "y": y, "series": np.full(x.shape, label)}))
+
+    scale = {"domain": list(domain)} if domain is not None else {}
+    spec = {
+        "mark": {"type": "line", "clip": True},
+        "height": height,
+        "encoding": {
+            "x": {"field": "x", "type": "quantitative", "title": x_label, "scale": scale},
+            "y": {"field": "y", "type": "quantitative", "title": y_label, "scale": scale},
+            "color": {"field": "series", "type": "nominal", "title": None},
+        },
+    }
+    if title:
+        spec["title"] = title
+    return st.vega_lite_chart({"values": values}, spec, width="stretch")
+
+
+def bar_chart(labels, values, colors=None, title=None, x_label=None, y_label=None, domain=None, height=360):
+    """
+    Draw a bar per label as a Vega-Lite bar chart.
+
+    :param labels: Category labels.
+    :param values: Bar heights, one per label.
+    :param colors: Optional CSS colors, one per label.
+    :param domain: Optional ``(min, max)`` of the value axis.
+    """
+    color = {"field": "label", "type": "nominal", "legend": None}
+    if colors is not None:
+        color["scale"] = {"domain": list(labels), "range": list(colors)}
+
+    spec = {
+        "mark": "bar",
+        "height": height,
+        "encoding": {
+            "x": {"field": "label", "type": "nominal", "title": x_label, "sort": None},
+            "y": {
+                "field": "value",
+                "type": "quantitative",
+                "title": y_label,
+                "scale": {"domain": list(domain)} if domain is not None else {},
+            },
+            "color": color,
+        },
+    }
+    if title:
+        spec["title"] = title
+    data = {"values": _records({"label": list(labels), "value": values})}
+    return st.vega_lite_chart(data, spec, width="stretch")
+
+
+# 直方图默认颜色, 按通道名
+_HISTOGRAM_COLORS = {"gray": "gray", "blue": "#1f77b4", "green": "#2ca02c", "red": "#d62728", "alpha": "#999999"}
+
+
+def histogram_chart(statistics, channels=("gray",), title=None, height=240):
+    """
+    Draw 256-bin histograms from an ``IOImages.image_stats.ImageStatistics``.
+
+    Only the counts are sent to the browser; the image is not read.
+
+    :param statistics: The ``ImageStatistics`` to plot.
+    :param channels: Channel names (or indices) to overlay.
+    :param title: Optional chart title.
+    """
+    levels = np.arange(256)
+    values = []
+    for channel in channels:
+        values.extend(
+            _records(
+                {
+                    "level": levels,
+                    "count": statistics.histogram(channel),
+                    "channel": np.full(256, str(channel)),
+                }
+            )
+        )
+    names = [str(channel) for channel in channels]
+    spec = {
+        "mark": {"type": "area", "opacity": 0.5, "interpolate": "step"},
+        "height": height,
+        "encoding": {
+            "x": {"field": "level", "type": "quantitative", "title": "Pixel Value", "scale": {"domain": [0, 255]}},
+            "y": {"field": "count", "type": "quantitative", "title": "Frequency", "stack": None},
+            "color": {
+                "field": "channel",
+                "type": "nominal",
+                "title": None,
+                "scale": {"domain": names, "range": [_HISTOGRAM_COLORS.get(name, "gray") for name in names]},
+                "legend": None if len(names) == 1 else {},
+            },
+        },
+    }
+    if title:
+        spec["title"] = title
+    return st.vega_lite_chart({"values": values}, spec, width="stretch")
+
+
+@contextmanager
+def matplotlib_figure(**kwargs):
+    """
+    Yield an explicit matplotlib ``Figure`` and render it with ``st.pyplot``.
+
+    The figure is created without pyplot, so it is not kept alive by pyplot's
+    global figure registry, and it is cleared once rendered.
+
+    Example:
+        with matplotlib_figure(figsize=(5, 5)) as fig:
+            ax = fig.subplots()
+            ax.plot(x, y)
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure(**kwargs)
+    try:
+        yield fig
+        st.pyplot(fig)
+    finally:
+        fig.clear()
+
+
+class RenderTimer:
+    """
+    Measure named sections of a page rerun and display the breakdown.
+
+    Each section is also recorded as the ``<prefix>.<name>`` stage of
+    ``utils.metrics.metrics``, which aggregates it over all reruns and sessions.
+
+    Attributes:
+        prefix (str): Stage name prefix, usually the page name.
+        sections (dict): Section name -> accumulated seconds in this rerun.
+    """
+
+    def __init__(self, prefix="page"):
+        self.prefix = prefix
+        self.sections = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def section(self, name):
+        start = time.perf_counter()
+        try:
+            with metrics.span(f"{self.prefix}.{name}"):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.sections[name] = self.sections.get(name, 0.0) + elapsed
+
+    @property
+    def total(self):
+        return time.perf_counter() - self._start
+
+    def summary(self):
+        stages = metrics.snapshot(f"{self.prefix}.")
+        parts = []
+        for name, seconds in self.sections.items():
+            part = f"{name} {seconds * 1e3:.1f} ms"
+            stats = stages.get(f"{self.prefix}.{name}")
+            if stats and stats["count"] > 1:
+                part += f" (p50 {stats['p50'] * 1e3:.1f})"
+            parts.append(part)
+        parts.append(f"total {self.total * 1e3:.1f} ms")
+        return " · ".join(parts)
+
+    def show(self, container=None):
+        """Write the per-rerun timing breakdown as a caption."""
+        (container or st).caption(f"⏱ Rerun timing: {self.summary()}")
@@ -1,9 +1,7 @@
 # -*- encoding: utf-8 -*-
-import tomllib as tl
-import pandas as pd
 import streamlit as st
-import seaborn as sns
-import plotly.express as px
+
+from core.navigation import startup_report
 
 st.image("static/logo_with_text.png")
 st.title("Settings")
@@ -15,3 +13,13 @@ st.write("This is the item two")
 st.write("This is the item three")
 st.write("This is the item four")
 st.write("This is the item five")
+
+st.divider()
+
+# # 启动耗时: 冷启动 / 会话开始 / 切换页面 / 重新运行, 从脚本开始到页面绘制完成
+st.header("Start-up timing")
+rows = startup_report()
+if rows:
+    st.table(rows)
+else:
+    st.write("No runs recorded yet.")
@@ -1,39 +1,200 @@
 # -*- encoding: utf-8 -*-
-import tomllib as tl
+from functools import partial
 
 import numpy as np
-import pandas as pd
-
-from PIL import Image
 import cv2 as cv
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
 
-import config
+from IOImages.encoding import encode
+from IOImages.surface import DEFAULT_MAX_VERTICES, surface_figure
+from IOImages.transforms import STEPS, Transform
+from core.fragments import fragment_memo
+from core.loader import image_source
+from core.render import RenderTimer, show_image
+from core.pyramid import get_pyramid
+
+# 预览宽度: 交互时只在与之匹配的金字塔层上计算
+PREVIEW_WIDTH = 960
+
+INTERPOLATIONS = {
+    "linear": cv.INTER_LINEAR,
+    "nearest": cv.INTER_NEAREST,
+    "cubic": cv.INTER_CUBIC,
+    "lanczos": cv.INTER_LANCZOS4,
+}
+# 第一项为默认: 与 Transform.apply 一致, 缩放的边缘行列不混入黑色
+BORDERS = {
+    "replicate": cv.BORDER_REPLICATE,
+    "constant": cv.BORDER_CONSTANT,
+    "reflect": cv.BORDER_REFLECT_101,
+}
+
+timer = RenderTimer("graphic-transformation")
 
 # Initialize the App
 if "current_page" not in st.session_state:
     st.session_state.current_page = None
 current_page = st.session_state.get("current_page", None)
+# 变换链: [{"id", "name"}], 参数保存在以 id 为键的控件中
+st.session_state.setdefault("transform_steps", [])
+st.session_state.setdefault("transform_next_id", 0)
+
+
+def add_step(name):
+    st.session_state.transform_steps.append({"id": st.session_state.transform_next_id, "name": name})
+    st.session_state.transform_next_id += 1
+
+
+def remove_step(step_id):
+    st.session_state.transform_steps = [
+        step for step in st.session_state.transform_steps if step["id"] != step_id
+    ]
+
+
+def step_params(name, key, size, limit):
+    """
+    Widgets of one step; return its keyword arguments (full-resolution pixels).
+
+    :param size: Canvas ``(width, height)`` left by the previous steps.
+    :param limit: Range of the translation sliders, fixed so they keep their
+        value when earlier steps change the canvas.
+    """
+    width, height = size
+    # # 平移
+    if name == "translate":
+        return {
+            "tx": st.slider("tx (px)", -limit, limit, 0, key=f"{key}_tx"),
+            "ty": st.slider("ty (px)", -limit, limit, 0, key=f"{key}_ty"),
+        }
+    # # 旋转
+    if name == "rotate":
+        return {
+            "angle": st.slider("angle (°)", -180, 180, 90, key=f"{key}_angle"),
+            "expand": st.checkbox("expand canvas", value=True, key=f"{key}_expand"),
+        }
+    # # 缩放
+    if name == "scale":
+        fx = st.slider("fx", 0.1, 4.0, 1.0, 0.05, key=f"{key}_fx")
+        fy = st.slider("fy", 0.1, 4.0, fx, 0.05, key=f"{key}_fy")
+        resize = st.checkbox("resize canvas", value=True, key=f"{key}_resize")
+        return {"fx": fx, "fy": fy, "resize": resize}
+    # # 翻转
+    if name == "flip":
+        return {"axis": st.selectbox("axis", ["horizontal", "vertical", "both"], key=f"{key}_axis")}
+    # # 剪切
+    if name == "shear":
+        return {
+            "sx": st.slider("sx", -1.0, 1.0, 0.2, 0.05, key=f"{key}_sx"),
+            "sy": st.slider("sy", -1.0, 1.0, 0.0, 0.05, key=f"{key}_sy"),
+        }
+    # # 仿射变换
+    if name == "affine":
+        columns = st.columns(3)
+        values = [
+            columns[i % 3].number_input(label, value=default, step=0.1, key=f"{key}_{label}")
+            for i, (label, default) in enumerate(
+                zip(["a", "b", "tx", "c", "d", "ty"], [1.0, 0.0, 0.0, 0.0, 1.0, 0.0])
+            )
+        ]
+        return {"matrix": np.reshape(values, (2, 3))}
+    # # 透视变换: 上下边向内收缩 (梯形校正)
+    top = st.slider("top inset", 0.0, 0.45, 0.15, 0.01, key=f"{key}_top")
+    bottom = st.slider("bottom inset", 0.0, 0.45, 0.0, 0.01, key=f"{key}_bottom")
+    right, low = width - 1, height - 1
+    src = [[0, 0], [right, 0], [0, low], [right, low]]
+    dst = [[top * width, 0], [right - top * width, 0], [bottom * width, low], [right - bottom * width, low]]
+    return {"src": src, "dst": dst}
 
-# 导入图像
-img = cv.imread(config.TEST_IMAGE)
-img_gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
 
 # Sidebar
 with st.sidebar:
     st.title("Graphic Transformation")
+    # 导入图像 (进程级缓存, 交互时不会重新解码)
+    with timer.section("load"):
+        image = image_source()
+        pyramid = get_pyramid(image, "rgb")
 
-# # 平移
-# # 旋转
-# # 缩放
+    # 变换链在全分辨率坐标下组合成一个 3x3 矩阵, 整条链只重采样一次
+    st.subheader("Steps")
+    new_step = st.selectbox("Add step", STEPS)
+    st.button("Add", on_click=add_step, args=(new_step,))
+    transform = Transform(pyramid.shape)
+    for index, step in enumerate(st.session_state.transform_steps, start=1):
+        with st.expander(f"{index}. {step['name']}", expanded=True):
+            params = step_params(
+                step["name"], f"transform_{step['id']}", transform.size, max(pyramid.shape[:2])
+            )
+            transform = getattr(transform, step["name"])(**params)
+            st.button("Remove", key=f"remove_{step['id']}", on_click=remove_step, args=(step["id"],))
 
-# # 翻转
+    st.subheader("Resampling")
+    interpolation = st.selectbox("Interpolation", list(INTERPOLATIONS))
+    border = st.selectbox("Border", list(BORDERS))
 
-# # 仿射变换
-# # 透视变换
+apply = partial(
+    Transform.apply,
+    interpolation=INTERPOLATIONS[interpolation],
+    border_mode=BORDERS[border],
+)
 
 # Main Area
-st.title("Graphic Transformation")
\ No newline at end of file
+st.title("Graphic Transformation")
+
+st.write(f"Current Page: {current_page}")
+
+# 预览: 同一变换链换算到金字塔层的坐标, 仍然只做一次重采样
+level = pyramid.level(pyramid.level_for(PREVIEW_WIDTH))
+preview_transform = transform.rescaled(level.shape)
+with timer.section("compute"):
+    result = fragment_memo("graphic-transformation").get(
+        (image.key, preview_transform.key(), interpolation, border),
+        lambda: pyramid.run(partial(apply, preview_transform), PREVIEW_WIDTH),
+    )
+
+col1, col2 = st.columns(2)
+with col1:
+    st.header("Original")
+    with timer.section("render"):
+        show_image(level, caption=image.name, max_width=PREVIEW_WIDTH)
+with col2:
+    st.header("Transformed")
+    with timer.section("render"):
+        show_image(result.image, caption=repr(transform), max_width=PREVIEW_WIDTH)
+        st.caption(
+            f"{len(transform.steps)} steps → one {transform.method} · {result.describe()}"
+        )
+
+st.subheader("Composed matrix")
+st.code(np.array2string(transform.matrix, precision=4, suppress_small=True))
+
+height, width = pyramid.shape[:2]
+
+# 3D 视图: 按顶点预算面积平均, 缩放时只重采样可见窗口
+with st.expander("3D surface"):
+    budget = st.select_slider(
+        "Vertex budget", [10_000, 40_000, 160_000, 640_000], value=DEFAULT_MAX_VERTICES
+    )
+    x_range = st.slider("x range (px)", 0, width, (0, width))
+    y_range = st.slider("y range (px)", 0, height, (0, height))
+    relief = st.slider("relief", 0.0, 0.5, 0.0, 0.05)
+    try:
+        with timer.section("surface"):
+            figure = surface_figure(
+                image.gray, budget, roi=(x_range[0], y_range[0], x_range[1], y_range[1]), relief=relief
+            )
+        st.plotly_chart(figure, width="stretch")
+        st.caption(figure.layout.meta)
+    except ValueError as error:
+        st.warning(str(error))
+
+if st.button(f"Apply at full resolution ({width}x{height})"):
+    full = pyramid.run_full(partial(apply, transform))
+    encoded = encode(full.image, "png", channels="RGB")
+    st.download_button(
+        f"Download transformed image ({full.seconds * 1e3:.1f} ms, {encoded.describe()})",
+        data=encoded.data,
+        file_name=f"transformed_{image.name.rsplit('.', 1)[0]}.png",
+        mime="image/png",
+    )
+
+timer.show()
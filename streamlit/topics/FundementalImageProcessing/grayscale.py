@@ -1,35 +1,77 @@
 # -*- encoding: utf-8 -*-
-import tomllib as tl
+from functools import partial
 
 import numpy as np
-import pandas as pd
-
-from PIL import Image
-import cv2 as cv
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
 
-import config
+from IOImages.encoding import encode
+from IOImages.image_stats import image_statistics
+from IOImages.pointwise import apply_curve, get_lut
+from core.fragments import fragment_memo
+from core.loader import image_source
+from core.render import RenderTimer, show_image, line_chart, histogram_chart
+from core.pyramid import get_pyramid
+from utils.sweep import sweep
+
+# 预览宽度: 交互时只在与之匹配的金字塔层上计算
+PREVIEW_WIDTH = 640
+
+# 曲线图的横轴采样点, 所有会话共用
+ORIGINAL_PIXEL = np.linspace(0, 1, 100)
+
+# gamma 扫描: 参数网格与缩略图尺寸
+SWEEP_GAMMAS = np.round(np.linspace(0.2, 3.0, 15), 1)
+SWEEP_THUMBNAIL = 160
+
+timer = RenderTimer("grayscale")
 
 # Initialize the App
 if "current_page" not in st.session_state:
     st.session_state.current_page = None
 current_page = st.session_state.get("current_page", None)
 
-# 导入图像
-img = cv.imread(config.TEST_IMAGE)
-img_gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
-
-# normalize the image
-image_normalized = img_gray / 255.0
-
 # Sidebar
 with st.sidebar:
     st.title("GrayScale")
+    # 导入图像 (进程级缓存, 交互时不会重新解码)
+    with timer.section("load"):
+        image = image_source()
+        pyramid = get_pyramid(image, "gray")
+        img_gray = pyramid.level(pyramid.level_for(PREVIEW_WIDTH))
+        # 全分辨率直方图: 每幅图像只统计一次 (只读数组按对象缓存)
+        statistics = image_statistics(image.gray)
+
+
+def statistics_caption(statistics):
+    summary = statistics.summary()
+    return (
+        f"mean {summary['mean']:.1f} · std {summary['std']:.1f} · "
+        f"range {summary['min']}-{summary['max']} · entropy {summary['entropy']:.2f} bits"
+    )
+
+
+def export_button(name, transform, pyramid, image):
+    """Compute ``transform`` at full resolution only when explicitly asked."""
+    height, width = pyramid.shape[:2]
+    if st.button(f"Apply at full resolution ({width}x{height})", key=f"export_{name}"):
+        result = pyramid.run_full(transform)
+        encoded = encode(result.image, "png")
+        st.download_button(
+            f"Download {name} image ({result.seconds * 1e3:.1f} ms, {encoded.describe()})",
+            data=encoded.data,
+            file_name=f"{name}_{image.name.rsplit('.', 1)[0]}.png",
+            mime="image/png",
+        )
+
+
+# 每个变换是一个独立的片段 (st.fragment): 移动滑块只重新运行该片段,
+# 依赖 (图像, 金字塔与直方图统计) 作为参数显式传入; 更换图像时整页重新运行
+
+
+@st.fragment
+def log_panel(image, pyramid, statistics):
+    panel_timer = RenderTimer("grayscale.log")
     # # 对数变换
-    st.header("Log Transformation")
     c1 = st.slider(
         label="constant 1",
         min_value=0.0,
@@ -38,13 +80,40 @@ with st.sidebar:
         step=0.1,
         format="%.1f",
     )  # 通常取 1，或者根据需要调整
-    log_transformed = c1 * np.log(1 + image_normalized)
-    # 反归一化到 [0, 255] 范围
-    log_transformed = np.uint8(log_transformed * 255)
-    st.divider()
+    # 查找表: 只对 256 个灰度级求 log, 再一次映射整幅图像
+    log_transform = partial(apply_curve, name="log", c=c1)
+    with panel_timer.section("compute"):
+        result = fragment_memo("grayscale.log").get(
+            (image.key, c1), lambda: pyramid.run(log_transform, PREVIEW_WIDTH)
+        )
 
+    with panel_timer.section("render"):
+        show_image(result.image, caption="Log Transformed Image", max_width=PREVIEW_WIDTH)
+        st.caption(result.describe())
+        # 输出直方图由输入直方图经查找表推导, 不读取像素
+        output_statistics = statistics.apply_lut(get_lut("log", c=c1))
+        histogram_chart(output_statistics, height=160)
+        st.caption(statistics_caption(output_statistics))
+        line_chart(
+            ORIGINAL_PIXEL,
+            {
+                f"Scaling Factor = {c1}": c1 * np.log1p(ORIGINAL_PIXEL),
+                "Identity": ORIGINAL_PIXEL,
+            },
+            title="Logarithmic Transformation of Pixel Values",
+            x_label="Original Pixel Value",
+            y_label="Transformed Pixel Value",
+            domain=(0, 1),
+            height=240,
+        )
+    export_button("log", log_transform, pyramid, image)
+    panel_timer.show()
+
+
+@st.fragment
+def power_panel(image, pyramid, statistics):
+    panel_timer = RenderTimer("grayscale.power")
     # # 幂次变换
-    st.header("Power-Law Transformation")
     c2 = st.slider(
         label="constant 2",
         min_value=0.0,
@@ -61,30 +130,72 @@ with st.sidebar:
         step=0.1,
         format="%.1f",
     )
-    # 应用幂律变换
-    power_law_transformed = c2 * (image_normalized**gamma)
+    # 应用幂律变换 (查找表)
+    power_law_transform = partial(apply_curve, name="power", c=c2, gamma=gamma)
+    with panel_timer.section("compute"):
+        result = fragment_memo("grayscale.power").get(
+            (image.key, c2, gamma), lambda: pyramid.run(power_law_transform, PREVIEW_WIDTH)
+        )
 
-    # 反归一化到 [0, 255] 范围
-    power_law_transformed = np.uint8(power_law_transformed * 255)
+    with panel_timer.section("render"):
+        show_image(
+            result.image, caption="Power-Law Transformed Image", max_width=PREVIEW_WIDTH
+        )
+        st.caption(result.describe())
+        output_statistics = statistics.apply_lut(get_lut("power", c=c2, gamma=gamma))
+        histogram_chart(output_statistics, height=160)
+        st.caption(statistics_caption(output_statistics))
+        line_chart(
+            ORIGINAL_PIXEL,
+            {
+                f"Scaling Factor = {c2}, Gamma = {gamma}": c2 * ORIGINAL_PIXEL**gamma,
+                "Identity": ORIGINAL_PIXEL,
+            },
+            title="Power-Law Transformation of Pixel Values",
+            x_label="Original Pixel Value",
+            y_label="Transformed Pixel Value",
+            domain=(0, 1),
+            height=240,
+        )
+    with st.expander("Gamma sweep"):
+        # 一个直方图推导全部 gamma 的统计量, 缩略图由最小的金字塔层映射
+        with panel_timer.section("sweep"):
+            result = fragment_memo("grayscale.power.sweep").get(
+                (image.key, c2),
+                lambda: sweep(
+                    image.gray,
+                    "power",
+                    {"gamma": SWEEP_GAMMAS},
+                    params={"c": c2},
+                    statistics=statistics,
+                    preview=pyramid.level(pyramid.level_for(SWEEP_THUMBNAIL)),
+                ),
+            )
+        best = result.best("entropy")
+        show_image(result.contact_sheet(columns=4, metric="entropy"), caption=repr(result), format="png")
+        st.caption(f"Highest entropy at gamma = {best['gamma']}")
+    export_button("power-law", power_law_transform, pyramid, image)
+    panel_timer.show()
 
 
 st.title("GrayScale")
 
 st.write(f"Current Page: {current_page}")
 
-# 显示图像
-plt.figure(figsize=(18, 6))
-plt.subplot(1, 3, 1), plt.title("Gray Image")
-plt.imshow(img_gray, cmap="gray")
-
-
-plt.subplot(1, 3, 2), plt.title("Log Transformed Image")
-plt.imshow(log_transformed, cmap="gray")
-
-plt.subplot(1, 3, 3), plt.title("Power-Law Transformed Image")
-plt.imshow(power_law_transformed, cmap="gray")
-
-st.pyplot(plt)
+# 显示图像: 直接发送缩小后的 uint8 预览, 不经过 matplotlib
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.header("Gray Image")
+    with timer.section("render"):
+        show_image(img_gray, caption="Gray Image", max_width=PREVIEW_WIDTH)
+        histogram_chart(statistics, height=160)
+        st.caption(statistics_caption(statistics))
+with col2:
+    st.header("Log Transformation")
+    log_panel(image, pyramid, statistics)
+with col3:
+    st.header("Power-Law Transformation")
+    power_panel(image, pyramid, statistics)
 
 st.divider()
 
@@ -99,25 +210,6 @@ with tab1:
         """,
         unsafe_allow_html=True,
     )
-    # 使用 Streamlit 布局容器调整宽度
-    col, _, _ = st.columns([1, 1, 1])
-    with col:
-        ScalingFactor = c1
-        OriginalPixel = np.linspace(0, 1, 100)
-        TransformedPixel = ScalingFactor * np.log1p(OriginalPixel)
-        plt.figure(figsize=(5, 5))
-        plt.plot(
-            OriginalPixel, TransformedPixel, label=f"Scaling Factor = {ScalingFactor}"
-        )
-        plt.plot(OriginalPixel, OriginalPixel)
-        plt.xlim(0, 1)
-        plt.ylim(0, 1)
-        plt.xlabel("Original Pixel Value")
-        plt.ylabel("Transformed Pixel Value")
-        plt.title("Logarithmic Transformation of Pixel Values")
-        plt.legend()
-        plt.grid(True)
-        st.pyplot(plt)
 
 with tab2:
     st.write("## Power-Law Transformation")
@@ -133,24 +225,5 @@ with tab2:
         """,
         unsafe_allow_html=True,
     )
-    # 使用 Streamlit 布局容器调整宽度
-    col, _, _ = st.columns([1, 1, 1])
-    with col:
-        ScalingFactor = c2
-        gamma = gamma
-        OriginalPixel = np.linspace(0, 1, 100)
-        plt.figure(figsize=(5, 5))
-        plt.plot(
-            OriginalPixel,
-            ScalingFactor * OriginalPixel**gamma,
-            label=f"Scaling Factor = {ScalingFactor}, Gamma = {gamma}",
-        )
-        plt.plot(OriginalPixel, OriginalPixel)
-        plt.xlim(0, 1)
-        plt.ylim(0, 1)
-        plt.xlabel("Original Pixel Value")
-        plt.ylabel("Transformed Pixel Value")
-        plt.title("Power-Law Transformation of Pixel Values")
-        plt.legend()
-        plt.grid(True)
-        st.pyplot(plt)
+
+timer.show()
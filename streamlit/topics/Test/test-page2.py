@@ -1,9 +1,5 @@
 # -*- encoding: utf-8 -*-
-import tomllib as tl
-import pandas as pd
 import streamlit as st
-import seaborn as sns
-import plotly.express as px
 
 # Initialize the App
 if "current_page" not in st.session_state:
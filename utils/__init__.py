@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
-"""Missing docstring"""
+"""
+utils: logging, metrics, compute devices and backends, pipelines, parameter sweeps, batch and tiled processing
 
-from .logger import LoggerFactory
-from .devices import get_device_info
+Submodules and the names they export are imported on first access, so
+``from utils import LoggerFactory`` does not pay for torch, OpenCV or the other
+submodules.
 
+The process-wide metrics registry is ``utils.metrics.metrics``; ``utils.metrics``
+itself is always the submodule.
+"""
+import importlib
 
 __version__ = "0.1.0"
 __data__ = "2024-08-06"
@@ -11,10 +17,42 @@ __author__ = "_NoMem"
 __email__ = "novarye.g@gmail.com"
 __status__ = "Development"
 
-__all__ = [
-    "LoggerFactory",
-    "get_device_info",
-]
+# 名称 -> 定义它的子模块, 首次访问时才导入
+_LAZY_NAMES = {
+    "LoggerFactory": "logger",
+    "JsonFormatter": "logger",
+    "RateLimitFilter": "logger",
+    "stop_queue_listener": "logger",
+    "DeviceInfo": "devices",
+    "probe_devices": "devices",
+    "get_device_info": "devices",
+    "dispatch": "backends",
+    "configure_threads": "backends",
+    "Pipeline": "pipeline",
+    "BufferPool": "pipeline",
+    "SweepResult": "sweep",
+    "MetricsRegistry": "metrics",
+}
+_SUBMODULES = {"logger", "metrics", "devices", "backends", "pipeline", "sweep", "batch", "tiles"}
+
+__all__ = list(_LAZY_NAMES)
+
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        module = importlib.import_module(f".{_LAZY_NAMES[name]}", __name__)
+        value = getattr(module, name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES) | _SUBMODULES)
+
 
 # utils_logger = LoggerFactory(name="utils_logger").logger
 
@@ -0,0 +1,662 @@
+# -*- coding: utf-8 -*-
+"""
+Pluggable compute backends with per-operation autotuning.
+
+Each primitive (color conversion, lookup tables, binary threshold, box,
+median and Gaussian filters) is registered once per backend, "numpy",
+"opencv" or "torch" (CPU). ``dispatch`` runs the fastest one:
+
+    from utils.backends import dispatch
+
+    gray = dispatch("bgr_to_gray", img_bgr)
+    smooth = dispatch("median_filter", gray, 11)
+    smooth = dispatch("median_filter", gray, 11, backend="opencv")  # force one
+
+The first call for a given operation, size class (the pixel count rounded to
+a power of two), channels, dtype and key parameters (e.g. the kernel size)
+times every backend that accepts the input and keeps the fastest. Tuning runs
+on a centered crop of at most ``tune_pixels`` pixels: each candidate is first
+probed on a small crop, and candidates whose probe is far slower than the
+best one, or whose estimated time exceeds ``max_time``, are not timed further.
+The first call of a new signature therefore costs tens of milliseconds, not
+seconds, whatever the image size. Choices are stored in a JSON cache keyed by
+a fingerprint of the machine and library versions. Later processes on the
+same machine start with the right choice without tuning.
+
+Backends are not bit-exact with each other: the box and median filters agree
+exactly, the gray conversion within 1 gray level and the Gaussian filter
+within 2 (OpenCV uses fixed-point kernels). Since the choice depends on the
+machine and the size class, ``auto`` is for interactive use; code whose
+output must be reproducible (``utils.batch``, ``utils.tiles``,
+``utils.pipeline``) pins a backend.
+
+The tuner also owns the thread counts of OpenCV (``cv.setNumThreads``) and
+torch (``torch.set_num_threads``). Only one backend runs at a time, so both
+get the same budget; worker processes set it to 1 with
+``configure_threads(1)`` so pools do not oversubscribe the cores.
+
+The cache lives at ``$IMAGE_BACKEND_CACHE`` or
+``~/.cache/image-processing/backends.json``. Delete it (or call
+``Autotuner.clear``) after changing hardware drivers.
+"""
+import hashlib
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+import cv2 as cv
+
+__all__ = [
+    "BACKENDS",
+    "register_backend",
+    "available_operations",
+    "available_backends",
+    "machine_fingerprint",
+    "Autotuner",
+    "autotuner",
+    "dispatch",
+    "configure_threads",
+]
+
+BACKENDS = ("numpy", "opencv", "torch")
+
+# 操作名 -> _Operation
+_OPERATIONS = {}
+
+# 实现不支持某种输入时抛出的异常, 调优时跳过该后端
+_UNSUPPORTED = (TypeError, ValueError, NotImplementedError, RuntimeError, cv.error)
+
+
+class _Operation:
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self.implementations = {}
+
+
+def _define_operation(name, key=None):
+    """Declare an operation; ``key(*args, **kwargs)`` names the parameters that affect speed."""
+    _OPERATIONS[name] = _Operation(name, key or (lambda *args, **kwargs: ""))
+
+
+def register_backend(op, backend):
+    """
+    Register the ``backend`` implementation of the operation ``op``.
+
+    The decorated function takes the same arguments as every other
+    implementation of ``op`` and raises one of TypeError, ValueError,
+    NotImplementedError, RuntimeError or ``cv.error`` for inputs it does not
+    support.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    def decorator(func):
+        implementations = _OPERATIONS[op].implementations
+        if backend in implementations:
+            raise ValueError(f"Backend '{backend}' of '{op}' is already registered")
+        implementations[backend] = func
+        return func
+
+    return decorator
+
+
+def available_operations():
+    """Return ``{operation: [backends]}``."""
+    return {name: sorted(op.implementations) for name, op in sorted(_OPERATIONS.items())}
+
+
+def available_backends():
+    """Return the backends whose library can be imported on this machine."""
+    from .devices import probe_devices
+
+    if probe_devices().torch_available:
+        return list(BACKENDS)
+    return [backend for backend in BACKENDS if backend != "torch"]
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_fingerprint():
+    """Short hash of the CPU, platform and library versions the timings depend on."""
+    from .devices import probe_devices
+
+    parts = [
+        _cpu_model(),
+        str(os.cpu_count()),
+        platform.platform(),
+        platform.python_version(),
+        np.__version__,
+        cv.__version__,
+        str(probe_devices().torch_version),
+    ]
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=8).hexdigest()
+
+
+# # 自动调优
+
+
+def _default_cache_path():
+    return os.environ.get("IMAGE_BACKEND_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "image-processing", "backends.json"
+    )
+
+
+def _crop(image, pixels):
+    """Centered crop of ``image`` with at most about ``pixels`` pixels, same aspect ratio."""
+    height, width = image.shape[:2]
+    if height * width <= pixels:
+        return image
+    scale = (pixels / (height * width)) ** 0.5
+    rows, cols = max(1, int(height * scale)), max(1, int(width * scale))
+    top, left = (height - rows) // 2, (width - cols) // 2
+    return np.ascontiguousarray(image[top:top + rows, left:left + cols])
+
+
+class Autotuner:
+    """
+    Pick and remember the fastest backend of each operation per input signature.
+
+    Attributes:
+        cache_path (str): JSON cache file, or None to keep choices in memory only.
+        threads (int): Threads given to OpenCV and torch.
+        min_time (float): Seconds each candidate is timed for during tuning.
+        repeat (int): Maximum timed runs per candidate.
+        tune_pixels (int): Pixels of the crop candidates are timed on.
+        probe_pixels (int): Pixels of the crop every candidate is first probed on.
+        max_time (float): Candidates estimated to take longer on the tuning
+            crop are not timed there.
+    """
+
+    # 探测时慢于当前最优这么多倍的候选不再细测
+    SLOWDOWN = 4
+
+    def __init__(
+        self,
+        cache_path="default",
+        threads=None,
+        min_time=0.05,
+        repeat=5,
+        tune_pixels=512 * 512,
+        probe_pixels=96 * 96,
+        max_time=0.05,
+    ):
+        self.cache_path = _default_cache_path() if cache_path == "default" else cache_path
+        self.threads = threads or os.cpu_count() or 1
+        self.min_time = min_time
+        self.repeat = repeat
+        self.tune_pixels = tune_pixels
+        self.probe_pixels = probe_pixels
+        self.max_time = max_time
+        self._choices = None
+        self._fingerprint = None
+        self._threads_applied = None
+        self._pending = {}
+        self._lock = threading.RLock()
+
+    # ## 线程
+
+    def configure_threads(self, threads):
+        """Set the thread budget of OpenCV and torch (applied now and on torch import)."""
+        self.threads = max(1, int(threads))
+        self._threads_applied = None
+        self._apply_threads()
+
+    def _apply_threads(self):
+        torch = sys.modules.get("torch")
+        state = (self.threads, torch is not None)
+        if self._threads_applied == state:
+            return
+        cv.setNumThreads(self.threads)
+        if torch is not None:
+            torch.set_num_threads(self.threads)
+        self._threads_applied = state
+
+    # ## 缓存
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = machine_fingerprint()
+        return self._fingerprint
+
+    def _read_cache(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _load(self):
+        if self._choices is None:
+            self._choices = dict(self._read_cache().get(self.fingerprint, {}))
+        return self._choices
+
+    def _write_cache(self, data):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            temporary = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(temporary, self.cache_path)
+        except OSError:
+            # 缓存只是优化, 不可写时只保留在内存中
+            pass
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        # 与其他进程写入的结果合并后原子替换
+        data = self._read_cache()
+        data.setdefault(self.fingerprint, {}).update(self._choices)
+        self._write_cache(data)
+
+    def clear(self):
+        """Forget every choice of this machine, in memory and on disk."""
+        with self._lock:
+            self._choices = {}
+            data = self._read_cache()
+            if data.pop(self.fingerprint, None) is not None:
+                self._write_cache(data)
+
+    def choices(self):
+        """Return ``{signature: {"backend", "timings"}}`` for this machine."""
+        with self._lock:
+            return dict(self._load())
+
+    # ## 选择
+
+    def signature(self, op, *args, **kwargs):
+        """
+        The cache key of a call: operation, size class, channels, dtype, key parameters and threads.
+
+        The size class is the pixel count rounded to the nearest power of two,
+        so the frames of a video or the images of a batch share one choice.
+        """
+        image = args[0]
+        extra = _OPERATIONS[op].key(*args, **kwargs)
+        pixels = max(1, image.shape[0] * (image.shape[1] if image.ndim > 1 else 1))
+        channels = "x".join(map(str, image.shape[2:])) or "1"
+        return f"{op}|2^{round(np.log2(pixels))}px|c{channels}|{image.dtype}|{extra}|t{self.threads}"
+
+    def tune(self, op, *args, **kwargs):
+        """
+        Time every available backend of ``op`` on a crop of these arguments.
+
+        Every candidate is first probed on a ``probe_pixels`` crop; those
+        within ``SLOWDOWN`` times the best probe and estimated under
+        ``max_time`` are then timed on a ``tune_pixels`` crop. The others keep
+        their probe time scaled to the tuning crop.
+
+        :return: ``{backend: seconds on the tuning crop}`` of the backends that
+            accepted the input.
+        """
+        self._apply_threads()
+        implementations = _OPERATIONS[op].implementations
+        image, rest = args[0], args[1:]
+        sample = _crop(image, self.tune_pixels)
+        probe = _crop(sample, self.probe_pixels)
+        scale = sample.shape[0] * sample.shape[1] / (probe.shape[0] * probe.shape[1])
+
+        # 第一轮: 小块上预热并计时一次, 排除明显慢的候选
+        probes = {}
+        for backend in sorted(available_backends(), key=("opencv", "numpy", "torch").index):
+            func = implementations.get(backend)
+            if func is None:
+                continue
+            torch_loaded = "torch" in sys.modules
+            try:
+                func(probe, *rest, **kwargs)
+            except _UNSUPPORTED:
+                continue
+            if not torch_loaded and "torch" in sys.modules:
+                # 首次调用导入了 torch: 设置线程数后重新预热
+                self._apply_threads()
+                func(probe, *rest, **kwargs)
+            start = time.perf_counter()
+            func(probe, *rest, **kwargs)
+            probes[backend] = time.perf_counter() - start
+        if not probes:
+            raise TypeError(f"No backend of '{op}' supports a {image.dtype} image of shape {image.shape}")
+
+        # 第二轮: 只在调优块上细测有希望的候选
+        timings = {}
+        best = float("inf")
+        fastest_probe = min(probes.values())
+        for backend, seconds in sorted(probes.items(), key=lambda item: item[1]):
+            estimate = seconds * scale
+            if seconds > self.SLOWDOWN * fastest_probe or estimate > max(self.max_time, 2 * best):
+                timings[backend] = estimate
+                continue
+            func = implementations[backend]
+            samples = []
+            total = 0.0
+            while not samples or (len(samples) < self.repeat and total < self.min_time and total < best):
+                start = time.perf_counter()
+                func(sample, *rest, **kwargs)
+                samples.append(time.perf_counter() - start)
+                total += samples[-1]
+            timings[backend] = min(samples)
+            best = min(best, timings[backend])
+        return timings
+
+    def select(self, op, *args, **kwargs):
+        """
+        Return the backend to use for this call, tuning on the first call of its signature.
+
+        Tuning runs outside the lock, so other signatures are served meanwhile;
+        concurrent calls of the same signature wait for the first one's result.
+        """
+        if op not in _OPERATIONS:
+            raise KeyError(f"Unknown operation '{op}', available: {', '.join(sorted(_OPERATIONS))}")
+        key = self.signature(op, *args, **kwargs)
+        with self._lock:
+            choice = self._load().get(key)
+            if choice is not None:
+                return choice["backend"]
+            event = self._pending.get(key)
+            owner = event is None
+            if owner:
+                event = self._pending[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                choice = self._choices.get(key)
+            # 负责调优的线程失败时自己重试, 以便抛出同样的异常
+            return choice["backend"] if choice is not None else self.select(op, *args, **kwargs)
+
+        try:
+            timings = self.tune(op, *args, **kwargs)
+            choice = {"backend": min(timings, key=timings.get), "timings": timings}
+            with self._lock:
+                self._choices[key] = choice
+                self._save()
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+        return choice["backend"]
+
+    def run(self, op, *args, backend="auto", **kwargs):
+        """Run ``op`` with the chosen (or the given) backend."""
+        if backend == "auto":
+            backend = self.select(op, *args, **kwargs)
+        self._apply_threads()
+        try:
+            func = _OPERATIONS[op].implementations[backend]
+        except KeyError:
+            raise KeyError(f"Operation '{op}' has no '{backend}' backend") from None
+        return func(*args, **kwargs)
+
+
+# 进程内默认的调优器
+autotuner = Autotuner()
+
+
+def dispatch(op, *args, backend="auto", **kwargs):
+    """Run the operation ``op`` on the fastest (or the given) backend."""
+    return autotuner.run(op, *args, backend=backend, **kwargs)
+
+
+def configure_threads(threads):
+    """Set the OpenCV/torch thread budget of the default tuner."""
+    autotuner.configure_threads(threads)
+
+
+# # 实现
+
+
+def _torch():
+    import torch
+
+    return torch
+
+
+def _to_nchw(torch, image):
+    """(H, W[, C]) array -> float32 (1, C, H, W) tensor."""
+    tensor = torch.from_numpy(np.ascontiguousarray(image)).to(torch.float32)
+    if image.ndim == 2:
+        return tensor[None, None]
+    return tensor.permute(2, 0, 1)[None]
+
+
+def _from_nchw(tensor, like):
+    """float (1, C, H, W) tensor -> array shaped and typed like ``like``."""
+    array = tensor[0].permute(1, 2, 0).numpy() if like.ndim == 3 else tensor[0, 0].numpy()
+    return _round_to(array, like.dtype)
+
+
+def _round_to(array, dtype):
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        array = np.clip(np.rint(array), info.min, info.max)
+    return array.astype(dtype)
+
+
+def _odd_ksize(ksize):
+    if ksize < 1 or ksize % 2 == 0:
+        raise ValueError(f"ksize must be a positive odd number, got {ksize}")
+    return ksize
+
+
+def _pad_width(image, ksize):
+    # 偶数核的锚点在 ksize // 2, 与 OpenCV 一致
+    before, after = ksize // 2, (ksize - 1) // 2
+    return ((before, after), (before, after)) + ((0, 0),) * (image.ndim - 2)
+
+
+# ## 颜色转换: BGR -> 灰度, 权重同 cv.COLOR_BGR2GRAY
+
+_GRAY_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+_define_operation("bgr_to_gray")
+
+
+@register_backend("bgr_to_gray", "opencv")
+def _bgr_to_gray_opencv(image):
+    return cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+
+
+@register_backend("bgr_to_gray", "numpy")
+def _bgr_to_gray_numpy(image):
+    if image.ndim != 3 or image.shape[2] != 3:
+        raise ValueError("Expected a BGR image")
+    return _round_to(image @ _GRAY_WEIGHTS, image.dtype)
+
+
+@register_backend("bgr_to_gray", "torch")
+def _bgr_to_gray_torch(image):
+    if image.ndim != 3 or image.shape[2] != 3:
+        raise ValueError("Expected a BGR image")
+    torch = _torch()
+    tensor = torch.from_numpy(np.ascontiguousarray(image)).to(torch.float32)
+    return _round_to((tensor @ torch.from_numpy(_GRAY_WEIGHTS)).numpy(), image.dtype)
+
+
+# ## 查找表 (uint8 图像, 256 项)
+
+_define_operation("lut")
+
+
+@register_backend("lut", "opencv")
+def _lut_opencv(image, lut):
+    if image.dtype != np.uint8 or not (image.ndim == 2 or image.shape[2] <= 4):
+        raise TypeError("cv.LUT needs a uint8 image with at most 4 channels")
+    return cv.LUT(image, lut)
+
+
+@register_backend("lut", "numpy")
+def _lut_numpy(image, lut):
+    if image.dtype != np.uint8:
+        raise TypeError(f"Lookup tables need uint8 input, got {image.dtype}")
+    return np.take(lut, image)
+
+
+@register_backend("lut", "torch")
+def _lut_torch(image, lut):
+    if image.dtype != np.uint8:
+        raise TypeError(f"Lookup tables need uint8 input, got {image.dtype}")
+    torch = _torch()
+    indices = torch.from_numpy(np.ascontiguousarray(image)).to(torch.int64)
+    return torch.from_numpy(np.ascontiguousarray(lut))[indices].numpy()
+
+
+# ## 二值阈值, 同 cv.THRESH_BINARY
+
+_define_operation("threshold")
+
+
+@register_backend("threshold", "opencv")
+def _threshold_opencv(image, threshold, maxval=255):
+    return cv.threshold(image, threshold, maxval, cv.THRESH_BINARY)[1]
+
+
+@register_backend("threshold", "numpy")
+def _threshold_numpy(image, threshold, maxval=255):
+    return np.multiply(image > threshold, maxval, dtype=image.dtype)
+
+
+@register_backend("threshold", "torch")
+def _threshold_torch(image, threshold, maxval=255):
+    torch = _torch()
+    tensor = torch.from_numpy(np.ascontiguousarray(image))
+    return ((tensor > threshold).to(tensor.dtype) * maxval).numpy()
+
+
+# ## 均值 (盒式) 滤波, 边界 BORDER_REFLECT_101
+
+_define_operation("box_filter", key=lambda image, ksize: f"k{ksize}")
+
+
+@register_backend("box_filter", "opencv")
+def _box_filter_opencv(image, ksize):
+    return cv.blur(image, (ksize, ksize))
+
+
+@register_backend("box_filter", "numpy")
+def _box_filter_numpy(image, ksize):
+    # numpy 的 "reflect" 即 OpenCV 的 BORDER_REFLECT_101; 前缀和相减得到窗口和
+    padded = np.pad(image, _pad_width(image, ksize), mode="reflect").astype(np.float64)
+    sums = np.cumsum(padded, axis=0)
+    rows = sums[ksize - 1:].copy()
+    rows[1:] -= sums[:-ksize]
+    sums = np.cumsum(rows, axis=1)
+    windows = sums[:, ksize - 1:].copy()
+    windows[:, 1:] -= sums[:, :-ksize]
+    return _round_to(windows / (ksize * ksize), image.dtype)
+
+
+@register_backend("box_filter", "torch")
+def _box_filter_torch(image, ksize):
+    torch = _torch()
+    functional = torch.nn.functional
+    (top, bottom), (left, right) = _pad_width(image, ksize)[:2]
+    tensor = functional.pad(_to_nchw(torch, image), (left, right, top, bottom), mode="reflect")
+    return _from_nchw(functional.avg_pool2d(tensor, ksize, stride=1), image)
+
+
+# ## 中值滤波, 边界复制 (同 cv.medianBlur)
+
+_define_operation("median_filter", key=lambda image, ksize: f"k{ksize}")
+
+
+@register_backend("median_filter", "opencv")
+def _median_filter_opencv(image, ksize):
+    return cv.medianBlur(image, _odd_ksize(ksize))
+
+
+@register_backend("median_filter", "numpy")
+def _median_filter_numpy(image, ksize):
+    from Filtering import median_filter
+
+    return median_filter(image, ksize, method="histogram")
+
+
+# torch 展开窗口时每个条带至多占用的元素数
+_UNFOLD_ELEMENTS = 16 * 1024 * 1024
+
+
+@register_backend("median_filter", "torch")
+def _median_filter_torch(image, ksize):
+    torch = _torch()
+    radius = _odd_ksize(ksize) // 2
+    padded = np.pad(image, _pad_width(image, ksize), mode="edge")
+    tensor = _to_nchw(torch, padded)[0]
+    channels, height, width = tensor.shape[0], image.shape[0], image.shape[1]
+    rows = max(1, _UNFOLD_ELEMENTS // (channels * width * ksize * ksize))
+    strips = []
+    for top in range(0, height, rows):
+        bottom = min(top + rows, height)
+        windows = tensor[:, top:bottom + 2 * radius].unfold(1, ksize, 1).unfold(2, ksize, 1)
+        strips.append(windows.reshape(*windows.shape[:3], -1).median(dim=-1).values)
+    result = torch.cat(strips, dim=1)
+    return _from_nchw(result[None], image)
+
+
+# ## 高斯滤波, 边界 BORDER_REFLECT_101
+
+_define_operation("gaussian_filter", key=lambda image, ksize, sigma=0.0: f"k{ksize}")
+
+
+def _gaussian_kernel(ksize, sigma):
+    return cv.getGaussianKernel(_odd_ksize(ksize), sigma, cv.CV_32F).ravel()
+
+
+@register_backend("gaussian_filter", "opencv")
+def _gaussian_filter_opencv(image, ksize, sigma=0.0):
+    return cv.GaussianBlur(image, (_odd_ksize(ksize), _odd_ksize(ksize)), sigma)
+
+
+@register_backend("gaussian_filter", "numpy")
+def _gaussian_filter_numpy(image, ksize, sigma=0.0):
+    kernel = _gaussian_kernel(ksize, sigma)
+    padded = np.pad(image, _pad_width(image, ksize), mode="reflect").astype(np.float32)
+    height, width = image.shape[:2]
+    # 可分离: 先按行再按列做 ksize 次移位加权求和
+    rows = np.zeros((height,) + padded.shape[1:], dtype=np.float32)
+    for i, weight in enumerate(kernel):
+        rows += weight * padded[i:i + height]
+    result = np.zeros(image.shape, dtype=np.float32)
+    for i, weight in enumerate(kernel):
+        result += weight * rows[:, i:i + width]
+    return _round_to(result, image.dtype)
+
+
+@register_backend("gaussian_filter", "torch")
+def _gaussian_filter_torch(image, ksize, sigma=0.0):
+    torch = _torch()
+    functional = torch.nn.functional
+    kernel = torch.from_numpy(_gaussian_kernel(ksize, sigma))
+    radius = ksize // 2
+    tensor = functional.pad(_to_nchw(torch, image), (radius,) * 4, mode="reflect")
+    channels = tensor.shape[1]
+    vertical = kernel.view(1, 1, ksize, 1).repeat(channels, 1, 1, 1)
+    horizontal = kernel.view(1, 1, 1, ksize).repeat(channels, 1, 1, 1)
+    tensor = functional.conv2d(tensor, vertical, groups=channels)
+    tensor = functional.conv2d(tensor, horizontal, groups=channels)
+    return _from_nchw(tensor, image)
+
+
+if __name__ == "__main__":
+    for name, backends in available_operations().items():
+        print(f"{name:<18}{', '.join(backends)}")
+    print(f"available backends: {', '.join(available_backends())}")
+    print(f"machine fingerprint: {machine_fingerprint()}")
+    print(f"cache: {autotuner.cache_path}")
@@ -0,0 +1,633 @@
+# -*- coding: utf-8 -*-
+"""
+Headless batch processing of image files with a process pool.
+
+Runs a chain of named operations (grayscale curves, thresholding, filtering,
+noise) over a directory or glob of images. The work is split into stages
+that overlap through bounded queues:
+
+- a reader thread loads file bytes from disk,
+- worker processes decode, process and re-encode each image,
+- a writer thread saves the encoded results.
+
+Results keep the input's path relative to the common directory of all inputs,
+so same-named files from different subdirectories do not overwrite each other.
+
+At most ``queue_size`` images are buffered between stages, so memory stays
+bounded however many files are processed. A throughput and per-stage latency
+summary (images/s, p50/p95) is printed at the end.
+
+Usage (from the repository root):
+    python -m utils.batch images/ -o out/ --op gray --op log:c=1.2 --op otsu
+    python -m utils.batch "data/*.jpg" -o out/ --op median:ksize=11 --workers 8
+    python -m utils.batch --list-ops
+
+Operation parameters are written as ``name:key=value,key=value``; list values
+are separated by ``/`` (e.g. ``multi_threshold:thresholds=111/144``).
+"""
+import argparse
+import glob
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import cv2 as cv
+
+__all__ = [
+    "register_operation",
+    "available_operations",
+    "get_operation",
+    "operation_tiling",
+    "parse_operation",
+    "compile_chain",
+    "run_chain",
+    "output_targets",
+    "process_files",
+    "BatchStats",
+]
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+
+_OPERATIONS = {}
+# 名称 -> (halo, whole_image), 供 utils.tiles 判断能否分块执行
+_TILING = {}
+
+
+def register_operation(name, halo=None, whole_image=False):
+    """
+    Register ``func(image, **params) -> image`` as a batch operation.
+
+    Operations never modify ``image``; those that can write into a caller's
+    buffer take an optional ``out`` argument (``image`` itself is allowed).
+
+    :param halo: For neighborhood operations, the name of the kernel size
+        parameter, or ``halo(params) -> radius`` called with every parameter
+        (defaults filled in).
+    :param whole_image: The operation cannot run tile by tile (``utils.tiles``)
+        because it needs whole-image statistics or random state, or changes
+        the image size.
+    """
+
+    def decorator(func):
+        if name in _OPERATIONS:
+            raise ValueError(f"Operation '{name}' is already registered")
+        _OPERATIONS[name] = func
+        _TILING[name] = (halo, whole_image)
+        return func
+
+    return decorator
+
+
+def available_operations():
+    """Return ``{name: first docstring line}`` for the registered operations."""
+    return {
+        name: (func.__doc__ or "").strip().splitlines()[0] if func.__doc__ else ""
+        for name, func in sorted(_OPERATIONS.items())
+    }
+
+
+def get_operation(name):
+    """Return the operation function registered under ``name``."""
+    try:
+        return _OPERATIONS[name]
+    except KeyError:
+        raise KeyError(
+            f"Unknown operation '{name}', available: {', '.join(sorted(_OPERATIONS))}"
+        ) from None
+
+
+def operation_tiling(name):
+    """Return the ``(halo, whole_image)`` an operation was registered with."""
+    get_operation(name)
+    return _TILING[name]
+
+
+def _to_gray(image):
+    if image.ndim == 3:
+        return cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    return image
+
+
+# # 灰度变换
+
+
+@register_operation("gray")
+def gray_operation(image):
+    """Convert BGR to single-channel gray."""
+    return _to_gray(image)
+
+
+@register_operation("log")
+def log_operation(image, c=1.0):
+    """Log transform s = c * log(1 + r) through a lookup table."""
+    from IOImages.pointwise import apply_curve
+
+    return apply_curve(image, "log", c=c)
+
+
+@register_operation("power")
+def power_operation(image, c=1.0, gamma=1.0):
+    """Power-law transform s = c * r ^ gamma through a lookup table."""
+    from IOImages.pointwise import apply_curve
+
+    return apply_curve(image, "power", c=c, gamma=gamma)
+
+
+@register_operation("negative")
+def negative_operation(image):
+    """Negative s = 1 - r (normalized intensities) through a lookup table."""
+    from IOImages.pointwise import apply_curve
+
+    return apply_curve(image, "negative")
+
+
+# # 阈值分割
+
+
+@register_operation("threshold")
+def threshold_operation(image, value=111, maxval=255):
+    """Global binary threshold at ``value``."""
+    from Thresholding import binarize
+
+    return binarize(_to_gray(image), value, maxval)
+
+
+@register_operation("multi_threshold")
+def multi_threshold_operation(image, thresholds=(111, 144)):
+    """Piecewise threshold into evenly spaced gray levels."""
+    from Thresholding import apply_thresholds
+
+    return apply_thresholds(_to_gray(image), thresholds)
+
+
+@register_operation("adaptive", halo="block_size")
+def adaptive_operation(image, method="mean", block_size=11, c=8):
+    """Adaptive mean/gaussian threshold (cv.adaptiveThreshold)."""
+    methods = {
+        "mean": cv.ADAPTIVE_THRESH_MEAN_C,
+        "gaussian": cv.ADAPTIVE_THRESH_GAUSSIAN_C,
+    }
+    return cv.adaptiveThreshold(
+        _to_gray(image), 255, methods[method], cv.THRESH_BINARY, block_size, c
+    )
+
+
+@register_operation("sauvola", halo="block_size")
+def sauvola_operation(image, block_size=31, k=0.2, r=128):
+    """Sauvola local threshold from summed-area tables."""
+    from Thresholding import AdaptiveThresholder
+
+    return AdaptiveThresholder(_to_gray(image)).sauvola(block_size, k, r)
+
+
+@register_operation("niblack", halo="block_size")
+def niblack_operation(image, block_size=31, k=-0.2):
+    """Niblack local threshold from summed-area tables."""
+    from Thresholding import AdaptiveThresholder
+
+    return AdaptiveThresholder(_to_gray(image)).niblack(block_size, k)
+
+
+@register_operation("otsu", whole_image=True)
+def otsu_operation(image, levels=1):
+    """Otsu's threshold; levels > 1 gives multi-level Otsu."""
+    from Thresholding import ThresholdHistogram, apply_thresholds
+
+    gray = _to_gray(image)
+    thresholds = ThresholdHistogram.from_image(gray).otsu(levels)
+    return apply_thresholds(gray, thresholds)
+
+
+# # 滤波
+
+
+# 默认固定用 opencv 后端: 批处理、分块和流水线的输出不能随机器或尺寸类别变化
+# (各后端的高斯滤波相差可达 2 个灰度级); backend=auto 时按调优结果选择最快的实现
+
+
+@register_operation("mean", halo="ksize")
+def mean_operation(image, ksize=5, backend="opencv"):
+    """Mean (box) filter with a ksize x ksize kernel."""
+    from utils.backends import dispatch
+
+    return dispatch("box_filter", image, ksize, backend=backend)
+
+
+@register_operation("median", halo="ksize")
+def median_operation(image, ksize=5, backend="opencv"):
+    """Median filter with a ksize x ksize kernel."""
+    from utils.backends import dispatch
+
+    return dispatch("median_filter", image, ksize, backend=backend)
+
+
+def _gaussian_ksize(ksize, sigma, dtype=None):
+    # ksize <= 0 时与 cv.GaussianBlur 相同: 由 sigma 推出 (uint8 取 3 sigma, 其他取 4 sigma)
+    if ksize > 0:
+        return int(ksize)
+    if sigma <= 0:
+        raise ValueError("gaussian needs ksize > 0 or sigma > 0")
+    factor = 3 if dtype == np.uint8 else 4
+    return int(round(sigma * factor * 2 + 1)) | 1
+
+
+@register_operation("gaussian", halo=lambda params: _gaussian_ksize(params["ksize"], params["sigma"]) // 2)
+def gaussian_operation(image, ksize=5, sigma=1.0, backend="opencv"):
+    """Gaussian filter with a ksize x ksize kernel; ksize=0 derives it from sigma."""
+    from utils.backends import dispatch
+
+    return dispatch("gaussian_filter", image, _gaussian_ksize(ksize, sigma, image.dtype), sigma, backend=backend)
+
+
+# # 几何
+
+
+@register_operation("resize", whole_image=True)
+def resize_operation(image, width=0, height=0, max_size=0, interpolation="bilinear", antialias="auto"):
+    """Anti-aliased resize to width x height, or to fit in max_size x max_size."""
+    from IOImages.sampling import fit_size, resize
+
+    size = fit_size(image.shape, max_size) if max_size else (width, height)
+    return resize(image, size, interpolation=interpolation, antialias=antialias)
+
+
+# # 噪声
+
+
+@register_operation("gaussian_noise", whole_image=True)
+def gaussian_noise_operation(image, mean=0.0, sigma=25.0, seed=0, name="", out=None):
+    """Additive Gaussian noise, saturated to the uint8 range."""
+    from Noise import gaussian_noise, image_rng
+
+    # 每幅图像的随机数种子由 seed 和相对路径决定, 与工作进程无关
+    return gaussian_noise(image, image_rng(seed, name), mean=mean, sigma=sigma, out=out)
+
+
+@register_operation("noise", whole_image=True)
+def noise_operation(image, model="gaussian", seed=0, name="", out=None, **params):
+    """Any Noise model (gaussian, salt_and_pepper, poisson, speckle), seeded per file."""
+    from Noise import add_noise, image_rng
+
+    return add_noise(image, model, image_rng(seed, name), out=out, **params)
+
+
+def _parse_value(text):
+    if "/" in text:
+        return tuple(_parse_value(item) for item in text.split("/") if item)
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_operation(spec):
+    """
+    Parse ``"name:key=value,key=value"`` into ``(name, params)``.
+
+    :raises ValueError: If the operation is unknown or a parameter is malformed.
+    """
+    name, _, arguments = spec.partition(":")
+    name = name.strip()
+    if name not in _OPERATIONS:
+        raise ValueError(
+            f"Unknown operation '{name}', available: {', '.join(sorted(_OPERATIONS))}"
+        )
+    params = {}
+    for argument in filter(None, (item.strip() for item in arguments.split(","))):
+        key, sep, value = argument.partition("=")
+        if not sep:
+            raise ValueError(f"Malformed parameter '{argument}' in '{spec}'")
+        params[key.strip()] = _parse_value(value.strip())
+    return name, params
+
+
+# 每个进程按操作链缓存编译好的流水线, 中间缓冲区在图像之间复用
+_PIPELINES = {}
+
+
+def compile_chain(chain):
+    """Return the cached ``utils.pipeline.Pipeline`` of a parsed operation chain."""
+    from utils.pipeline import Pipeline
+
+    key = repr(chain)
+    pipeline = _PIPELINES.get(key)
+    if pipeline is None:
+        pipeline = _PIPELINES.setdefault(key, Pipeline(chain, name="batch"))
+    return pipeline
+
+
+def run_chain(image, chain, name=""):
+    """
+    Apply a parsed operation chain ``[(name, params), ...]`` to ``image``.
+
+    Consecutive pointwise operations run as one lookup table (see
+    ``utils.pipeline``); ``image`` is not modified.
+    """
+    return compile_chain(chain).run(image, name=name)
+
+
+# # 工作进程
+
+
+def _init_worker():
+    from utils.backends import configure_threads
+
+    # 每个进程只用一个 OpenCV/torch 线程, 避免与进程池争抢 CPU
+    configure_threads(1)
+
+
+def _process_one(path, name, data, chain, extension, encode_params):
+    timings = {}
+
+    start = time.perf_counter()
+    image = cv.imdecode(np.frombuffer(data, dtype=np.uint8), cv.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not decode '{path}'")
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    image = run_chain(image, chain, name=name)
+    timings["process"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ok, encoded = cv.imencode(extension, image, encode_params)
+    if not ok:
+        raise ValueError(f"Could not encode '{path}' as {extension}")
+    timings["encode"] = time.perf_counter() - start
+    compile_chain(chain).release(image)
+
+    return encoded.tobytes(), timings
+
+
+class BatchStats:
+    """
+    Per-stage latency samples and overall throughput of a batch run.
+
+    Attributes:
+        stages (dict): Stage name -> list of seconds, one entry per image.
+        failures (list): ``(path, error message)`` of images that failed.
+        elapsed (float): Wall time of the whole run in seconds.
+    """
+
+    STAGES = ("read", "decode", "process", "encode", "write")
+
+    def __init__(self):
+        self.stages = {stage: [] for stage in self.STAGES}
+        self.failures = []
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage].append(seconds)
+
+    @property
+    def completed(self):
+        return len(self.stages["write"])
+
+    def summary(self):
+        lines = [
+            f"Processed {self.completed} images in {self.elapsed:.2f} s "
+            f"({self.completed / self.elapsed if self.elapsed else 0.0:.2f} images/s), "
+            f"{len(self.failures)} failed",
+            f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}",
+        ]
+        for stage, samples in self.stages.items():
+            if not samples:
+                continue
+            p50, p95 = np.percentile(samples, [50, 95]) * 1e3
+            lines.append(f"{stage:<10}{p50:>10.2f}{p95:>10.2f}{sum(samples):>10.2f}")
+        for path, message in self.failures:
+            lines.append(f"FAILED {path}: {message}")
+        return "\n".join(lines)
+
+
+def collect_files(inputs, recursive=False):
+    """Expand directories and glob patterns into a sorted list of image files."""
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(item, recursive=recursive)
+        files.update(
+            path
+            for path in candidates
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+        )
+    return sorted(files)
+
+
+def _encode_params(extension, quality, compression):
+    if extension in (".jpg", ".jpeg"):
+        return [cv.IMWRITE_JPEG_QUALITY, quality]
+    if extension == ".webp":
+        return [cv.IMWRITE_WEBP_QUALITY, quality]
+    if extension == ".png":
+        return [cv.IMWRITE_PNG_COMPRESSION, compression]
+    return []
+
+
+def output_targets(files, output_dir, extension=None):
+    """
+    Map every input file to ``(relative name, output path)``.
+
+    The output mirrors the input's path relative to the common directory of
+    all inputs; the relative name (with ``/`` separators) also seeds the
+    per-file noise, so results do not depend on where the tree is.
+
+    :param extension: Output extension such as ".png"; default keeps the input's.
+    :raises ValueError: If two inputs would be written to the same path
+        (e.g. ``a.png`` and ``a.jpg`` with ``extension=".png"``).
+    """
+    if not files:
+        return {}
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files])
+    targets = {}
+    sources = {}
+    for path in files:
+        relative = os.path.relpath(os.path.abspath(path), root)
+        stem, input_extension = os.path.splitext(relative)
+        target = os.path.join(output_dir, stem + (extension or input_extension.lower()))
+        # 大小写不敏感的文件系统上 A.png 与 a.png 也会互相覆盖
+        other = sources.setdefault(os.path.normcase(target), path)
+        if other != path:
+            raise ValueError(f"'{other}' and '{path}' would both be written to '{target}'")
+        targets[path] = (relative.replace(os.sep, "/"), target)
+    return targets
+
+
+_DONE = object()
+
+
+def process_files(
+    files,
+    chain,
+    output_dir,
+    workers=None,
+    queue_size=None,
+    extension=None,
+    quality=95,
+    compression=3,
+):
+    """
+    Run ``chain`` over ``files`` and write the results into ``output_dir``.
+
+    :param files: Image paths to process.
+    :param chain: Parsed operation chain ``[(name, params), ...]``.
+    :param output_dir: Directory for the results (created if missing).
+    :param workers: Number of worker processes (default: CPU count).
+    :param queue_size: Images buffered per stage (default: 2 x workers).
+    :param extension: Output extension such as ".png"; default keeps the input's.
+    :param quality: JPEG/WebP quality.
+    :param compression: PNG compression level (0-9).
+    :return: A ``BatchStats`` with throughput and per-stage latencies.
+    :raises ValueError: If two inputs map to the same output path.
+    """
+    workers = workers or os.cpu_count() or 1
+    queue_size = queue_size or 2 * workers
+    # 在提交任何任务之前检查输出路径冲突
+    targets = output_targets(files, output_dir, extension)
+    os.makedirs(output_dir, exist_ok=True)
+
+    stats = BatchStats()
+    read_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    in_flight = threading.BoundedSemaphore(queue_size)
+
+    def reader():
+        for path in files:
+            start = time.perf_counter()
+            try:
+                with open(path, "rb") as file:
+                    data = file.read()
+            except OSError as e:
+                stats.failures.append((path, str(e)))
+                continue
+            stats.add("read", time.perf_counter() - start)
+            read_queue.put((path, data))
+        read_queue.put(_DONE)
+
+    def writer():
+        # 写入失败只记为该图像失败, 线程继续取队列直到 _DONE, 否则生产者会永久阻塞
+        while True:
+            item = write_queue.get()
+            if item is _DONE:
+                return
+            path, target, encoded = item
+            start = time.perf_counter()
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "wb") as file:
+                    file.write(encoded)
+            except Exception as e:  # pylint: disable=broad-except
+                stats.failures.append((path, str(e)))
+                continue
+            stats.add("write", time.perf_counter() - start)
+
+    def on_done(future, path, target):
+        in_flight.release()
+        try:
+            encoded, timings = future.result()
+        except Exception as e:  # pylint: disable=broad-except
+            stats.failures.append((path, str(e)))
+            return
+        for stage, seconds in timings.items():
+            stats.add(stage, seconds)
+        write_queue.put((path, target, encoded))
+
+    start = time.perf_counter()
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    reader_thread.start()
+    writer_thread.start()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        while True:
+            item = read_queue.get()
+            if item is _DONE:
+                break
+            path, data = item
+            name, target = targets[path]
+            out_extension = os.path.splitext(target)[1]
+            params = _encode_params(out_extension, quality, compression)
+
+            in_flight.acquire()
+            future = pool.submit(_process_one, path, name, data, chain, out_extension, params)
+            future.add_done_callback(
+                lambda f, path=path, target=target: on_done(f, path, target)
+            )
+
+    write_queue.put(_DONE)
+    reader_thread.join()
+    writer_thread.join()
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.batch",
+        description="Run an operation chain over a directory or glob of images.",
+    )
+    parser.add_argument("inputs", nargs="*", help="Directories or glob patterns")
+    parser.add_argument("-o", "--output", default="batch_output", help="Output directory")
+    parser.add_argument(
+        "--op",
+        dest="ops",
+        action="append",
+        default=[],
+        help="Operation as name:key=value,...; repeat to build a chain",
+    )
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=None)
+    parser.add_argument("--format", default=None, help="Output format, e.g. png or jpg")
+    parser.add_argument("--quality", type=int, default=95, help="JPEG/WebP quality")
+    parser.add_argument("--compression", type=int, default=3, help="PNG compression 0-9")
+    parser.add_argument("-r", "--recursive", action="store_true")
+    parser.add_argument("--list-ops", action="store_true", help="List operations and exit")
+    args = parser.parse_args(argv)
+
+    if args.list_ops:
+        for name, description in available_operations().items():
+            print(f"{name:<18}{description}")
+        return 0
+
+    try:
+        chain = [parse_operation(spec) for spec in args.ops]
+    except ValueError as e:
+        parser.error(str(e))
+    if not chain:
+        parser.error("at least one --op is required")
+
+    files = collect_files(args.inputs, recursive=args.recursive)
+    if not files:
+        parser.error("no image files matched the inputs")
+
+    extension = f".{args.format.lstrip('.').lower()}" if args.format else None
+    try:
+        stats = process_files(
+            files,
+            chain,
+            args.output,
+            workers=args.workers,
+            queue_size=args.queue_size,
+            extension=extension,
+            quality=args.quality,
+            compression=args.compression,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(stats.summary())
+    return 1 if stats.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
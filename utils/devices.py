@@ -1,34 +1,162 @@
 # -*- coding: utf-8 -*-
-""" Devices for PyTorch: get_device_info """
-import sys
+"""
+Compute devices for PyTorch: probe_devices, get_device_info
+
+torch is imported the first time a device is probed, not when this module is
+imported, and the probe runs once per process. On machines without torch the
+record says so instead of raising:
+
+    from utils.devices import probe_devices
+
+    info = probe_devices()
+    if info.torch_available:
+        print(info.best_device, info.device_names)
+    else:
+        print("torch unavailable:", info.error)
+"""
+import importlib
 import logging
-import torch
+import sys
+import threading
+
+__all__ = ["DeviceInfo", "probe_devices", "get_device_info"]
+
+
+class DeviceInfo:
+    """
+    Capabilities of the compute devices visible to torch.
+
+    Attributes:
+        torch_available (bool): Whether torch could be imported.
+        torch_version (str): torch version, or None.
+        cuda_available (bool): Whether CUDA devices can be used.
+        cuda_version (str): CUDA version torch was built with, or None.
+        device_names (list): Names of the CUDA devices.
+        current_device (int): Index of the current CUDA device, or None.
+        mps_available (bool): Whether the Apple MPS backend can be used.
+        error (str): Why torch or CUDA could not be probed, or None.
+    """
+
+    def __init__(self):
+        self.torch_available = False
+        self.torch_version = None
+        self.cuda_available = False
+        self.cuda_version = None
+        self.device_names = []
+        self.current_device = None
+        self.mps_available = False
+        self.error = None
+
+    @property
+    def device_count(self):
+        return len(self.device_names)
+
+    @property
+    def best_device(self):
+        """"cuda", "mps" or "cpu"."""
+        if self.cuda_available:
+            return "cuda"
+        if self.mps_available:
+            return "mps"
+        return "cpu"
 
-__all__ = ["get_device_info"]
+    def as_dict(self):
+        return {
+            "torch_available": self.torch_available,
+            "torch_version": self.torch_version,
+            "cuda_available": self.cuda_available,
+            "cuda_version": self.cuda_version,
+            "device_count": self.device_count,
+            "device_names": list(self.device_names),
+            "current_device": self.current_device,
+            "mps_available": self.mps_available,
+            "best_device": self.best_device,
+            "error": self.error,
+        }
+
+    def __repr__(self):
+        return f"DeviceInfo({self.as_dict()!r})"
+
+
+_probe_lock = threading.Lock()
+_probed = None
+_announced = False
+
+
+def _probe():
+    info = DeviceInfo()
+    try:
+        torch = importlib.import_module("torch")
+    except ImportError as e:
+        info.error = f"torch is not installed ({e})"
+        return info
+
+    info.torch_available = True
+    info.torch_version = torch.__version__
+    info.cuda_version = torch.version.cuda
+    try:
+        if torch.cuda.is_available():
+            info.cuda_available = True
+            info.device_names = [
+                torch.cuda.get_device_name(i) for i in range(torch.cuda.device_count())
+            ]
+            info.current_device = torch.cuda.current_device()
+    except RuntimeError as e:
+        # 驱动缺失或版本不匹配时 torch 会在这里报错
+        info.cuda_available = False
+        info.device_names = []
+        info.error = f"CUDA probe failed ({e})"
+
+    mps = getattr(torch.backends, "mps", None)
+    info.mps_available = bool(mps is not None and mps.is_available())
+    return info
+
+
+def probe_devices(refresh=False):
+    """
+    Return the memoized ``DeviceInfo`` of this process.
+
+    :param refresh: Probe again, e.g. after changing ``CUDA_VISIBLE_DEVICES``.
+    """
+    global _probed
+    with _probe_lock:
+        if _probed is None or refresh:
+            _probed = _probe()
+        return _probed
 
 
 def get_device_info(allow_cpu=True):
+    """
+    Select the torch device to use, "cuda" or "cpu".
 
-    if not allow_cpu:
-        if not torch.cuda.is_available():
-            logging.error("CUDA is not available. Exiting program.")
+    The device banner and the CPU fallback warning are emitted once per process.
+
+    :param allow_cpu: When False, exit if CUDA is unavailable.
+    """
+    global _announced
+    info = probe_devices()
+
+    if not info.cuda_available:
+        reason = info.error or "CUDA is not available"
+        if not allow_cpu:
+            logging.error("%s. Exiting program.", reason)
             sys.exit()
-    else:
-        if not torch.cuda.is_available():
-            logging.warning("CUDA is not available, using CPU instead.")
+    selected_device = "cuda" if info.cuda_available else "cpu"
 
-    selected_device = "cuda" if torch.cuda.is_available() else "cpu"
+    if _announced:
+        return selected_device
+    _announced = True
 
     if selected_device != "cuda":
-        logging.info("Using device %s", selected_device)
+        logging.warning("%s, using CPU instead.", info.error or "CUDA is not available")
     else:
         logging.info("Using CUDA device")
         print()
         print("\033[1;34m=" * 84)
-        print(f"CUDA is available: {torch.cuda.is_available()}")
-        print(f"CUDA device count: {torch.cuda.device_count()}")
-        print(f"CUDA current device: {torch.cuda.current_device()}")
-        print(f"CUDA device name: {torch.cuda.get_device_name()}")
+        print(f"CUDA is available: {info.cuda_available}")
+        print(f"CUDA device count: {info.device_count}")
+        print(f"CUDA current device: {info.current_device}")
+        print(f"CUDA device name: {info.device_names[info.current_device]}")
         print("=" * 84, "\033[0m")
 
     return selected_device
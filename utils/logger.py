@@ -7,8 +7,14 @@ and `colorlog` for colored console output.
 
 The `LoggerFactory` class allows for flexible logger configuration:
 - Set the logger's name and logging level.
-- Optionally configure the logger to output to a file.
-- Customize console log color formatting.
+- Optionally configure the logger to output to a file, with size- or time-based rotation.
+- Customize console log color formatting, or write JSON lines instead.
+- Optionally route records through a queue to a background thread, so that logging
+  in hot loops does not format or write on the caller's thread.
+- Optionally rate-limit repeated messages.
+
+Handlers are shared per process: the console handler and each log file get a single
+handler, however many factories refer to them, so records are never duplicated.
 
 Usage:
     To use the `LoggerFactory`, instantiate it with the desired configuration. The
@@ -20,14 +26,181 @@ Example:
     logger = factory.logger
     logger.info("This is an info message")
     logger.error("This is an error message")
+
+    # Per-frame logging: queued, rotating JSON file, at most 5 identical messages per second
+    logger = LoggerFactory(
+        name="pipeline", to_file=True, file_path="pipeline.log", queued=True,
+        rotation="size", json_format=True, rate_limit=1.0,
+    ).logger
 """
 
 import sys
 import os
+import json
+import time
+import atexit
+import queue
+import threading
 import logging
+import logging.handlers
 import colorlog
 
-__all__ = ["LoggerFactory"]
+__all__ = ["LoggerFactory", "JsonFormatter", "RateLimitFilter", "stop_queue_listener"]
+
+_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+
+    The object holds the time, level, logger name, message, source location and thread,
+    plus the formatted traceback when the record carries an exception.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, _DATE_FORMAT),
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most ``burst`` identical messages through per ``interval`` seconds.
+
+    Messages are identical when they come from the same logger, level, source line and
+    format string. The first message let through after a suppressed stretch reports how
+    many were dropped.
+
+    Attributes:
+        interval (float): Length of the rate-limiting window in seconds.
+        burst (int): Messages allowed per key and window.
+    """
+
+    MAX_KEYS = 10000
+
+    def __init__(self, interval: float = 1.0, burst: int = 5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.pathname, record.lineno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                if len(self._windows) >= self.MAX_KEYS:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} similar messages)"
+        return True
+
+
+class _RoutedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that tags each record with the handlers it must reach.
+
+    The queue is looked up on every record rather than kept from creation, so
+    a handler inherited by a forked child feeds the child's own listener.
+    """
+
+    def __init__(self, targets):
+        super().__init__(None)
+        self.targets = tuple(targets)
+
+    def enqueue(self, record):
+        # fork 后 _queue 被清空, 首条记录在子进程中重新启动监听线程
+        self.queue = _queue if _queue is not None else _ensure_listener()
+        self.queue.put_nowait(record)
+
+    def prepare(self, record):
+        # 同一进程内的队列无需序列化, 只合并消息参数, 格式化留给后台线程
+        record.msg = record.getMessage()
+        record.args = None
+        record.routed_handlers = self.targets
+        return record
+
+
+class _DispatchHandler(logging.Handler):
+    """Listener-side handler passing each record to the handlers it was tagged with."""
+
+    def handle(self, record):
+        for handler in record.routed_handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+# 进程内共享的处理器和队列监听器
+_handlers = {}
+_handlers_lock = threading.Lock()
+_listener = None
+_listener_pid = None
+_queue = None
+
+
+def _shared_handler(key, create):
+    with _handlers_lock:
+        handler = _handlers.get(key)
+        if handler is None:
+            handler = _handlers[key] = create()
+        return handler
+
+
+def _ensure_listener():
+    """Start the process-wide queue listener if this process has none and return its queue."""
+    global _listener, _listener_pid, _queue
+    with _handlers_lock:
+        if _listener is None or _listener_pid != os.getpid():
+            _queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(_queue, _DispatchHandler())
+            _listener.start()
+            _listener_pid = os.getpid()
+        return _queue
+
+
+def stop_queue_listener():
+    """Flush the queued records and stop the background logging thread."""
+    global _listener
+    with _handlers_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+        _listener = None
+
+
+def _reset_after_fork():
+    # 子进程没有继承监听线程; 锁可能在 fork 时被其他线程持有, 一并重建
+    global _handlers_lock, _listener, _listener_pid, _queue
+    _handlers_lock = threading.Lock()
+    _listener = None
+    _listener_pid = None
+    _queue = None
+
+
+atexit.register(stop_queue_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
 
 class LoggerFactory:
@@ -36,14 +209,19 @@ class LoggerFactory:
 
     The LoggerFactory allows you to:
     - Specify the logger's name and logging level.
-    - Optionally configure logging to a file.
-    - Customize the color formatting for console output.
+    - Optionally configure logging to a file, rotated by size or time.
+    - Customize the color formatting for console output, or log JSON lines.
+    - Optionally log through a background queue listener and rate-limit repeated messages.
 
     Attributes:
         name (str): The name of the logger.
         level (int): The logging level for the logger (default is logging.INFO).
         to_file (bool): Whether to save logs to a file (default is False).
         file_path (str): The file path for the log file; applicable only if to_file is True (default is "app.log").
+        queued (bool): Whether records go through the process-wide queue listener (default is False).
+        rotation (str): None, "size" or "time"; how the log file is rotated (default is None).
+        json_format (bool): Whether to write JSON lines instead of text (default is False).
+        rate_limit (float): Window in seconds for rate-limiting repeated messages; None disables it.
         logger (logging.Logger): The configured logger instance created during initialization.
 
     Methods:
@@ -57,6 +235,14 @@ class LoggerFactory:
         level: int = logging.INFO,
         to_file: bool = False,
         file_path: str = "app.log",
+        queued: bool = False,
+        rotation: str = None,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        when: str = "midnight",
+        json_format: bool = False,
+        rate_limit: float = None,
+        rate_burst: int = 5,
     ):
         """
         Initialize the LoggerFactory and create a logger.
@@ -65,20 +251,104 @@ class LoggerFactory:
         :param level: The logging level of the logger (default is logging.INFO).
         :param to_file: Whether to save logs to a file (default is False).
         :param file_path: The file path for the log file; applicable only if to_file is True (default is "app.log").
+        :param queued: Route records through a QueueHandler to the process-wide QueueListener,
+            so formatting and I/O happen on a background thread (default is False).
+        :param rotation: None for a plain file, "size" to rotate at max_bytes, "time" to rotate at `when`.
+        :param max_bytes: File size that triggers a rotation with rotation="size" (default is 10 MB).
+        :param backup_count: Number of rotated files to keep (default is 5).
+        :param when: Rotation interval for rotation="time", as in TimedRotatingFileHandler.
+        :param json_format: Write JSON lines to the console and file (default is False).
+            Every factory writing to one file must use the same rotation and format
+            settings; a conflicting factory raises ValueError.
+        :param rate_limit: Window in seconds within which identical messages are limited to
+            rate_burst; None disables rate limiting (default is None).
+        :param rate_burst: Identical messages let through per window (default is 5).
         """
+        if rotation not in (None, "size", "time"):
+            raise ValueError(f"rotation must be None, 'size' or 'time', got {rotation!r}")
         self.name = name
         self.level = level
         self.to_file = to_file
         self.file_path = file_path
+        self.queued = queued
+        self.rotation = rotation
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.when = when
+        self.json_format = json_format
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
         self.logger = self.create_logger()  # Automatically create the logger
 
+    def _console_handler(self) -> logging.Handler:
+        def create():
+            console_handler = logging.StreamHandler()
+            if self.json_format:
+                console_handler.setFormatter(JsonFormatter())
+            else:
+                # Custom color configuration
+                console_handler.setFormatter(
+                    colorlog.ColoredFormatter(
+                        "%(log_color)s" + _FORMAT + "%(reset)s",
+                        datefmt=_DATE_FORMAT,
+                        log_colors={
+                            "DEBUG": "cyan",
+                            "INFO": "green",
+                            "WARNING": "yellow",
+                            "ERROR": "red",
+                            "CRITICAL": "bold_red",
+                        },
+                    )
+                )
+            return console_handler
+
+        return _shared_handler(("console", self.json_format), create)
+
+    def _file_handler(self) -> logging.Handler:
+        path = os.path.abspath(self.file_path)
+
+        def create():
+            if self.rotation == "size":
+                file_handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=self.max_bytes, backupCount=self.backup_count, delay=True
+                )
+            elif self.rotation == "time":
+                file_handler = logging.handlers.TimedRotatingFileHandler(
+                    path, when=self.when, backupCount=self.backup_count, delay=True
+                )
+            else:
+                file_handler = logging.FileHandler(path, delay=True)
+            file_handler.setFormatter(
+                JsonFormatter() if self.json_format else logging.Formatter(_FORMAT)
+            )
+            return file_handler
+
+        # 同一文件只创建一个处理器, 第二个工厂不会重复写入
+        handler = _shared_handler(("file", path), create)
+        # 只比较对该轮转方式有意义的参数
+        settings = (
+            self.rotation,
+            self.max_bytes if self.rotation == "size" else None,
+            self.backup_count if self.rotation else None,
+            self.when if self.rotation == "time" else None,
+            self.json_format,
+        )
+        if getattr(handler, "factory_settings", settings) != settings:
+            raise ValueError(
+                f"Log file '{path}' is already configured with (rotation, max_bytes, backup_count, "
+                f"when, json_format) = {handler.factory_settings}, got {settings}"
+            )
+        handler.factory_settings = settings
+        return handler
+
     def create_logger(self) -> logging.Logger:
         """
         Create a logger with the specified configuration.
 
         This method configures the logger according to the settings defined during
         initialization. It sets up console output with color formatting and, if specified,
-        adds a file handler to log messages to a file.
+        adds a file handler to log messages to a file. With `queued`, the handlers are
+        driven by the background queue listener and the logger only enqueues records.
 
         :return: A configured logger instance.
         """
@@ -86,37 +356,29 @@ class LoggerFactory:
         logger = logging.getLogger(self.name)
         logger.setLevel(self.level)
 
-        # Custom color configuration
-        color_formatter = colorlog.ColoredFormatter(
-            "%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s%(reset)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-            log_colors={
-                "DEBUG": "cyan",
-                "INFO": "green",
-                "WARNING": "yellow",
-                "ERROR": "red",
-                "CRITICAL": "bold_red",
-            },
-        )
-
-        # Create a console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(color_formatter)
+        routed = [h for h in logger.handlers if isinstance(h, _RoutedQueueHandler)]
+        attached = list(routed[0].targets) if routed else list(logger.handlers)
 
-        # Add the console handler to the logger
+        targets = []
         if not logger.hasHandlers():  # Avoid adding multiple handlers
-            logger.addHandler(console_handler)
-
-        # Add a file handler if to_file is True
+            targets.append(self._console_handler())
         if self.to_file:
-            # Create the log file if it does not exist
-            file_handler = logging.FileHandler(self.file_path)
-            file_handler.setFormatter(
-                logging.Formatter(
-                    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-                )
-            )
-            logger.addHandler(file_handler)
+            targets.append(self._file_handler())
+        targets = [h for h in targets if h not in attached]
+
+        if self.queued or routed:
+            for handler in logger.handlers[:]:
+                logger.removeHandler(handler)
+            _ensure_listener()
+            logger.addHandler(_RoutedQueueHandler(attached + targets))
+        else:
+            for handler in targets:
+                logger.addHandler(handler)
+
+        if self.rate_limit:
+            for existing in [f for f in logger.filters if isinstance(f, RateLimitFilter)]:
+                logger.removeFilter(existing)
+            logger.addFilter(RateLimitFilter(self.rate_limit, self.rate_burst))
 
         return logger
 
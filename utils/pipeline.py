@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Declarative image pipelines with pointwise fusion and pooled buffers.
+
+A ``Pipeline`` is declared as a chain of named steps, the same
+``(name, params)`` pairs (or ``"name:key=value"`` strings) as ``utils.batch``.
+Compiling it groups the steps into stages:
+
+- consecutive pointwise steps (intensity curves such as log, power and
+  negative, global and multi-level thresholds, Otsu) become one stage that
+  maps the image through a single composed 256-entry lookup table. Steps
+  whose table depends on the image (Otsu) read the histogram of the
+  stage input once and derive the histogram after the preceding tables
+  from it, without another pass over the pixels;
+- every other step (gray conversion, filters, adaptive thresholds, noise) is
+  a stage of its own, run through the ``utils.batch`` operation of that name.
+
+Intermediate images are taken from a ``BufferPool`` and handed back as soon
+as the next stage has consumed them, so running the same compiled pipeline
+over many images of one size stops allocating after the first image. The
+pool keeps at most ``max_bytes`` of free buffers and drops the least recently
+used shapes first, so images of ever-changing sizes do not grow it. Every
+stage records its calls, time and the bytes it had to allocate; ``report``
+shows them, and ``fuse=False`` runs the same steps one table at a time for
+comparison.
+
+Example:
+    pipeline = Pipeline(["gray", "log:c=1.2", "power:gamma=0.8", "otsu"])
+    for image in images:
+        binary = pipeline.run(image)
+        ...
+        pipeline.release(binary)
+    print(pipeline.describe())
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import cv2 as cv
+
+from .metrics import metrics
+
+__all__ = [
+    "register_pointwise",
+    "available_pointwise",
+    "BufferPool",
+    "Pipeline",
+]
+
+# 逐点步骤名 -> (构建查找表的函数, 是否依赖直方图, 是否需要灰度输入)
+_POINTWISE = {}
+
+
+def register_pointwise(name, histogram=False, gray=False):
+    """
+    Register a pointwise step that can be fused into a lookup table.
+
+    The decorated function returns a uint8 table of 256 entries. It receives
+    the step parameters, preceded by the ``ImageStatistics`` of the step's
+    input when ``histogram`` is true.
+
+    :param histogram: The table depends on the image histogram (e.g. Otsu).
+    :param gray: The step works on gray images; color input is converted first.
+    """
+
+    def decorator(func):
+        if name in _POINTWISE:
+            raise ValueError(f"Pointwise step '{name}' is already registered")
+        _POINTWISE[name] = (func, histogram, gray)
+        return func
+
+    return decorator
+
+
+def available_pointwise():
+    """Return the names of the fusable steps (registered steps and intensity curves)."""
+    from IOImages.pointwise import available_curves
+
+    return sorted(set(_POINTWISE) | set(available_curves()))
+
+
+def _pointwise(name):
+    """``(func, histogram, gray)`` of a fusable step, or None."""
+    if name in _POINTWISE:
+        return _POINTWISE[name]
+    from IOImages.pointwise import available_curves, get_lut
+
+    if name in available_curves():
+        return (lambda **params: get_lut(name, **params)), False, False
+    return None
+
+
+@register_pointwise("threshold", gray=True)
+def _threshold_lut(value=111, maxval=255):
+    from Thresholding import thresholds_lut
+
+    return thresholds_lut([value], [0, maxval])
+
+
+@register_pointwise("multi_threshold", gray=True)
+def _multi_threshold_lut(thresholds=(111, 144)):
+    from Thresholding import thresholds_lut
+
+    return thresholds_lut(thresholds)
+
+
+@register_pointwise("otsu", histogram=True, gray=True)
+def _otsu_lut(statistics, levels=1):
+    from Thresholding import ThresholdHistogram, thresholds_lut
+
+    return thresholds_lut(ThresholdHistogram.from_statistics(statistics).otsu(levels))
+
+
+# 空闲缓冲区的默认字节预算: 约 2 幅 12 MP 彩色图像
+DEFAULT_POOL_BYTES = 64 << 20
+
+
+class BufferPool:
+    """
+    LRU free lists of arrays keyed by shape and dtype, with a byte budget.
+
+    Attributes:
+        max_bytes (int): Total size of the free arrays before the least
+            recently used shapes are dropped.
+        allocations (int): Arrays created by the pool or adopted from steps.
+        allocated_bytes (int): Their total size.
+        reuses (int): Requests served from a free list.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_POOL_BYTES):
+        self.max_bytes = max_bytes
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self.reuses = 0
+        self._free = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def take(self, shape, dtype=np.uint8):
+        """Return an uninitialized array, reusing a released one when possible."""
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reuses += 1
+                array = free.pop()
+                if not free:
+                    del self._free[key]
+                self._nbytes -= array.nbytes
+                return array
+            self.allocations += 1
+            self.allocated_bytes += int(np.prod(shape)) * key[1].itemsize
+        return np.empty(shape, dtype)
+
+    def take_like(self, array):
+        return self.take(array.shape, array.dtype)
+
+    def adopt(self, array):
+        """Count an array a step allocated itself; it is pooled once released."""
+        with self._lock:
+            self.allocations += 1
+            self.allocated_bytes += array.nbytes
+
+    def release(self, array):
+        """Hand ``array`` back for reuse; it must not be used afterwards."""
+        if array.base is not None or not array.flags.writeable or not array.flags.c_contiguous:
+            return
+        if array.nbytes > self.max_bytes:
+            return
+        key = (array.shape, array.dtype)
+        with self._lock:
+            self._free.setdefault(key, []).append(array)
+            self._free.move_to_end(key)
+            self._nbytes += array.nbytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self._nbytes = 0
+
+    @property
+    def pooled_bytes(self):
+        return self._nbytes
+
+    def _evict(self):
+        # 先丢弃最久未用的形状, 最新释放的缓冲区留到最后
+        while self._nbytes > self.max_bytes and self._free:
+            key, free = next(iter(self._free.items()))
+            self._nbytes -= free.pop(0).nbytes
+            if not free:
+                del self._free[key]
+
+
+class _StageStats:
+    __slots__ = ("calls", "seconds", "allocations", "allocated_bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.allocations = 0
+        self.allocated_bytes = 0
+
+
+class _LutStage:
+    """Consecutive pointwise steps applied as one composed lookup table."""
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.name = "+".join(name for name, _ in steps)
+        self.parts = [(_pointwise(name), params) for name, params in steps]
+        # 不依赖图像的表在编译时就组合好
+        self.static_lut = None
+        if not any(histogram or gray for (_, histogram, gray), _ in self.parts):
+            self.static_lut = self._compose(None, self.parts)
+
+    @staticmethod
+    def _compose(lut, parts, statistics=None):
+        for (func, histogram, _), params in parts:
+            if histogram:
+                # 前面的表作用后的直方图由输入直方图推导, 不读取像素
+                derived = statistics if lut is None else statistics.apply_lut(lut)
+                step_lut = func(derived, **params)
+            else:
+                step_lut = func(**params)
+            lut = np.asarray(step_lut, dtype=np.uint8) if lut is None else np.take(step_lut, lut)
+        return lut
+
+    def run(self, image, pool, owned, name):
+        from IOImages.image_stats import ImageStatistics
+        from IOImages.pointwise import apply_lut
+
+        if self.static_lut is not None:
+            return apply_lut(image, self.static_lut, out=image if owned else pool.take_like(image))
+
+        source, lut, statistics = image, None, None
+        for (func, histogram, gray), params in self.parts:
+            if gray and image.ndim == 3:
+                # 彩色输入: 先应用已组合的表, 再转换为灰度 (与逐步执行的结果相同)
+                if lut is not None:
+                    image = apply_lut(image, lut, out=image if owned else pool.take_like(image))
+                    owned, lut = True, None
+                colored = image
+                image = cv.cvtColor(colored, cv.COLOR_BGR2GRAY, dst=pool.take(colored.shape[:2]))
+                owned = True
+                # 阶段输入由 Pipeline.run 归还, 这里只归还本阶段借用的缓冲区
+                if colored is not source:
+                    pool.release(colored)
+            if histogram and statistics is None:
+                statistics = ImageStatistics.from_image(image)
+            lut = self._compose(lut, [((func, histogram, gray), params)], statistics)
+        return apply_lut(image, lut, out=image if owned else pool.take_like(image))
+
+
+class _OperationStage:
+    """A non-fusable step, run through its ``utils.batch`` operation."""
+
+    def __init__(self, name, params):
+        import inspect
+
+        from .batch import get_operation
+
+        self.name = name
+        self.steps = [(name, params)]
+        self.params = params
+        self.func = get_operation(name)
+        parameters = inspect.signature(self.func).parameters
+        self.takes_name = "name" in parameters
+        self.takes_out = "out" in parameters
+
+    def run(self, image, pool, owned, name):
+        if self.name == "gray":
+            if image.ndim == 2:
+                return image
+            return cv.cvtColor(image, cv.COLOR_BGR2GRAY, dst=pool.take(image.shape[:2]))
+        params = {"name": name, **self.params} if self.takes_name else dict(self.params)
+        if self.takes_out:
+            # 中间结果归流水线所有时原地写入, 否则从缓冲池取输出
+            params["out"] = image if owned else pool.take_like(image)
+            return self.func(image, **params)
+        result = self.func(image, **params)
+        if result is not image:
+            # 步骤自己分配了输出, 释放后进入缓冲池
+            pool.adopt(result)
+        return result
+
+
+class Pipeline:
+    """
+    A compiled chain of steps that runs on any number of images.
+
+    Attributes:
+        steps (list): ``(name, params)`` of every declared step.
+        stages (list): The compiled stages; fused stages are named ``"a+b+c"``.
+        pool (BufferPool): Buffers for the intermediate images.
+        name (str): Prefix of the stage timings recorded in ``utils.metrics``.
+    """
+
+    def __init__(self, steps=(), fuse=True, pool=None, name="pipeline"):
+        """
+        :param steps: ``(name, params)`` pairs or ``"name:key=value"`` strings.
+        :param fuse: Group consecutive pointwise steps into one lookup table.
+        :param pool: ``BufferPool`` to share between pipelines; a new one by default.
+        """
+        from .batch import parse_operation
+
+        self.steps = [parse_operation(step) if isinstance(step, str) else (step[0], dict(step[1])) for step in steps]
+        self.fuse = fuse
+        self.pool = BufferPool() if pool is None else pool
+        self.name = name
+        self.stages = self._compile()
+        self._stats = {stage: _StageStats() for stage in self.stages}
+        self._lock = threading.Lock()
+
+    def _compile(self):
+        stages, group = [], []
+        for name, params in self.steps:
+            if _pointwise(name) is not None:
+                group.append((name, params))
+                if self.fuse:
+                    continue
+            if group:
+                stages.append(_LutStage(group))
+                group = []
+            if _pointwise(name) is None:
+                stages.append(_OperationStage(name, params))
+        if group:
+            stages.append(_LutStage(group))
+        return stages
+
+    def then(self, name, **params):
+        """Return a new pipeline with one more step."""
+        return Pipeline(self.steps + [(name, params)], self.fuse, self.pool, self.name)
+
+    def __repr__(self):
+        return f"Pipeline({' -> '.join(stage.name for stage in self.stages) or 'identity'})"
+
+    def run(self, image, name=""):
+        """
+        Run every stage on ``image`` and return the result.
+
+        ``image`` itself is never modified. The result may come from the
+        pool: pass it to ``release`` once it is no longer needed so the next
+        run can reuse it.
+
+        :param name: Image name, used to seed per-image noise.
+        """
+        current, owned = image, False
+        for stage in self.stages:
+            pool = self.pool
+            allocations, allocated_bytes = pool.allocations, pool.allocated_bytes
+            start = time.perf_counter()
+            result = stage.run(current, pool, owned, name)
+            seconds = time.perf_counter() - start
+            if result is not current:
+                if owned:
+                    pool.release(current)
+                # 调用者的图像和视图都不能被覆盖
+                owned = result is not image and result.base is None
+            current = result
+            self._record(stage, seconds, pool.allocations - allocations, pool.allocated_bytes - allocated_bytes)
+        return current
+
+    def run_many(self, images, names=None):
+        """Yield the result of every image; each result is released when the next is requested."""
+        names = itertools.repeat("") if names is None else names
+        for image, name in zip(images, names):
+            result = self.run(image, name)
+            yield result
+            if result is not image:
+                self.release(result)
+
+    def release(self, array):
+        """Return a result of ``run`` to the buffer pool."""
+        self.pool.release(array)
+
+    def _record(self, stage, seconds, allocations, allocated_bytes):
+        with self._lock:
+            stats = self._stats[stage]
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.allocations += allocations
+            stats.allocated_bytes += allocated_bytes
+        metrics.record(f"{self.name}.{stage.name}", seconds, nbytes=allocated_bytes)
+
+    def report(self):
+        """Rows ``{"stage", "steps", "calls", "ms/call", "allocations", "MB allocated"}`` per stage."""
+        with self._lock:
+            return [
+                {
+                    "stage": stage.name,
+                    "steps": len(stage.steps),
+                    "calls": stats.calls,
+                    "ms/call": stats.seconds / stats.calls * 1e3 if stats.calls else 0.0,
+                    "allocations": stats.allocations,
+                    "MB allocated": stats.allocated_bytes / 1e6,
+                }
+                for stage, stats in self._stats.items()
+            ]
+
+    def describe(self):
+        """The ``report`` as an aligned text table."""
+        lines = [f"{'stage':<32}{'steps':>6}{'calls':>7}{'ms/call':>10}{'allocs':>8}{'MB alloc':>10}"]
+        for row in self.report():
+            lines.append(
+                f"{row['stage']:<32}{row['steps']:>6}{row['calls']:>7}{row['ms/call']:>10.2f}"
+                f"{row['allocations']:>8}{row['MB allocated']:>10.1f}"
+            )
+        return "\n".join(lines)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {stage: _StageStats() for stage in self.stages}
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+Parameter sweeps with per-parameter metrics and contact sheets.
+
+``sweep`` evaluates one step (any ``utils.batch`` operation) over a whole
+grid of parameter values in a single call, and returns for every parameter
+combination the output histogram, summary metrics and a thumbnail:
+
+- pointwise steps (intensity curves, global and multi-level thresholds,
+  Otsu) never produce a full-size image. One 256-entry lookup table is built
+  per combination (curves are evaluated for all values at once by
+  broadcasting over a parameter axis), the output histograms of every table
+  are gathered from the single input histogram in one ``np.bincount``, and
+  the thumbnails are one fancy-indexing pass of the table stack over a
+  small preview. A 256-value threshold sweep of a 12 MP image therefore
+  costs one histogram and one thumbnail;
+- local thresholds (adaptive mean, Niblack, Sauvola) share one
+  ``AdaptiveThresholder``, so its summed-area tables are built once and the
+  window statistics of a block size are reused for every ``C``/``k``;
+- every other step runs once per combination, optionally on a reduced
+  working image (``working_size``).
+
+The metrics are computed from the output histograms: the foreground
+fraction (pixels at or above mid-gray, i.e. the ``maxval`` pixels of a
+binary output), the mean, the RMS contrast (standard deviation) and the
+entropy; for a color image swept through a curve they describe the curve
+applied to its gray histogram. ``SweepResult.contact_sheet`` lays the thumbnails out in a grid
+labelled with their parameters.
+
+Example:
+    result = sweep(img_gray, "threshold", {"value": range(256)})
+    best = result.best("entropy")
+    sheet = result.contact_sheet(columns=16)
+    result = sweep(img_bgr, "sauvola", {"block_size": [15, 31, 63], "k": [0.1, 0.2, 0.3]}, base=["gray"])
+"""
+import itertools
+import math
+import time
+
+import numpy as np
+import cv2 as cv
+
+from .metrics import metrics
+
+__all__ = [
+    "METRICS",
+    "parameter_grid",
+    "contact_sheet",
+    "SweepResult",
+    "sweep",
+]
+
+METRICS = ("foreground", "mean", "contrast", "entropy")
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+
+def parameter_grid(grid):
+    """
+    Expand ``{"name": values, ...}`` into the list of all combinations.
+
+    The first parameter varies slowest. A list of dicts is returned as is.
+    """
+    if not isinstance(grid, dict):
+        return [dict(params) for params in grid]
+    names = list(grid)
+    values = []
+    for name in names:
+        value = grid[name]
+        if isinstance(value, (str, int, float)):
+            value = [value]
+        values.append(value.tolist() if isinstance(value, np.ndarray) else list(value))
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def _metrics(histograms):
+    """Metrics of every row of a (P, 256) histogram stack, as ``{name: (P,) array}``."""
+    histograms = np.asarray(histograms, dtype=np.float64)
+    totals = np.maximum(histograms.sum(axis=1), 1)
+    p = histograms / totals[:, None]
+    mean = p @ _LEVELS
+    variance = np.einsum("pi,pi->p", p, (_LEVELS[None, :] - mean[:, None]) ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=1)
+    return {
+        "foreground": p[:, 128:].sum(axis=1),
+        "mean": mean,
+        "contrast": np.sqrt(np.maximum(variance, 0)),
+        "entropy": entropy,
+    }
+
+
+def _label(params):
+    return " ".join(f"{key}={_format(value)}" for key, value in params.items())
+
+
+def _format(value):
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.3g}"
+    if isinstance(value, (tuple, list)):
+        return "/".join(_format(item) for item in value)
+    return str(value)
+
+
+def contact_sheet(images, labels=None, columns=None, gap=4, background=0):
+    """
+    Lay out images in a labelled grid.
+
+    :param images: uint8 gray or color images; cells take the size of the
+        largest one, and gray images are expanded to color if any is color.
+    :param labels: Optional caption per image, drawn below it.
+    :param columns: Images per row; default a near-square grid.
+    :param gap: Pixels between cells.
+    :param background: Gray level of the background and the gaps.
+    :return: The uint8 sheet.
+    """
+    images = list(images)
+    if not images:
+        raise ValueError("No images to lay out")
+    columns = columns or math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    color = any(image.ndim == 3 for image in images)
+    cell_height = max(image.shape[0] for image in images)
+    cell_width = max(image.shape[1] for image in images)
+    font, scale, thickness = cv.FONT_HERSHEY_SIMPLEX, 0.35, 1
+    label_height = 0
+    if labels is not None:
+        label_height = cv.getTextSize("Ag", font, scale, thickness)[0][1] + 8
+
+    step_y, step_x = cell_height + label_height + gap, cell_width + gap
+    shape = (rows * step_y + gap, columns * step_x + gap) + ((3,) if color else ())
+    sheet = np.full(shape, background, dtype=np.uint8)
+    foreground = 255 if background < 128 else 0
+    for index, image in enumerate(images):
+        top, left = gap + index // columns * step_y, gap + index % columns * step_x
+        if color and image.ndim == 2:
+            image = cv.cvtColor(image, cv.COLOR_GRAY2BGR)
+        sheet[top:top + image.shape[0], left:left + image.shape[1]] = image
+        if labels is not None:
+            text = str(labels[index])
+            # 标签过长时截断到单元格宽度
+            while text and cv.getTextSize(text, font, scale, thickness)[0][0] > cell_width:
+                text = text[:-1]
+            cv.putText(
+                sheet,
+                text,
+                (left, top + cell_height + label_height - 4),
+                font,
+                scale,
+                (foreground,) * 3 if color else foreground,
+                thickness,
+                cv.LINE_AA,
+            )
+    return sheet
+
+
+class SweepResult:
+    """
+    Outputs of a step for every combination of a parameter grid.
+
+    Attributes:
+        step (str): The swept step.
+        params (list): One ``{name: value}`` dict per combination.
+        histograms (np.ndarray): (P, 256) int64 output histograms.
+        metrics (dict): ``{metric: (P,) array}`` for every name in ``METRICS``.
+        thumbnails (list): One small uint8 output image per combination.
+        luts (np.ndarray): (P, 256) lookup tables of a pointwise step, else None.
+        seconds (float): Time the sweep took.
+    """
+
+    def __init__(self, step, params, histograms, thumbnails, luts=None, seconds=0.0):
+        self.step = step
+        self.params = params
+        self.histograms = np.asarray(histograms, dtype=np.int64)
+        self.metrics = _metrics(self.histograms)
+        self.thumbnails = thumbnails
+        self.luts = luts
+        self.seconds = seconds
+
+    def __len__(self):
+        return len(self.params)
+
+    def __repr__(self):
+        return f"SweepResult({self.step}, {len(self)} combinations, {self.seconds * 1e3:.1f} ms)"
+
+    def rows(self):
+        """One ``{**params, **metrics}`` dict per combination (e.g. for ``st.dataframe``)."""
+        return [
+            {**params, **{name: float(values[i]) for name, values in self.metrics.items()}}
+            for i, params in enumerate(self.params)
+        ]
+
+    def best(self, metric="entropy", largest=True):
+        """Return the parameters with the largest (or smallest) value of ``metric``."""
+        if metric not in self.metrics:
+            raise KeyError(f"Unknown metric '{metric}', available: {', '.join(METRICS)}")
+        values = self.metrics[metric]
+        return self.params[int(np.argmax(values) if largest else np.argmin(values))]
+
+    def statistics(self, index):
+        """``ImageStatistics`` of the output of combination ``index``."""
+        from IOImages.image_stats import ImageStatistics
+
+        hist = self.histograms[index]
+        return ImageStatistics(hist[None], hist, ("gray",))
+
+    def contact_sheet(self, columns=None, labels=True, metric=None, gap=4):
+        """
+        The thumbnails in a grid, labelled with their parameters.
+
+        :param metric: Also print this metric under every thumbnail.
+        """
+        captions = None
+        if labels:
+            captions = [_label(params) for params in self.params]
+            if metric is not None:
+                captions = [f"{caption} {metric[:4]} {self.metrics[metric][i]:.2f}" for i, caption in enumerate(captions)]
+        return contact_sheet(self.thumbnails, captions, columns, gap)
+
+
+def _prepare(image, base):
+    """Run the ``base`` steps once."""
+    if not base:
+        return image
+    from .pipeline import Pipeline
+
+    return Pipeline(base, name="sweep.base").run(image)
+
+
+def _pointwise_sweep(image, step, combinations, spec, statistics, preview, thumbnail):
+    from IOImages.image_stats import ImageStatistics
+    from IOImages.pointwise import available_curves, curve_luts
+    from IOImages.sampling import mip_cache
+
+    from .pipeline import _POINTWISE
+
+    func, histogram, gray = spec
+    if gray and image.ndim == 3:
+        image = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+        preview = preview if preview is None or preview.ndim == 2 else cv.cvtColor(preview, cv.COLOR_BGR2GRAY)
+    if statistics is None:
+        statistics = ImageStatistics.from_image(image)
+
+    # # 每个参数组合一张查找表
+    if step not in _POINTWISE and step in available_curves() and combinations[0]:
+        # 曲线: 参数轴广播, 一次求出全部表
+        names = list(combinations[0])
+        luts = curve_luts(step, **{name: [params[name] for params in combinations] for name in names})
+    else:
+        luts = np.stack(
+            [
+                np.asarray(func(statistics, **params) if histogram else func(**params), dtype=np.uint8)
+                for params in combinations
+            ]
+        )
+
+    # # 全部输出直方图: out[p, lut[p, i]] += hist[i], 一次 bincount, 不读取像素
+    count = len(luts)
+    index = luts.astype(np.intp) + (np.arange(count, dtype=np.intp) * 256)[:, None]
+    weights = np.broadcast_to(statistics.histogram().astype(np.float64), (count, 256))
+    histograms = np.bincount(index.ravel(), weights=weights.ravel(), minlength=count * 256)
+    histograms = histograms.reshape(count, 256)
+
+    # # 缩略图: 查找表堆栈对同一幅小图做一次索引
+    if preview is None:
+        preview = mip_cache.thumbnail(image, thumbnail)
+    thumbnails = list(np.take(luts, preview, axis=1))
+    return histograms, thumbnails, luts
+
+
+# 局部阈值共享同一个 AdaptiveThresholder: 积分图只构建一次
+def _adaptive(thresholder, method="mean", block_size=11, c=8):
+    # 与 utils.batch 的 adaptive 操作 (cv.adaptiveThreshold) 逐像素一致, 包括边界
+    if method == "mean":
+        return thresholder.mean(block_size, c, border="replicate")
+    from utils.batch import adaptive_operation
+
+    return adaptive_operation(thresholder.image, method, block_size, c)
+
+
+_LOCAL_THRESHOLDS = {
+    "adaptive": _adaptive,
+    "sauvola": lambda thresholder, block_size=31, k=0.2, r=128: thresholder.sauvola(block_size, k, r),
+    "niblack": lambda thresholder, block_size=31, k=-0.2: thresholder.niblack(block_size, k),
+}
+
+
+def _operation_sweep(image, step, combinations, thumbnail):
+    from IOImages.image_stats import ImageStatistics
+    from IOImages.sampling import fit_size, resize
+
+    from .batch import get_operation
+
+    operation = get_operation(step)
+    local = _LOCAL_THRESHOLDS.get(step)
+    thresholder = None
+    if local is not None:
+        from Thresholding import AdaptiveThresholder
+
+        thresholder = AdaptiveThresholder(image if image.ndim == 2 else cv.cvtColor(image, cv.COLOR_BGR2GRAY))
+
+    histograms = [None] * len(combinations)
+    thumbnails = [None] * len(combinations)
+    # 按 block_size 分组执行, 同一窗口的局部统计量只计算一次
+    order = sorted(range(len(combinations)), key=lambda i: combinations[i].get("block_size", 0))
+    for i in order:
+        params = combinations[i]
+        if thresholder is not None and params.get("method", "mean") == "mean":
+            output = local(thresholder, **params)
+        else:
+            output = operation(image, **params)
+        histograms[i] = ImageStatistics.from_image(output).gray
+        thumbnails[i] = resize(output, fit_size(output.shape, thumbnail))
+    return np.stack(histograms), thumbnails
+
+
+def sweep(
+    image,
+    step,
+    grid,
+    params=None,
+    base=(),
+    thumbnail=128,
+    statistics=None,
+    preview=None,
+    working_size=None,
+):
+    """
+    Evaluate ``step`` for every combination of ``grid`` on ``image``.
+
+    :param image: uint8 gray or BGR image.
+    :param step: Name of a ``utils.batch`` operation, e.g. "threshold",
+        "power", "otsu", "adaptive", "sauvola".
+    :param grid: ``{"name": values, ...}`` (all combinations, the first
+        parameter varying slowest) or a list of parameter dicts.
+    :param params: Fixed parameters added to every combination.
+    :param base: Steps run once before the sweep, e.g. ``["gray"]``.
+    :param thumbnail: Size of the box the thumbnails fit in.
+    :param statistics: ``ImageStatistics`` of the (prepared) image, to skip
+        the histogram pass of a pointwise sweep.
+    :param preview: Small version of the (prepared) image to map for the
+        thumbnails of a pointwise sweep, e.g. a pyramid level.
+    :param working_size: Run non-pointwise steps on the image reduced to fit
+        this size (faster, approximate metrics); default the full image.
+    :return: A ``SweepResult``.
+    """
+    from .batch import get_operation
+    from .pipeline import _pointwise
+
+    get_operation(step)  # 未知步骤尽早报错
+    combinations = [{**(params or {}), **combination} for combination in parameter_grid(grid)]
+    if not combinations:
+        raise ValueError("The parameter grid is empty")
+
+    start = time.perf_counter()
+    prepared = _prepare(image, base)
+    spec = _pointwise(step)
+    if spec is not None:
+        histograms, thumbnails, luts = _pointwise_sweep(
+            prepared, step, combinations, spec, statistics, preview, thumbnail
+        )
+    else:
+        if working_size is not None:
+            from IOImages.sampling import fit_size, resize
+
+            prepared = resize(prepared, fit_size(prepared.shape, working_size))
+        histograms, thumbnails = _operation_sweep(prepared, step, combinations, thumbnail)
+        luts = None
+    seconds = time.perf_counter() - start
+    metrics.record(f"sweep.{step}", seconds)
+    return SweepResult(step, combinations, histograms, thumbnails, luts, seconds)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Tiled out-of-core processing of images stored as memory-mapped arrays.
+
+Large scans and satellite images do not fit in RAM once decoded, let alone
+with the float copies most operations make. Here images live on disk as
+``.npy`` files opened with ``np.load(mmap_mode=...)`` (a raw ``np.memmap``
+with a small header recording shape and dtype), and an operation is applied
+one tile at a time:
+
+- each tile is read from the source memmap together with a ``halo`` of
+  surrounding pixels,
+- the operation runs on that in-memory tile,
+- the halo is cropped off and the result is written into the output memmap.
+
+A neighborhood operation of radius ``r`` sees exactly the same pixels as on
+the whole image when ``halo >= r``, so tiles join without seams. At the image
+border the tile edge is the image edge and the operation applies its own
+border handling as usual. Pointwise operations and fixed thresholds need no
+halo; global thresholds (Otsu) need the histogram of the whole image first,
+which ``tiled_histogram`` accumulates tile by tile.
+
+Each operation declares its halo and whether it can be tiled at all when it
+is registered with ``utils.batch.register_operation``.
+
+Tile sizes are derived from a byte budget (``budget``) rather than from the
+image size, so peak memory is bounded by the budget whatever the input.
+
+Usage (from the repository root):
+    python -m utils.tiles scan.npy out.npy --op gray --op median:ksize=31 --budget 128
+    python -m utils.tiles photo.tif out.npy --op sauvola:block_size=51
+
+Operations and their parameters are those of ``utils.batch``.
+
+Example:
+    src = open_memmap("scan.npy")
+    out = process_tiled(src, lambda tile: cv.medianBlur(tile, 31), "out.npy", halo=15)
+"""
+import argparse
+import inspect
+import mmap
+import os
+import sys
+import time
+
+import numpy as np
+import cv2 as cv
+
+__all__ = [
+    "open_memmap",
+    "image_to_memmap",
+    "tile_shape_for",
+    "iter_tiles",
+    "process_tiled",
+    "tiled_histogram",
+    "operation_halo",
+]
+
+DEFAULT_BUDGET = 64 * 1024**2
+
+# 每个输入样本在处理时大约需要的 float64 副本数 (输入块 + 输出块 + 中间结果)
+WORKING_COPIES = 8
+
+
+def open_memmap(path, mode="r", shape=None, dtype=None):
+    """
+    Open (or create, with ``mode="w+"``) an ``.npy`` file as a memory map.
+
+    :param path: ``.npy`` file.
+    :param mode: "r", "r+" or "w+"; "w+" requires ``shape`` and ``dtype``.
+    """
+    if mode == "w+":
+        if shape is None or dtype is None:
+            raise ValueError("shape and dtype are required to create a memmap")
+        return np.lib.format.open_memmap(path, mode="w+", shape=tuple(shape), dtype=dtype)
+    return np.load(path, mmap_mode=mode)
+
+
+def image_to_memmap(image_path, npy_path, flags=cv.IMREAD_UNCHANGED):
+    """
+    Decode an image file into an ``.npy`` memmap.
+
+    The decoder needs the whole image in memory once; inputs that do not fit
+    should be exported to ``.npy`` (or another raw format) by the tool that
+    produced them.
+    """
+    image = cv.imread(image_path, flags)
+    if image is None:
+        raise ValueError(f"Could not read image '{image_path}'")
+    out = open_memmap(npy_path, "w+", image.shape, image.dtype)
+    out[...] = image
+    out.flush()
+    return out
+
+
+def tile_shape_for(shape, itemsize, budget=DEFAULT_BUDGET, halo=0, copies=WORKING_COPIES):
+    """
+    Return the ``(rows, cols)`` of the largest square-ish tile within ``budget``.
+
+    The budget covers the tile including its halo, times ``copies`` working
+    copies per sample, each at least float64 wide since most operations
+    compute in floating point.
+
+    :param shape: Image shape (H, W) or (H, W, C).
+    :param itemsize: Bytes per sample of the source dtype.
+    """
+    height, width = shape[:2]
+    channels = int(np.prod(shape[2:], dtype=np.int64))
+    pixels = budget // (max(itemsize, 8) * channels * copies)
+    side = int(np.sqrt(pixels)) - 2 * halo
+    if side < max(halo, 1):
+        raise ValueError(
+            f"Budget of {budget} bytes is too small for a halo of {halo} pixels"
+        )
+    # 窄图像用整行宽度, 把剩余预算分给行数
+    cols = min(width, side)
+    rows = min(height, max(pixels // (cols + 2 * halo) - 2 * halo, 1))
+    return rows, cols
+
+
+def iter_tiles(shape, tile_shape):
+    """Yield ``(y0, y1, x0, x1)`` for the tiles covering an image of ``shape``, row by row."""
+    height, width = shape[:2]
+    rows, cols = tile_shape
+    for y0 in range(0, height, rows):
+        for x0 in range(0, width, cols):
+            yield y0, min(y0 + rows, height), x0, min(x0 + cols, width)
+
+
+def _remap(array):
+    """
+    Flush a memmap and map its file region again.
+
+    Pages touched through the old mapping stay in the process's resident
+    set until it is unmapped; remapping after each band of tiles keeps the
+    resident size bounded by the tile budget. Views and in-memory arrays are
+    returned unchanged.
+    """
+    if not isinstance(array, np.memmap) or not isinstance(array.base, mmap.mmap):
+        return array
+    writable = array.flags.writeable
+    if writable:
+        array.flush()
+    return np.memmap(
+        array.filename,
+        dtype=array.dtype,
+        mode="r+" if writable else "r",
+        offset=array.offset,
+        shape=array.shape,
+        order="F" if array.flags.f_contiguous and not array.flags.c_contiguous else "C",
+    )
+
+
+def process_tiled(src, func, out=None, halo=0, budget=DEFAULT_BUDGET, tile_shape=None):
+    """
+    Apply ``func`` to ``src`` tile by tile and stream the results into ``out``.
+
+    :param src: Source array, typically a read-only memmap.
+    :param func: Callable mapping an image tile to a result of the same height
+        and width (the channel count and dtype may differ).
+    :param out: Output array, or a path for a new ``.npy`` memmap whose shape
+        and dtype are taken from the first tile's result. None creates an
+        in-memory array.
+    :param halo: Pixels of context read around each tile (the radius of the
+        largest neighborhood ``func`` looks at).
+    :param budget: Memory budget in bytes that determines the tile size.
+    :param tile_shape: Explicit ``(rows, cols)``, overriding ``budget``.
+    :return: The output array.
+    """
+    height, width = src.shape[:2]
+    if tile_shape is None:
+        tile_shape = tile_shape_for(src.shape, src.dtype.itemsize, budget, halo)
+
+    path = out if isinstance(out, (str, os.PathLike)) else None
+    if path is not None:
+        out = None
+    band_end = 0
+    for y0, y1, x0, x1 in iter_tiles(src.shape, tile_shape):
+        top, left = max(y0 - halo, 0), max(x0 - halo, 0)
+        bottom, right = min(y1 + halo, height), min(x1 + halo, width)
+        tile = np.array(src[top:bottom, left:right])
+        result = func(tile)
+        if result.shape[:2] != tile.shape[:2]:
+            raise ValueError(
+                f"func changed the tile size from {tile.shape[:2]} to {result.shape[:2]}"
+            )
+
+        if out is None:
+            out_shape = (height, width) + result.shape[2:]
+            if path is not None:
+                out = open_memmap(path, "w+", out_shape, result.dtype)
+            else:
+                out = np.empty(out_shape, dtype=result.dtype)
+        out[y0:y1, x0:x1] = result[y0 - top:y1 - top, x0 - left:x1 - left]
+
+        # 每完成一行瓦片就写回并重新映射, 已处理区域的页不再计入常驻内存
+        if y1 != band_end:
+            band_end = y1
+            src, out = _remap(src), _remap(out)
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def tiled_histogram(src, budget=DEFAULT_BUDGET):
+    """Return the 256-bin histogram of a uint8 gray ``src``, accumulated tile by tile."""
+    if src.dtype != np.uint8 or src.ndim != 2:
+        raise TypeError(f"Expected a 2-D uint8 image, got {src.dtype} {src.shape}")
+    hist = np.zeros(256, dtype=np.int64)
+    tile_shape = tile_shape_for(src.shape, src.dtype.itemsize, budget)
+    for y0, y1, x0, x1 in iter_tiles(src.shape, tile_shape):
+        tile = np.ascontiguousarray(src[y0:y1, x0:x1])
+        hist += cv.calcHist([tile], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+    return hist
+
+
+def operation_halo(chain):
+    """
+    Return the halo a ``utils.batch`` operation chain needs.
+
+    Radii of consecutive neighborhood operations add up, since each one
+    depends on the output of the previous one around the pixel.
+
+    :raises ValueError: If the chain contains an operation registered with
+        ``whole_image=True`` (global statistics, per-image random state or a
+        size change).
+    """
+    from utils.batch import get_operation, operation_tiling
+
+    halo = 0
+    for name, params in chain:
+        radius, whole_image = operation_tiling(name)
+        if whole_image:
+            raise ValueError(f"Operation '{name}' needs the whole image and cannot be tiled")
+        if radius is None:
+            continue
+        defaults = {
+            key: parameter.default
+            for key, parameter in inspect.signature(get_operation(name)).parameters.items()
+            if parameter.default is not inspect.Parameter.empty
+        }
+        params = {**defaults, **params}
+        halo += radius(params) if callable(radius) else int(params[radius]) // 2
+    return halo
+
+
+def main(argv=None):
+    from utils.batch import available_operations, operation_tiling, parse_operation, run_chain
+
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.tiles",
+        description="Run an operation chain over a huge image tile by tile.",
+    )
+    parser.add_argument("input", help="Source .npy memmap or image file")
+    parser.add_argument("output", help="Output .npy file")
+    parser.add_argument(
+        "--op",
+        dest="ops",
+        action="append",
+        default=[],
+        help="Operation as name:key=value,...; repeat to build a chain",
+    )
+    parser.add_argument(
+        "--budget", type=float, default=DEFAULT_BUDGET / 1024**2, help="Tile budget in MB"
+    )
+    parser.add_argument("--list-ops", action="store_true", help="List operations and exit")
+    args = parser.parse_args(argv)
+
+    if args.list_ops:
+        for name, description in available_operations().items():
+            if not operation_tiling(name)[1]:
+                print(f"{name:<18}{description}")
+        return 0
+
+    try:
+        chain = [parse_operation(spec) for spec in args.ops]
+        halo = operation_halo(chain)
+    except ValueError as e:
+        parser.error(str(e))
+    if not chain:
+        parser.error("at least one --op is required")
+
+    if args.input.lower().endswith(".npy"):
+        src = open_memmap(args.input)
+    else:
+        src = cv.imread(args.input, cv.IMREAD_UNCHANGED)
+        if src is None:
+            parser.error(f"could not read '{args.input}'")
+
+    budget = int(args.budget * 1024**2)
+    tile_shape = tile_shape_for(src.shape, src.dtype.itemsize, budget, halo)
+    start = time.perf_counter()
+    out = process_tiled(
+        src, lambda tile: run_chain(tile, chain), args.output, halo, tile_shape=tile_shape
+    )
+    print(
+        f"{src.shape} {src.dtype} -> {out.shape} {out.dtype} in "
+        f"{time.perf_counter() - start:.2f} s, tiles {tile_shape[0]}x{tile_shape[1]}, halo {halo}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())